@@ -0,0 +1,130 @@
+"""
+Compare chatbot inference backends on the same prompts.
+
+Each backend is loaded in a fresh process so RSS numbers are not polluted
+by the previous one. Generation is greedy with a fixed number of new
+tokens, so latency and tokens/sec are directly comparable.
+
+Usage (from backend/):
+    python -m benchmarks.chatbot_backends --backends eager int8 compile onnx
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import statistics
+import time
+from typing import Dict, List
+
+DEFAULT_PROMPTS = [
+    "Human: Hello! How are you today?\nAssistant:",
+    "Human: Can you explain what machine learning is?\nAssistant:",
+    "Human: What is the capital of France?\nAssistant: Paris.\nHuman: And of Germany?\nAssistant:",
+    "Human: Give me three tips for writing a good resume.\nAssistant:",
+]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), falling back to peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_backend(backend: str, model_name: str, prompts: List[str], max_new_tokens: int,
+                 repeat: int, results: mp.Queue):
+    import torch
+    from transformers import AutoTokenizer
+    from services.model_backends import load_causal_lm
+
+    torch.manual_seed(0)
+    rss_before = _rss_mb()
+    load_started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model, active, details = load_causal_lm(model_name, backend, "cpu")
+    load_s = time.perf_counter() - load_started
+
+    latencies = []
+    tokens = 0
+    # Run 0 is a warm-up so compile/ONNX session setup is not counted
+    for run in range(repeat + 1):
+        for prompt in prompts:
+            encoded = tokenizer(prompt, return_tensors="pt")
+            started = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(
+                    **encoded,
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+            elapsed = time.perf_counter() - started
+            if run > 0:
+                latencies.append(elapsed)
+                tokens += output.shape[1] - encoded['input_ids'].shape[1]
+
+    results.put({
+        'backend': backend,
+        'active': active,
+        'details': details,
+        'load_s': round(load_s, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'tokens_per_s': round(tokens / sum(latencies), 1),
+        'rss_mb': round(_rss_mb() - rss_before, 1),
+    })
+
+
+def run(backends: List[str], model_name: str, prompts: List[str], max_new_tokens: int,
+        repeat: int) -> List[Dict]:
+    ctx = mp.get_context("spawn")
+    rows = []
+    for backend in backends:
+        results = ctx.Queue()
+        proc = ctx.Process(
+            target=_run_backend,
+            args=(backend, model_name, prompts, max_new_tokens, repeat, results)
+        )
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0 or results.empty():
+            rows.append({'backend': backend, 'active': 'failed'})
+        else:
+            rows.append(results.get())
+    return rows
+
+
+def main():
+    from config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["eager", "int8", "compile", "onnx"])
+    parser.add_argument("--model", default=settings.CHATBOT_MODEL)
+    parser.add_argument("--prompts-file", help="Text file with one prompt per line")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as f:
+            prompts = [line.rstrip("\n").replace("\\n", "\n") for line in f if line.strip()]
+
+    rows = run(args.backends, args.model, prompts, args.max_new_tokens, args.repeat)
+
+    print(f"{'backend':<10}{'active':<10}{'load s':>8}{'p50 ms':>10}{'mean ms':>10}{'tok/s':>9}{'RSS MB':>9}")
+    for row in rows:
+        if row['active'] == 'failed':
+            print(f"{row['backend']:<10}{'failed':<10}")
+            continue
+        print(f"{row['backend']:<10}{row['active']:<10}{row['load_s']:>8}{row['p50_ms']:>10}"
+              f"{row['mean_ms']:>10}{row['tokens_per_s']:>9}{row['rss_mb']:>9}")
+        if row['details']:
+            print(f"{'':<10}{row['details']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark spam feature extraction on large emails.
+
+Compares the previous per-keyword / per-regex scan with SpamPatternMatcher
+on ~100 KB messages and checks both produce identical features.
+
+Usage (from backend/):
+    python -m benchmarks.spam_features --size-kb 100 --messages 20
+"""
+import argparse
+import random
+import re
+import time
+
+from services.spam_matcher import SpamPatternMatcher
+from services.spam_service import SpamDetectorService
+
+VOCABULARY = [
+    "please", "verify", "your", "account", "meeting", "notes", "click", "here", "link",
+    "update", "payment", "expire", "in", "24", "hours", "reset", "password", "unusual",
+    "activity", "free", "cash", "prize", "urgent", "the", "project", "report", "team",
+]
+
+
+def legacy_match(text_lower: str):
+    """The original extract_features scanning strategy"""
+    present = {k for k in SpamDetectorService.SPAM_KEYWORDS if k in text_lower}
+    matches = [re.findall(p, text_lower) for p in SpamDetectorService.PHISHING_PATTERNS]
+    return present, matches
+
+
+def make_email(size: int, rng: random.Random, line_words: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+        if line_words and len(words) % line_words == 0:
+            words.append("\n")
+    return " ".join(words)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--line-words", type=int, default=0,
+                        help="Insert a newline every N words (0 = one long line, the worst case)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    emails = [make_email(args.size_kb * 1024, rng, args.line_words).lower() for _ in range(args.messages)]
+    matcher = SpamPatternMatcher(SpamDetectorService.SPAM_KEYWORDS, SpamDetectorService.PHISHING_PATTERNS)
+
+    started = time.perf_counter()
+    legacy = [legacy_match(text) for text in emails]
+    legacy_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    current = [matcher.match(text) for text in emails]
+    current_s = time.perf_counter() - started
+
+    assert legacy == current, "matcher output differs from the legacy scan"
+    print(f"{args.messages} emails x {args.size_kb} KB")
+    print(f"legacy : {legacy_s / args.messages * 1000:8.1f} ms/email")
+    print(f"matcher: {current_s / args.messages * 1000:8.1f} ms/email ({legacy_s / current_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,22 @@ class Settings:
     
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ai_productivity.db")
+    # Async driver URL; derived from DATABASE_URL (aiosqlite / asyncpg) if unset
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds before a connection is replaced
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    
+    # Write-behind persistence of inference results (group commit off the request path)
+    PERSIST_MAX_RETRIES = int(os.getenv("PERSIST_MAX_RETRIES", "3"))
+    PERSIST_MAX_BATCH_ROWS = int(os.getenv("PERSIST_MAX_BATCH_ROWS", "1000"))  # Rows per flush transaction
+    # Journal pending rows to disk and replay them on restart (at-least-once)
+    PERSIST_JOURNAL = os.getenv("PERSIST_JOURNAL", "False") == "True"
+    PERSIST_JOURNAL_FSYNC = os.getenv("PERSIST_JOURNAL_FSYNC", "False") == "True"
+    PERSIST_JOURNAL_DIR = Path(os.getenv("PERSIST_JOURNAL_DIR", "persist_journal"))
     
     # File Upload
     UPLOAD_DIR = Path("uploads")
@@ -32,9 +48,73 @@ class Settings:
     ]
     
     # AI Models
+    # "background": load every model on startup; "lazy": load on first request
+    MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
     CHATBOT_MODEL = "distilgpt2"  # Lightweight GPT-2 model
     MAX_CONTEXT_LENGTH = 5  # Number of previous messages to remember
     MAX_RESPONSE_LENGTH = 150
+    # Inference backend: "eager" (fp32), "int8" (dynamic quantization),
+    # "compile" (torch.compile) or "onnx" (ONNX Runtime via optimum)
+    CHATBOT_INFERENCE_BACKEND = os.getenv("CHATBOT_INFERENCE_BACKEND", "eager")
+    
+    # Chat micro-batching: coalesce concurrent prompts into one generate call
+    CHAT_BATCHING_ENABLED = os.getenv("CHAT_BATCHING_ENABLED", "True") == "True"
+    CHAT_BATCH_MAX_SIZE = int(os.getenv("CHAT_BATCH_MAX_SIZE", "8"))
+    CHAT_BATCH_WINDOW_MS = float(os.getenv("CHAT_BATCH_WINDOW_MS", "10"))
+    
+    # Per-session KV cache reuse across chat turns
+    CHAT_KV_CACHE_ENABLED = os.getenv("CHAT_KV_CACHE_ENABLED", "True") == "True"
+    CHAT_KV_CACHE_MAX_SESSIONS = int(os.getenv("CHAT_KV_CACHE_MAX_SESSIONS", "64"))
+    CHAT_KV_CACHE_MAX_MB = int(os.getenv("CHAT_KV_CACHE_MAX_MB", "256"))
+    
+    # Inference executor: per-module worker pools ("thread" or "process", max workers)
+    INFERENCE_POOLS = {
+        # Chat workers mostly wait on the batcher, so allow a full batch in flight
+        "chatbot": ("thread", int(os.getenv(
+            "CHATBOT_WORKERS", str(CHAT_BATCH_MAX_SIZE if CHAT_BATCHING_ENABLED else 1)
+        ))),
+        "spam": ("thread", int(os.getenv("SPAM_WORKERS", "2"))),
+        "summary": ("thread", int(os.getenv("SUMMARY_WORKERS", "2"))),
+        "resume": ("thread", int(os.getenv("RESUME_WORKERS", "2"))),
+        # Archive scans are long-running; keep them off the interactive spam pool
+        "spam_scan": ("thread", int(os.getenv("SPAM_SCAN_WORKERS", "1"))),
+        # Chunked summarization is CPU-bound pure Python; use processes to sidestep the GIL
+        "summary_map": ("process", int(os.getenv("SUMMARY_MAP_WORKERS", "2"))),
+        "resume_extract": ("process", int(os.getenv("RESUME_EXTRACT_WORKERS", "2"))),
+    }
+    
+    # Spam detector
+    SPAM_BATCH_MAX_SIZE = int(os.getenv("SPAM_BATCH_MAX_SIZE", "5000"))
+    SPAM_SCAN_CHUNK_SIZE = int(os.getenv("SPAM_SCAN_CHUNK_SIZE", "500"))  # Messages per archive scan batch
+    SPAM_SCAN_MAX_ARCHIVE_MB = int(os.getenv("SPAM_SCAN_MAX_ARCHIVE_MB", "1024"))  # Largest archive accepted for a scan
+    
+    # Summarizer
+    SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "128"))  # Analyzed documents kept in the LRU cache
+    SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "20000"))  # Section size for chunked summaries
+    SUMMARY_MAX_INFLIGHT_CHUNKS = int(os.getenv("SUMMARY_MAX_INFLIGHT_CHUNKS", "4"))  # Sections queued at once
+    
+    # Model artifacts
+    MODEL_ARTIFACT_DIR = Path(os.getenv("MODEL_ARTIFACT_DIR", "artifacts"))
+    SPAM_CORPUS_FILE = os.getenv("SPAM_CORPUS_FILE")  # JSONL/CSV/TSV of labeled emails; built-in samples if unset
+    SKILL_TAXONOMY_FILE = os.getenv("SKILL_TAXONOMY_FILE")  # JSON/CSV/TXT skill taxonomy; built-in list if unset
+    
+    # Resume analyzer
+    RESUME_BATCH_MAX_FILES = int(os.getenv("RESUME_BATCH_MAX_FILES", "500"))
+    RESUME_BATCH_PAGE_SIZE = int(os.getenv("RESUME_BATCH_PAGE_SIZE", "50"))
+    RESUME_BATCH_MAX_MB = int(os.getenv("RESUME_BATCH_MAX_MB", "200"))  # Total (decompressed) size of one batch
+    RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "20"))  # PDF pages read per resume
+    RESUME_MAX_CHARS = int(os.getenv("RESUME_MAX_CHARS", "100000"))  # Characters of text kept per resume
+    RESUME_CACHE_SIZE = int(os.getenv("RESUME_CACHE_SIZE", "256"))  # Extractions kept in the in-memory LRU
+    RESUME_CACHE_PERSIST = os.getenv("RESUME_CACHE_PERSIST", "True") == "True"  # Also keep them in the DB
+    
+    # Activity analytics: log_activity() aggregates in memory and flushes periodically
+    ACTIVITY_FLUSH_SECONDS = float(os.getenv("ACTIVITY_FLUSH_SECONDS", "10"))
+    ACTIVITY_RAW_EVENTS = os.getenv("ACTIVITY_RAW_EVENTS", "True") == "True"  # Also keep individual events
+    ACTIVITY_RAW_RETENTION_DAYS = int(os.getenv("ACTIVITY_RAW_RETENTION_DAYS", "7"))
+    ACTIVITY_HOURLY_RETENTION_DAYS = int(os.getenv("ACTIVITY_HOURLY_RETENTION_DAYS", "35"))
+    ACTIVITY_DAILY_RETENTION_DAYS = int(os.getenv("ACTIVITY_DAILY_RETENTION_DAYS", "730"))
+    # Usage counters: other worker processes' writes show up within this many seconds
+    USAGE_COUNTER_CACHE_TTL_SECONDS = float(os.getenv("USAGE_COUNTER_CACHE_TTL_SECONDS", "5"))
     
     # Logging
     LOG_LEVEL = "INFO"
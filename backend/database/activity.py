@@ -0,0 +1,223 @@
+"""
+Time-bucketed activity analytics.
+
+log_activity() only increments an in-memory counter (and, with
+ACTIVITY_RAW_EVENTS, appends the event to a buffer); nothing touches the
+database on the request path. A background thread flushes every
+ACTIVITY_FLUSH_SECONDS: the pending counts are added to hourly and daily
+activity_rollups buckets and the raw events are bulk-inserted into
+ActivityLog, all in one transaction.
+
+Retention (applied hourly by the same thread):
+    raw ActivityLog events   ACTIVITY_RAW_RETENTION_DAYS
+    hourly buckets           ACTIVITY_HOURLY_RETENTION_DAYS
+    daily buckets            ACTIVITY_DAILY_RETENTION_DAYS
+Raw events are already counted in the buckets when they are written, so
+dropping them downsamples old history to hourly, then daily resolution.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.database import SessionLocal
+from database.tables import ActivityRollup
+from utils.logger import logger
+
+HOUR = "hour"
+DAY = "day"
+
+RETENTION_INTERVAL = timedelta(hours=1)
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the hour or day containing timestamp"""
+    if granularity == DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_to_bucket(db: Session, granularity: str, user_id: int, start: datetime,
+                   module: str, action: str, amount: int):
+    updated = db.execute(
+        update(ActivityRollup)
+        .where(
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.user_id == user_id,
+            ActivityRollup.bucket_start == start,
+            ActivityRollup.module == module,
+            ActivityRollup.action == action
+        )
+        .values(count=ActivityRollup.count + amount)
+    ).rowcount
+    if not updated:
+        db.add(ActivityRollup(
+            granularity=granularity, user_id=user_id, bucket_start=start,
+            module=module, action=action, count=amount
+        ))
+
+
+def load_buckets(db: Session, user_id: int, granularity: str,
+                 start: datetime, end: Optional[datetime] = None) -> List[Tuple]:
+    """(bucket_start, module, action, count) rows in [start, end), oldest first"""
+    query = (
+        select(ActivityRollup.bucket_start, ActivityRollup.module, ActivityRollup.action, ActivityRollup.count)
+        .where(
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.user_id == user_id,
+            ActivityRollup.bucket_start >= start
+        )
+        .order_by(ActivityRollup.bucket_start)
+    )
+    if end is not None:
+        query = query.where(ActivityRollup.bucket_start < end)
+    return db.execute(query).all()
+
+
+class ActivityRecorder:
+    """Aggregates activity in memory and periodically writes it as rollups"""
+
+    def __init__(self, session_factory: Callable, flush_seconds: float = 10.0,
+                 raw_events: bool = True, retention_days: Dict[str, int] = None):
+        self.session_factory = session_factory
+        self.flush_seconds = max(0.1, flush_seconds)
+        self.raw_events = raw_events
+        self.retention_days = retention_days or {}
+
+        self._counts = Counter()  # (user_id, module, action, hour start) -> count
+        self._events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+        self._last_retention = None
+
+        self.recorded = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def record(self, user_id: int, module: str, action: str, details: str = None):
+        now = datetime.utcnow()
+        with self._lock:
+            self._counts[(user_id, module, action, bucket_start(now, HOUR))] += 1
+            if self.raw_events:
+                self._events.append({
+                    "user_id": user_id,
+                    "module": module,
+                    "action": action,
+                    "details": details,
+                    "created_at": now
+                })
+            self.recorded += 1
+
+    def flush(self) -> int:
+        """Write pending activity; returns the number of events flushed"""
+        from models.models import ActivityLog
+
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, Counter()
+                events, self._events = self._events, []
+            if not counts:
+                return 0
+
+            db = self.session_factory()
+            try:
+                for (user_id, module, action, hour), amount in counts.items():
+                    _add_to_bucket(db, HOUR, user_id, hour, module, action, amount)
+                daily = Counter()
+                for (user_id, module, action, hour), amount in counts.items():
+                    daily[(user_id, module, action, bucket_start(hour, DAY))] += amount
+                for (user_id, module, action, day), amount in daily.items():
+                    _add_to_bucket(db, DAY, user_id, day, module, action, amount)
+                if events:
+                    db.execute(insert(ActivityLog), events)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Keep the activity for the next flush
+                with self._lock:
+                    self._counts.update(counts)
+                    self._events[:0] = events
+                    self.failed_flushes += 1
+                logger.error(f"Failed to flush activity: {str(e)}")
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self.flushes += 1
+            return sum(counts.values())
+
+    def apply_retention(self, now: datetime = None):
+        """Delete raw events and buckets older than their retention window"""
+        from models.models import ActivityLog
+
+        now = now or datetime.utcnow()
+        db = self.session_factory()
+        try:
+            raw_days = self.retention_days.get("raw")
+            if raw_days:
+                db.execute(delete(ActivityLog).where(ActivityLog.created_at < now - timedelta(days=raw_days)))
+            for granularity in (HOUR, DAY):
+                days = self.retention_days.get(granularity)
+                if days:
+                    db.execute(delete(ActivityRollup).where(
+                        ActivityRollup.granularity == granularity,
+                        ActivityRollup.bucket_start < bucket_start(now - timedelta(days=days), granularity)
+                    ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to apply activity retention: {str(e)}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+            now = datetime.utcnow()
+            if self._last_retention is None or now - self._last_retention >= RETENTION_INTERVAL:
+                self.apply_retention(now)
+                self._last_retention = now
+
+    def start(self):
+        if self._worker is None:
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="activity-recorder", daemon=True)
+            self._worker.start()
+
+    def close(self):
+        """Stop the flush thread and write whatever is still pending"""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=self.flush_seconds + 5)
+            self._worker = None
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': sum(self._counts.values()),
+                'recorded': self.recorded,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'flush_seconds': self.flush_seconds,
+                'raw_events': self.raw_events
+            }
+
+
+activity_recorder = ActivityRecorder(
+    SessionLocal,
+    flush_seconds=settings.ACTIVITY_FLUSH_SECONDS,
+    raw_events=settings.ACTIVITY_RAW_EVENTS,
+    retention_days={
+        "raw": settings.ACTIVITY_RAW_RETENTION_DAYS,
+        HOUR: settings.ACTIVITY_HOURLY_RETENTION_DAYS,
+        DAY: settings.ACTIVITY_DAILY_RETENTION_DAYS
+    }
+)
@@ -0,0 +1,158 @@
+"""
+Chat queries that stay cheap as sessions grow.
+
+Context for a new turn reads only the last N messages (ORDER BY ... DESC
+LIMIT N). Session listings read the denormalized chat_session_stats rows,
+which are updated with every saved exchange; sessions without a stats row
+(created before it existed) are backfilled with one window-function query.
+"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.models import ChatMessage
+from database.tables import ChatSessionStats
+
+PREVIEW_LENGTH = 50
+
+
+def _preview(content: str) -> str:
+    return content[:PREVIEW_LENGTH] + "..."
+
+
+def load_recent_messages(db: Session, session_pk: int, limit: int) -> List[Dict]:
+    """The last `limit` messages of a session, oldest first"""
+    rows = db.execute(
+        select(ChatMessage.role, ChatMessage.content)
+        .where(ChatMessage.session_id == session_pk)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit)
+    ).all()
+    return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+
+def compute_session_stats(db: Session, session_pks: Iterable[int]) -> Dict[int, Dict]:
+    """Message count and last message per session, in a single aggregate query"""
+    session_pks = list(session_pks)
+    if not session_pks:
+        return {}
+
+    ranked = (
+        select(
+            ChatMessage.session_id,
+            ChatMessage.content,
+            ChatMessage.created_at,
+            func.count().over(partition_by=ChatMessage.session_id).label("message_count"),
+            func.row_number().over(
+                partition_by=ChatMessage.session_id,
+                order_by=(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            ).label("position")
+        )
+        .where(ChatMessage.session_id.in_(session_pks))
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked.c.session_id, ranked.c.message_count, ranked.c.content, ranked.c.created_at)
+        .where(ranked.c.position == 1)
+    ).all()
+
+    stats = {pk: {"message_count": 0, "last_message_preview": None, "last_message_at": None} for pk in session_pks}
+    for session_pk, message_count, content, created_at in rows:
+        stats[session_pk] = {
+            "message_count": message_count,
+            "last_message_preview": _preview(content),
+            "last_message_at": created_at
+        }
+    return stats
+
+
+def get_session_stats(db: Session, session_pks: Iterable[int]) -> Dict[int, Dict]:
+    """Stats for the given sessions, backfilling any that have no stats row yet"""
+    session_pks = list(session_pks)
+    stats = {
+        row.session_id: {
+            "message_count": row.message_count,
+            "last_message_preview": row.last_message_preview,
+            "last_message_at": row.last_message_at
+        }
+        for row in db.query(ChatSessionStats).filter(ChatSessionStats.session_id.in_(session_pks)).all()
+    } if session_pks else {}
+
+    missing = [pk for pk in session_pks if pk not in stats]
+    if missing:
+        computed = compute_session_stats(db, missing)
+        for session_pk, values in computed.items():
+            try:
+                with db.begin_nested():
+                    db.add(ChatSessionStats(
+                        session_id=session_pk,
+                        message_count=values["message_count"],
+                        last_message_preview=values["last_message_preview"],
+                        last_message_at=values["last_message_at"]
+                    ))
+            except IntegrityError:
+                # A concurrent listing or saved exchange created the row first
+                pass
+        db.commit()
+        stats.update(computed)
+    return stats
+
+
+def create_session_stats(db: Session, session_pk: int):
+    """Empty stats row for a new session (caller commits)"""
+    db.add(ChatSessionStats(session_id=session_pk, message_count=0))
+
+
+def _increment(db: Session, session_pk: int, added: int, last_content: str) -> int:
+    return db.query(ChatSessionStats).filter(ChatSessionStats.session_id == session_pk).update(
+        {
+            ChatSessionStats.message_count: ChatSessionStats.message_count + added,
+            ChatSessionStats.last_message_preview: _preview(last_content),
+            ChatSessionStats.last_message_at: func.now()
+        },
+        synchronize_session=False
+    )
+
+
+def record_messages(db: Session, session_pk: int, added: int, last_content: str):
+    """
+    Update a session's stats for newly added messages (caller commits).
+    The messages must already be added to db so a backfill counts them.
+    """
+    if _increment(db, session_pk, added, last_content):
+        return
+
+    # Session predates the stats table: count its messages once
+    db.flush()
+    message_count = db.scalar(
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.session_id == session_pk)
+    )
+    try:
+        with db.begin_nested():
+            db.add(ChatSessionStats(
+                session_id=session_pk,
+                message_count=message_count,
+                last_message_preview=_preview(last_content)
+            ))
+    except IntegrityError:
+        # A concurrent request created the row first
+        _increment(db, session_pk, added, last_content)
+
+
+def record_inserted_messages(db: Session, rows: List[Dict]):
+    """Flush hook: update stats for ChatMessage rows just inserted by the write-behind queue"""
+    latest: Dict[int, Dict] = {}
+    added: Dict[int, int] = {}
+    for row in rows:
+        session_pk = row["session_id"]
+        added[session_pk] = added.get(session_pk, 0) + 1
+        if session_pk not in latest or row["id"] > latest[session_pk]["id"]:
+            latest[session_pk] = row
+    for session_pk, count in added.items():
+        record_messages(db, session_pk, count, latest[session_pk]["content"])
+
+
+def delete_session_stats(db: Session, session_pk: int):
+    db.query(ChatSessionStats).filter(ChatSessionStats.session_id == session_pk).delete(synchronize_session=False)
@@ -0,0 +1,282 @@
+"""
+Incrementally maintained usage counters.
+
+The analytics and spam stats endpoints read a handful of usage_counters
+rows instead of running COUNT(*) over the result tables. The counters are
+upserted by write-behind flush hooks in the same transaction that inserts
+the rows they count, one row per (metric, user, UTC day) plus a running
+'total' row, and reads go through a small in-process cache that is
+invalidated whenever a flush commits.
+
+Each process only invalidates on its own flushes, so with several worker
+processes a cached entry can miss other workers' writes; entries expire
+after USAGE_COUNTER_CACHE_TTL_SECONDS, which bounds that staleness.
+
+Counters record usage, so deleting a chat session does not lower them;
+`python -m database.counters --rebuild` reconciles them with the rows that
+currently exist in the result tables.
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.tables import UsageCounter
+from database.write_behind import persistence_queue
+from models.models import ChatMessage, ChatSession, ResumeAnalysis, SpamCheck, Summary
+from utils.logger import logger
+
+TOTAL = "total"
+
+RESUME_ANALYSES = "resume_analyses"
+SPAM_CHECKS = "spam_checks"
+SPAM_DETECTED = "spam_detected"
+SUMMARIES_CREATED = "summaries_created"
+CHAT_MESSAGES = "chat_messages"  # Messages sent by the user
+
+METRICS = (RESUME_ANALYSES, SPAM_CHECKS, SPAM_DETECTED, SUMMARIES_CREATED, CHAT_MESSAGES)
+
+
+def _today() -> str:
+    # Rows are stamped with the database's CURRENT_TIMESTAMP, which is UTC
+    return datetime.utcnow().date().isoformat()
+
+
+def increment(db: Session, deltas: Dict[Tuple[str, int], int], day: str = None):
+    """Add deltas keyed by (metric, user_id) to that day's and the total counters (caller commits)"""
+    day = day or _today()
+    for (metric, user_id), amount in deltas.items():
+        if not amount:
+            continue
+        for period in (day, TOTAL):
+            updated = db.execute(
+                update(UsageCounter)
+                .where(
+                    UsageCounter.metric == metric,
+                    UsageCounter.user_id == user_id,
+                    UsageCounter.period == period
+                )
+                .values(count=UsageCounter.count + amount)
+            ).rowcount
+            if not updated:
+                db.add(UsageCounter(metric=metric, user_id=user_id, period=period, count=amount))
+    # The write-behind queue is the only writer within a process; if another
+    # worker process creates the same counter first, the flush fails here and
+    # the queue retries the whole batch, which then takes the update path
+    db.flush()
+
+
+class UsageCounterCache:
+    """In-process cache of counter rows per (user_id, period), each kept for at most ttl_seconds"""
+
+    def __init__(self, ttl_seconds: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[int, str], Tuple[Dict[str, int], float]] = {}  # key -> (counts, loaded at)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Tuple[int, str]):
+        """(cached entry or None, generation to store a freshly read entry under)"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl_seconds:
+                self.hits += 1
+                return dict(cached[0]), None
+            self.misses += 1
+            return None, self._generation
+
+    def _load(self, db: Session, key: Tuple[int, str], generation: int) -> Dict[str, int]:
+        user_id, period = key
+        rows = db.execute(
+            select(UsageCounter.metric, UsageCounter.count)
+            .where(UsageCounter.user_id == user_id, UsageCounter.period == period)
+        ).all()
+        entry = {metric: 0 for metric in METRICS}
+        entry.update({metric: count for metric, count in rows})
+        loaded_at = time.monotonic()
+
+        with self._lock:
+            # A flush committed while we read; our values may predate it
+            if generation == self._generation:
+                self._entries[key] = (entry, loaded_at)
+        return dict(entry)
+
+    def get(self, db: Session, user_id: int, period: str = TOTAL) -> Dict[str, int]:
+        """Every metric's count for a user and period (0 when never incremented)"""
+        key = (user_id, period)
+        entry, generation = self._lookup(key)
+        if entry is not None:
+            return entry
+        return self._load(db, key, generation)
+
+    async def get_async(self, db, user_id: int, period: str = TOTAL) -> Dict[str, int]:
+        """get() for an AsyncSession; only a cache miss touches the database"""
+        key = (user_id, period)
+        entry, generation = self._lookup(key)
+        if entry is not None:
+            return entry
+        return await db.run_sync(self._load, key, generation)
+
+    def invalidate(self, user_ids: Iterable[int] = None):
+        """Drop cached counters of the given users (all users when None)"""
+        with self._lock:
+            self._generation += 1
+            if user_ids is None:
+                self._entries.clear()
+            else:
+                user_ids = set(user_ids)
+                for key in [key for key in self._entries if key[0] in user_ids]:
+                    del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+
+usage_counters = UsageCounterCache(ttl_seconds=settings.USAGE_COUNTER_CACHE_TTL_SECONDS)
+
+
+# Write-behind hooks
+
+def _count_by_user(rows: List[Dict], metric: str) -> Counter:
+    return Counter((metric, row["user_id"]) for row in rows)
+
+
+def _count_resume_analyses(db: Session, rows: List[Dict]):
+    increment(db, _count_by_user(rows, RESUME_ANALYSES))
+
+
+def _count_spam_checks(db: Session, rows: List[Dict]):
+    deltas = _count_by_user(rows, SPAM_CHECKS)
+    deltas.update(_count_by_user([row for row in rows if row["is_spam"]], SPAM_DETECTED))
+    increment(db, deltas)
+
+
+def _count_summaries(db: Session, rows: List[Dict]):
+    increment(db, _count_by_user(rows, SUMMARIES_CREATED))
+
+
+def _count_chat_messages(db: Session, rows: List[Dict]):
+    user_rows = [row for row in rows if row["role"] == "user"]
+    if not user_rows:
+        return
+    owners = dict(db.execute(
+        select(ChatSession.id, ChatSession.user_id)
+        .where(ChatSession.id.in_({row["session_id"] for row in user_rows}))
+    ).all())
+    # A session deleted while its exchange was queued has no owner left to count for
+    increment(db, Counter(
+        (CHAT_MESSAGES, owners[row["session_id"]]) for row in user_rows if row["session_id"] in owners
+    ))
+
+
+def _invalidate_users(rows: List[Dict]):
+    usage_counters.invalidate({row["user_id"] for row in rows})
+
+
+def _invalidate_all(rows: List[Dict]):
+    # Chat rows carry a session, not a user
+    usage_counters.invalidate()
+
+
+for _model, _hook, _invalidate in (
+    (ResumeAnalysis, _count_resume_analyses, _invalidate_users),
+    (SpamCheck, _count_spam_checks, _invalidate_users),
+    (Summary, _count_summaries, _invalidate_users),
+    (ChatMessage, _count_chat_messages, _invalidate_all),
+):
+    persistence_queue.add_flush_hook(_model, _hook)
+    persistence_queue.add_commit_hook(_model, _invalidate)
+
+
+# Rebuild
+
+def _daily_counts(db: Session) -> Counter:
+    """(metric, user_id, day) -> count, straight from the result tables"""
+    queries = {
+        RESUME_ANALYSES: select(ResumeAnalysis.user_id, func.date(ResumeAnalysis.created_at), func.count())
+            .group_by(ResumeAnalysis.user_id, func.date(ResumeAnalysis.created_at)),
+        SPAM_CHECKS: select(SpamCheck.user_id, func.date(SpamCheck.created_at), func.count())
+            .group_by(SpamCheck.user_id, func.date(SpamCheck.created_at)),
+        SPAM_DETECTED: select(SpamCheck.user_id, func.date(SpamCheck.created_at), func.count())
+            .where(SpamCheck.is_spam == True)
+            .group_by(SpamCheck.user_id, func.date(SpamCheck.created_at)),
+        SUMMARIES_CREATED: select(Summary.user_id, func.date(Summary.created_at), func.count())
+            .group_by(Summary.user_id, func.date(Summary.created_at)),
+        CHAT_MESSAGES: select(ChatSession.user_id, func.date(ChatMessage.created_at), func.count())
+            .join(ChatSession, ChatMessage.session_id == ChatSession.id)
+            .where(ChatMessage.role == "user")
+            .group_by(ChatSession.user_id, func.date(ChatMessage.created_at)),
+    }
+    counts = Counter()
+    for metric, query in queries.items():
+        for user_id, day, count in db.execute(query):
+            day = day.isoformat() if hasattr(day, 'isoformat') else str(day)
+            counts[(metric, user_id, day)] += count
+    return counts
+
+
+def rebuild(db: Session) -> int:
+    """Replace every counter with counts from the result tables; returns the number of rows written"""
+    daily = _daily_counts(db)
+    totals = Counter()
+    for (metric, user_id, _), count in daily.items():
+        totals[(metric, user_id, TOTAL)] += count
+
+    rows = [
+        {"metric": metric, "user_id": user_id, "period": period, "count": count}
+        for (metric, user_id, period), count in {**daily, **totals}.items()
+    ]
+    db.execute(delete(UsageCounter))
+    if rows:
+        db.execute(insert(UsageCounter), rows)
+    db.commit()
+    usage_counters.invalidate()
+    logger.info(f"Usage counters rebuilt: {len(rows)} rows")
+    return len(rows)
+
+
+def ensure_counters(session_factory):
+    """Build the counters once for a database that predates them"""
+    db = session_factory()
+    try:
+        if db.scalar(select(UsageCounter.metric).limit(1)) is None:
+            rebuild(db)
+    finally:
+        db.close()
+
+
+def main():
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Recount every counter from the result tables")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"Rebuilt {rebuild(db)} counter rows")
+        else:
+            print(usage_counters.get(db, 1))  # Demo user
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
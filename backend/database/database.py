@@ -1,15 +1,130 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import settings
+from utils.logger import logger
+from utils.metrics import summarize_latencies
+
+class PoolMetrics:
+    """Checkout counts and wait times for one connection pool"""
+    
+    def __init__(self, sample_size: int = 1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms = deque(maxlen=sample_size)
+        self.pool = None
+        self._lock = threading.Lock()
+    
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_ms.append(wait_ms)
+    
+    def snapshot(self) -> Dict:
+        pool = self.pool
+        with self._lock:
+            return {
+                'pool_size': pool.size() if pool else 0,
+                'checked_out': pool.checkedout() if pool else 0,
+                'overflow': pool.overflow() if pool else 0,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'checkout_wait_ms': summarize_latencies(self.wait_ms)
+            }
+
+def _timed_pool(base, metrics: PoolMetrics):
+    """Pool class that reports how long each checkout waited for a connection"""
+    class TimedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            metrics.pool = self  # Also re-pointed when the engine recreates its pool
+        
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+                raise
+            metrics.record((time.perf_counter() - started) * 1000)
+            return connection
+    
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the writer; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+def _pool_options(url: str) -> Dict:
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True
+    }
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def _async_url(url: str) -> Optional[str]:
+    """Async driver URL for DATABASE_URL, if there is a known driver"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith(("postgresql:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return None
+
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
 
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    poolclass=_timed_pool(QueuePool, pool_metrics["sync"]),
+    **_pool_options(settings.DATABASE_URL)
 )
+if _is_sqlite(settings.DATABASE_URL) and ":memory:" not in settings.DATABASE_URL:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for routes that should not block the event loop on commits
+async_engine = None
+AsyncSessionLocal = None
+_async_database_url = _async_url(settings.DATABASE_URL)
+if _async_database_url:
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        async_engine = create_async_engine(
+            _async_database_url,
+            poolclass=_timed_pool(AsyncAdaptedQueuePool, pool_metrics["async"]),
+            **_pool_options(_async_database_url)
+        )
+        if _is_sqlite(_async_database_url) and ":memory:" not in _async_database_url:
+            event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    except ImportError as e:
+        logger.warning(f"Async database driver unavailable ({str(e)}); async sessions disabled")
+
 Base = declarative_base()
 
 def get_db():
@@ -20,9 +135,24 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency for async database sessions"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database sessions are not available; install aiosqlite or asyncpg")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_stats() -> Dict:
+    """Checkout latency and usage of the sync and async connection pools"""
+    stats = {"sync": pool_metrics["sync"].snapshot()}
+    if async_engine is not None:
+        stats["async"] = pool_metrics["async"].snapshot()
+    return stats
+
 def init_db():
     """Initialize database tables"""
     from models import models  # Import here to avoid circular imports
+    from database import tables  # Service-owned tables (caches, counters)
     Base.metadata.create_all(bind=engine)
     
     # Create demo user if not exists
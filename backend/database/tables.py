@@ -0,0 +1,55 @@
+"""
+Tables used by the services for caching and bookkeeping, alongside the
+application models in models.models.
+"""
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy.sql import func
+
+from database.database import Base
+
+
+class ResumeExtraction(Base):
+    """Extracted text, skills and contact info of a resume file, keyed by content hash"""
+    __tablename__ = "resume_extractions"
+
+    content_hash = Column(String(64), primary_key=True)
+    extracted_text = Column(Text, nullable=False)
+    skills_found = Column(Text, nullable=False)  # JSON
+    contact_info = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ChatSessionStats(Base):
+    """Denormalized message count and last-message preview per chat session"""
+    __tablename__ = "chat_session_stats"
+
+    session_id = Column(Integer, primary_key=True)  # ChatSession.id
+    message_count = Column(Integer, nullable=False, default=0)
+    last_message_preview = Column(String(100))
+    last_message_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class UsageCounter(Base):
+    """Running count of one usage metric per user, per UTC day and overall (period 'total')"""
+    __tablename__ = "usage_counters"
+
+    metric = Column(String(32), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    period = Column(String(10), primary_key=True)  # 'YYYY-MM-DD' or 'total'
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ActivityRollup(Base):
+    """
+    Activity counts per user, module and action in hourly or daily buckets.
+    The primary key leads with (granularity, user_id, bucket_start), so
+    timeline queries are range scans of the key index.
+    """
+    __tablename__ = "activity_rollups"
+
+    granularity = Column(String(5), primary_key=True)  # 'hour' or 'day'
+    user_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # UTC
+    module = Column(String(32), primary_key=True)
+    action = Column(String(32), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,430 @@
+"""
+Write-behind persistence for inference results.
+
+Routes hand their audit rows to a queue instead of committing inline. A
+single writer thread group-commits them: it flushes as soon as rows are
+pending and it is free, and rows submitted while a flush is running are
+bulk-inserted together in the next one (at most PERSIST_MAX_BATCH_ROWS per
+transaction). An idle writer adds no delay, and
+under load concurrent requests share one commit instead of queueing for
+SQLite's writer lock one by one. Each submitted row gets a Future that
+resolves to its primary key once it is committed; callers that return the
+id await it, others can fire and forget.
+
+Durability:
+    PERSIST_JOURNAL off   rows not yet committed are lost if the process
+                          dies.
+    PERSIST_JOURNAL on    rows are appended to a journal segment before they
+                          are queued and a segment is deleted once all of its
+                          rows are committed; leftover segments are replayed on
+                          startup (at-least-once: a crash between commit and
+                          delete inserts those rows again). With
+                          PERSIST_JOURNAL_FSYNC the append is fsync'd too.
+
+A failed flush is retried one table/column group per transaction, then row
+by row, so a bad row only fails its own Future. Rows that still fail after
+PERSIST_MAX_RETRIES attempts fail their futures and, with the journal on,
+are kept in a segment of their own for the next startup.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Table, insert
+
+from config import settings
+from database.database import Base, SessionLocal
+from utils.logger import logger
+from utils.metrics import summarize_latencies
+
+
+class _PendingRow:
+    __slots__ = ('table', 'values', 'future', 'enqueued_at', 'segment')
+
+    def __init__(self, table: Table, values: Dict, future: Future):
+        self.table = table
+        self.values = values
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.segment = None  # Journal segment holding the row
+
+
+class WriteBehindQueue:
+    """Buffers rows and inserts them in batches from one writer thread"""
+
+    def __init__(self, session_factory: Callable, journal_dir: Optional[Path] = None,
+                 journal_fsync: bool = False, max_retries: int = 3, max_batch_rows: int = 1000):
+        self.session_factory = session_factory
+        self.journal_dir = Path(journal_dir) if journal_dir else None
+        self.journal_fsync = journal_fsync
+        self.max_retries = max(1, max_retries)
+        self.max_batch_rows = max(1, max_batch_rows)
+
+        self._pending: List[_PendingRow] = []
+        self._cond = threading.Condition()
+        # Held across a journal append and the matching enqueue, so a segment
+        # is never rotated between the two (always taken before _cond)
+        self._journal_lock = threading.Lock()
+        self._hooks: Dict[str, List[Callable]] = {}
+        self._commit_hooks: Dict[str, List[Callable]] = {}
+        self._worker = None
+        self._closed = False
+
+        self._segment = None
+        self._segment_path = None
+        self._segment_seq = 0
+        self._segment_rows: Dict[Path, int] = {}  # Rows of each segment not yet flushed
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._queue_delay_ms = deque(maxlen=1000)
+        self._flush_ms = deque(maxlen=1000)
+
+    # Producers
+
+    def submit(self, model, values: Dict) -> Future:
+        """Queue one row of `model`; the Future resolves to its primary key"""
+        return self.submit_many(model, [values])[0]
+
+    def submit_many(self, model, rows: List[Dict]) -> List[Future]:
+        """
+        Queue rows of `model`. With the journal on this appends (and maybe
+        fsyncs) to disk, so async code should go through write()/write_many().
+        """
+        table = model.__table__
+        pending = [_PendingRow(table, dict(values), Future()) for values in rows]
+        if not self.journal_dir:
+            self._enqueue(pending)
+        else:
+            with self._journal_lock:
+                if self._closed:
+                    raise RuntimeError("Write-behind queue is closed")
+                self._journal(pending)
+                self._enqueue(pending)
+        return [row.future for row in pending]
+
+    def _enqueue(self, pending: List[_PendingRow]):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self._ensure_worker()
+            self._pending.extend(pending)
+            self._cond.notify()
+
+    async def _submit_async(self, model, rows: List[Dict]) -> List[Future]:
+        if self.journal_dir:
+            # Keep the journal write off the event loop
+            return await asyncio.to_thread(self.submit_many, model, rows)
+        return self.submit_many(model, rows)
+
+    async def write(self, model, values: Dict) -> int:
+        """Queue one row and wait (without blocking the event loop) for its id"""
+        futures = await self._submit_async(model, [values])
+        return await asyncio.wrap_future(futures[0])
+
+    async def write_many(self, model, rows: List[Dict]) -> List[int]:
+        futures = await self._submit_async(model, rows)
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in futures)))
+
+    def add_flush_hook(self, model, hook: Callable):
+        """
+        Call hook(db, rows) in the flush transaction after rows of `model` are
+        inserted; rows are the inserted values including their 'id'.
+        """
+        self._hooks.setdefault(model.__tablename__, []).append(hook)
+
+    def add_commit_hook(self, model, hook: Callable):
+        """Call hook(rows) once inserted rows of `model` are committed"""
+        self._commit_hooks.setdefault(model.__tablename__, []).append(hook)
+
+    # Journal
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        self._segment_path = self.journal_dir / f"segment-{time.time_ns()}-{self._segment_seq}.jsonl"
+        self._segment = open(self._segment_path, 'a', encoding='utf-8')
+
+    def _journal(self, pending: List[_PendingRow]):
+        if self._segment is None:
+            self._open_segment()
+        for row in pending:
+            self._segment.write(json.dumps({'table': row.table.name, 'values': row.values}) + '\n')
+            row.segment = self._segment_path
+        self._segment_rows[self._segment_path] = self._segment_rows.get(self._segment_path, 0) + len(pending)
+        self._segment.flush()
+        if self.journal_fsync:
+            os.fsync(self._segment.fileno())
+
+    def _rotate_segment(self):
+        """Close the segment so rows journaled from now on go to a new one (caller holds the journal lock)"""
+        if self._segment is None:
+            return
+        self._segment.close()
+        self._segment = None
+        self._segment_path = None
+
+    def _release_segments(self, batch: List[_PendingRow]):
+        """Delete the segments whose rows have all been flushed"""
+        with self._journal_lock:
+            for row in batch:
+                remaining = self._segment_rows.get(row.segment)
+                if remaining is None:
+                    continue
+                if remaining > 1:
+                    self._segment_rows[row.segment] = remaining - 1
+                    continue
+                del self._segment_rows[row.segment]
+                if row.segment != self._segment_path:
+                    row.segment.unlink(missing_ok=True)
+
+    def replay_journal(self) -> int:
+        """Insert rows from segments a previous process left behind"""
+        if not self.journal_dir:
+            return 0
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        replayed = 0
+        for path in sorted(self.journal_dir.glob("segment-*.jsonl")):
+            if path == self._segment_path:
+                continue
+            pending = []
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn final write; the row was never acknowledged
+                    table = Base.metadata.tables.get(entry['table'])
+                    if table is None:
+                        logger.error(f"Journal {path.name} references unknown table {entry['table']}")
+                        continue
+                    pending.append(_PendingRow(table, entry['values'], Future()))
+            if pending:
+                results = self._write_isolated(pending)
+                failed = [row for row, result in zip(pending, results) if isinstance(result, Exception)]
+                if failed:
+                    kept = self._write_segment(failed)
+                    logger.error(f"Replaying journal {path.name}: kept {len(failed)} unwritten rows in {kept.name}")
+                replayed += len(pending) - len(failed)
+            path.unlink()
+        if replayed:
+            logger.info(f"Replayed {replayed} journaled rows")
+        return replayed
+
+    # Writer
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _take_batch(self) -> List[_PendingRow]:
+        """Wait until rows are pending and take up to max_batch_rows of them"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+        if not self.journal_dir:
+            with self._cond:
+                batch, self._pending = self._pending[:self.max_batch_rows], self._pending[self.max_batch_rows:]
+            return batch
+        with self._journal_lock, self._cond:
+            batch, self._pending = self._pending[:self.max_batch_rows], self._pending[self.max_batch_rows:]
+            if any(row.segment == self._segment_path for row in batch):
+                # Rows submitted from now on must not keep this segment alive
+                self._rotate_segment()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._take_batch()
+                if not batch:
+                    return  # Closed and drained
+                self._flush(batch)
+            except Exception as e:
+                # The writer must survive: every caller waits on it
+                self._fail_batch(batch, e)
+
+    def _fail_batch(self, batch: List[_PendingRow], error: Exception):
+        """Fail the futures a crashed flush left unresolved"""
+        logger.error(f"Write-behind writer failed on a batch of {len(batch)} rows: {str(error)}")
+        unresolved = [row for row in batch if not row.future.done()]
+        for row in unresolved:
+            row.future.set_exception(error)
+        with self._cond:
+            self.rows_failed += len(unresolved)
+        if not batch:
+            time.sleep(1.0)  # Taking the batch failed; don't spin on it
+
+    def _write_batch(self, batch: List[_PendingRow]) -> List[int]:
+        """Insert a batch in one transaction and run the flush hooks; returns ids in batch order"""
+        # Rows with the same table and columns go in one executemany
+        groups = self._group(batch)
+
+        ids: List[int] = [None] * len(batch)
+        inserted: Dict[str, List[Dict]] = {}
+        db = self.session_factory()
+        try:
+            for positions in groups:
+                table = batch[positions[0]].table
+                group_ids = db.scalars(
+                    insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                    [batch[position].values for position in positions]
+                ).all()
+                for position, row_id in zip(positions, group_ids):
+                    ids[position] = row_id
+                    inserted.setdefault(table.name, []).append({**batch[position].values, 'id': row_id})
+            for table_name, rows in inserted.items():
+                for hook in self._hooks.get(table_name, ()):
+                    hook(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for table_name, rows in inserted.items():
+            for hook in self._commit_hooks.get(table_name, ()):
+                try:
+                    hook(rows)
+                except Exception as e:
+                    logger.error(f"Write-behind commit hook for {table_name} failed: {str(e)}")
+        return ids
+
+    @staticmethod
+    def _group(batch: List[_PendingRow]) -> List[List[int]]:
+        """Positions of the batch's rows, grouped by table and column set"""
+        groups: Dict[tuple, List[int]] = {}
+        for position, row in enumerate(batch):
+            groups.setdefault((row.table.name, tuple(sorted(row.values))), []).append(position)
+        return list(groups.values())
+
+    def _write_isolated(self, batch: List[_PendingRow]) -> List:
+        """
+        Write a batch so a failing row cannot fail unrelated ones: the whole
+        batch in one transaction, or else each table/column group in its
+        own, or else row by row with retries. Returns an id or the final
+        exception for every row, in batch order.
+        """
+        try:
+            return self._write_batch(batch)
+        except Exception as e:
+            logger.error(f"Write-behind flush of {len(batch)} rows failed, retrying by group: {str(e)}")
+
+        results = [None] * len(batch)
+        for positions in self._group(batch):
+            rows = [batch[position] for position in positions]
+            try:
+                group_results = self._write_batch(rows)
+            except Exception as e:
+                logger.error(f"Write-behind group of {len(rows)} {rows[0].table.name} rows failed, retrying by row: {str(e)}")
+                group_results = [self._write_row(row) for row in rows]
+            for position, result in zip(positions, group_results):
+                results[position] = result
+        return results
+
+    def _write_row(self, row: _PendingRow):
+        error = None
+        for attempt in range(self.max_retries):
+            try:
+                return self._write_batch([row])[0]
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.max_retries:
+                    time.sleep(min(1.0, 0.05 * 2 ** attempt))
+        logger.error(f"Write-behind insert into {row.table.name} failed after {self.max_retries} attempts: {str(error)}")
+        return error
+
+    def _write_segment(self, rows: List[_PendingRow]) -> Path:
+        """Journal segment holding only the given rows"""
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        path = self.journal_dir / f"segment-{time.time_ns()}-failed.jsonl"
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({'table': row.table.name, 'values': row.values}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return path
+
+    def _flush(self, batch: List[_PendingRow]):
+        started = time.perf_counter()
+        for row in batch:
+            # Rows are written even if their caller has gone; this only stops
+            # their futures from being cancelled from now on
+            row.future.set_running_or_notify_cancel()
+        results = self._write_isolated(batch)
+        failed = [row for row, result in zip(batch, results) if isinstance(result, Exception)]
+
+        if self.journal_dir:
+            if failed:
+                # Keep only the rows that were not written for replay on restart
+                kept = self._write_segment(failed)
+                logger.error(f"Kept {len(failed)} unwritten rows in journal {kept.name} for replay on restart")
+            self._release_segments(batch)
+        finished = time.perf_counter()
+        with self._cond:
+            self.flushes += 1
+            self.rows_written += len(batch) - len(failed)
+            self.rows_failed += len(failed)
+            self._batch_sizes.append(len(batch))
+            self._flush_ms.append((finished - started) * 1000)
+            for row in batch:
+                self._queue_delay_ms.append((started - row.enqueued_at) * 1000)
+        for row, result in zip(batch, results):
+            if row.future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                row.future.set_exception(result)
+            else:
+                row.future.set_result(result)
+
+    # Lifecycle
+
+    def start(self):
+        """Replay leftover journal segments; call once the tables exist"""
+        with self._cond:
+            self._closed = False
+        self.replay_journal()
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything still pending and stop the writer"""
+        with self._journal_lock, self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning("Write-behind queue did not drain before shutdown")
+        self._worker = None
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'journal': self.journal_dir is not None,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'rows_failed': self.rows_failed,
+                'avg_batch_size': round(sum(self._batch_sizes) / len(self._batch_sizes), 2) if self._batch_sizes else 0.0,
+                'queue_delay_ms': summarize_latencies(self._queue_delay_ms),
+                'flush_ms': summarize_latencies(self._flush_ms)
+            }
+
+
+persistence_queue = WriteBehindQueue(
+    SessionLocal,
+    journal_dir=settings.PERSIST_JOURNAL_DIR if settings.PERSIST_JOURNAL else None,
+    journal_fsync=settings.PERSIST_JOURNAL_FSYNC,
+    max_retries=settings.PERSIST_MAX_RETRIES,
+    max_batch_rows=settings.PERSIST_MAX_BATCH_ROWS
+)
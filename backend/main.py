@@ -1,14 +1,22 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from datetime import datetime
 import uvicorn
 
 from config import settings
-from database.database import init_db
+from database.database import init_db, SessionLocal
+from database.write_behind import persistence_queue
+from database.counters import ensure_counters
+from database.activity import activity_recorder
 from utils.logger import logger
+from utils.executor import inference_executor
+from utils.body_limit import BodySizeLimitMiddleware
+from services.registry import model_registry, ModelNotReadyError
+from services.skill_search import skill_search_index
 
 # Import routers
-from routes import resume, spam, summary, chatbot, analytics
+from routes import resume, spam, summary, chatbot, analytics, metrics
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,12 +36,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads while they stream in, before they are spooled
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/api/resume/analyze": settings.MAX_UPLOAD_SIZE,
+        "/api/resume/analyze-batch": settings.RESUME_BATCH_MAX_MB * 1024 * 1024,
+        "/api/summary/upload": settings.MAX_UPLOAD_SIZE,
+        "/api/spam/scan-jobs": settings.SPAM_SCAN_MAX_ARCHIVE_MB * 1024 * 1024,
+    }
+)
+
 # Include routers
 app.include_router(resume.router, prefix="/api")
 app.include_router(spam.router, prefix="/api")
 app.include_router(summary.router, prefix="/api")
 app.include_router(chatbot.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+
+# Requests that need a model which is still loading
+@app.exception_handler(ModelNotReadyError)
+async def model_not_ready_handler(request, exc: ModelNotReadyError):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "5"},
+        content={"detail": str(exc), "model": exc.name, "state": exc.state}
+    )
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -50,7 +79,13 @@ async def startup_event():
     """Initialize database and services on startup"""
     logger.info("Starting AI Productivity Suite...")
     init_db()
+    ensure_counters(SessionLocal)
+    persistence_queue.start()
+    activity_recorder.start()
     logger.info("Database initialized")
+    if settings.MODEL_LOADING == "background":
+        model_registry.start_loading()
+        logger.info("Loading models in background")
     logger.info(f"Server running on http://localhost:8000")
     logger.info(f"API docs available at http://localhost:8000/api/docs")
 
@@ -59,6 +94,11 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down AI Productivity Suite...")
+    if model_registry.is_ready("resume_search"):
+        skill_search_index.save()
+    persistence_queue.close()
+    activity_recorder.close()
+    inference_executor.shutdown(wait=False)
 
 # Root endpoint
 @app.get("/")
@@ -71,16 +111,27 @@ async def root():
         "status": "running"
     }
 
-# Health check endpoint
+# Health check endpoints
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up and serving requests"""
     return {
         "status": "healthy",
         "version": settings.VERSION,
-        "timestamp": "2024-01-01T00:00:00Z"
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "models": model_registry.readiness()
     }
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check: 200 only once every model has loaded"""
+    models = model_registry.readiness()
+    ready = all(m["state"] == "ready" for m in models.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "models": models}
+    )
+
 # API info endpoint
 @app.get("/api/info")
 async def api_info():
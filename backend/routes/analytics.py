@@ -4,7 +4,12 @@ from sqlalchemy import func, extract
 from datetime import datetime, timedelta
 
 from database.database import get_db
-from models.models import ActivityLog, ResumeAnalysis, SpamCheck, Summary, ChatMessage
+from database.counters import (
+    CHAT_MESSAGES, RESUME_ANALYSES, SPAM_CHECKS, SUMMARIES_CREATED, usage_counters
+)
+from database.activity import DAY, HOUR, bucket_start, load_buckets
+from config import settings
+from models.models import ActivityLog
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -12,24 +17,16 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"])
 async def get_dashboard_stats(db: Session = Depends(get_db)):
     """Get dashboard statistics"""
     # Module usage counts (using demo user ID = 1)
-    resume_count = db.query(ResumeAnalysis).filter(
-        ResumeAnalysis.user_id == 1
-    ).count()
+    counters = usage_counters.get(db, 1)
+    resume_count = counters[RESUME_ANALYSES]
+    spam_count = counters[SPAM_CHECKS]
+    summary_count = counters[SUMMARIES_CREATED]
+    chat_count = counters[CHAT_MESSAGES]
     
-    spam_count = db.query(SpamCheck).filter(
-        SpamCheck.user_id == 1
-    ).count()
-    
-    summary_count = db.query(Summary).filter(
-        Summary.user_id == 1
-    ).count()
-    
-    chat_count = db.query(ChatMessage).join(ChatMessage.session).filter(
-        ChatMessage.role == "user"
-    ).count()
-    
-    # Recent activity (simplified without activity logs)
-    recent_activities = []
+    # Recent activity (raw events are kept for ACTIVITY_RAW_RETENTION_DAYS)
+    recent_activities = db.query(ActivityLog).filter(
+        ActivityLog.user_id == 1
+    ).order_by(ActivityLog.created_at.desc()).limit(10).all()
     
     return {
         "success": True,
@@ -40,26 +37,27 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
             "chat_messages": chat_count,
             "total_activities": resume_count + spam_count + summary_count + chat_count
         },
-        "recent_activities": []
+        "recent_activities": [
+            {
+                "module": a.module,
+                "action": a.action,
+                "details": a.details,
+                "created_at": a.created_at.isoformat()
+            }
+            for a in recent_activities
+        ]
     }
 
 @router.get("/usage-by-module")
 async def get_usage_by_module(db: Session = Depends(get_db)):
     """Get usage statistics by module"""
     # Get counts for each module (using demo user ID = 1)
+    counters = usage_counters.get(db, 1)
     modules = {
-        "Resume Analyzer": db.query(ResumeAnalysis).filter(
-            ResumeAnalysis.user_id == 1
-        ).count(),
-        "Spam Detector": db.query(SpamCheck).filter(
-            SpamCheck.user_id == 1
-        ).count(),
-        "Summarizer": db.query(Summary).filter(
-            Summary.user_id == 1
-        ).count(),
-        "AI Chatbot": db.query(ChatMessage).join(ChatMessage.session).filter(
-            ChatMessage.role == "user"
-        ).count()
+        "Resume Analyzer": counters[RESUME_ANALYSES],
+        "Spam Detector": counters[SPAM_CHECKS],
+        "Summarizer": counters[SUMMARIES_CREATED],
+        "AI Chatbot": counters[CHAT_MESSAGES]
     }
     
     return {
@@ -71,23 +69,67 @@ async def get_usage_by_module(db: Session = Depends(get_db)):
     }
 
 @router.get("/monthly-usage")
-async def get_monthly_usage(db: Session = Depends(get_db)):
-    """Get monthly usage statistics"""
-    # Simplified - return empty data for now
+async def get_monthly_usage(
+    months: int = 12,
+    db: Session = Depends(get_db)
+):
+    """Get monthly usage statistics for the last N months"""
+    months = max(1, min(months, settings.ACTIVITY_DAILY_RETENTION_DAYS // 30 or 1))
+    now = datetime.utcnow()
+    
+    # Month starts, oldest first
+    month_starts = []
+    year, month = now.year, now.month
+    for _ in range(months):
+        month_starts.append(datetime(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    month_starts.reverse()
+    
+    usage = {start.strftime("%Y-%m"): {} for start in month_starts}
+    for start, module, _, count in load_buckets(db, 1, DAY, month_starts[0]):  # Demo user
+        modules = usage[start.strftime("%Y-%m")]
+        modules[module] = modules.get(module, 0) + count
+    
     return {
         "success": True,
-        "monthly_usage": []
+        "monthly_usage": [
+            {"month": month, "total": sum(modules.values()), "modules": modules}
+            for month, modules in usage.items()
+        ]
     }
 
 @router.get("/activity-timeline")
 async def get_activity_timeline(
     days: int = 7,
+    granularity: str = DAY,
     db: Session = Depends(get_db)
 ):
-    """Get activity timeline for last N days"""
-    # Simplified - return empty data for now
+    """Get activity timeline for last N days, in daily or hourly buckets"""
+    if granularity not in (DAY, HOUR):
+        raise HTTPException(status_code=400, detail=f"Granularity must be '{DAY}' or '{HOUR}'")
+    retention = settings.ACTIVITY_HOURLY_RETENTION_DAYS if granularity == HOUR else settings.ACTIVITY_DAILY_RETENTION_DAYS
+    days = max(1, min(days, retention))
+    
+    step = timedelta(hours=1) if granularity == HOUR else timedelta(days=1)
+    end = bucket_start(datetime.utcnow(), granularity) + step
+    start = bucket_start(end - timedelta(days=days), granularity)
+    
+    # Every bucket in the range, including empty ones
+    timeline = {}
+    bucket = start
+    while bucket < end:
+        timeline[bucket] = {"total": 0}
+        bucket += step
+    
+    for bucket, module, _, count in load_buckets(db, 1, granularity, start, end):  # Demo user
+        entry = timeline.setdefault(bucket, {"total": 0})
+        entry[module] = entry.get(module, 0) + count
+        entry["total"] += count
+    
+    key_format = "%Y-%m-%d" if granularity == DAY else "%Y-%m-%dT%H:00"
     return {
         "success": True,
         "days": days,
-        "timeline": {}
+        "granularity": granularity,
+        "timeline": {bucket.strftime(key_format): entry for bucket, entry in timeline.items()}
     }
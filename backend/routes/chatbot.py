@@ -1,18 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+import json
 import uuid
 
-from database.database import get_db
+from database.database import get_db, SessionLocal
+from database.chat_queries import (
+    create_session_stats, delete_session_stats, get_session_stats,
+    load_recent_messages, record_inserted_messages
+)
+from database.write_behind import persistence_queue
 from models.models import ChatSession, ChatMessage
-from utils.logger import logger
-from services.chatbot_service import ChatbotService
+from utils.logger import logger, log_activity
+from utils.executor import inference_executor
+from services.chatbot_service import ChatbotService, context_start
+from services.registry import model_registry
 
 router = APIRouter(prefix="/chat", tags=["AI Chatbot"])
 
-# Initialize chatbot service (singleton)
-chatbot_service = ChatbotService()
+# Chatbot service is loaded by the model registry (singleton)
+model_registry.register("chatbot", ChatbotService)
+
+# Session stats are updated in the same transaction that inserts the messages
+persistence_queue.add_flush_hook(ChatMessage, record_inserted_messages)
 
 class ChatRequest(BaseModel):
     message: str
@@ -25,72 +37,91 @@ class ChatResponse(BaseModel):
     confidence: float
     metadata: dict
 
+def _get_or_create_session(db: Session, session_id: Optional[str]) -> ChatSession:
+    """Load the demo user's session or start a new one"""
+    if session_id:
+        session = db.query(ChatSession).filter(
+            ChatSession.session_id == session_id,
+            ChatSession.user_id == 1  # Demo user
+        ).first()
+        
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return session
+    
+    # Create new session
+    session = ChatSession(
+        user_id=1,  # Demo user
+        session_id=str(uuid.uuid4())
+    )
+    db.add(session)
+    db.flush()
+    create_session_stats(db, session.id)
+    db.commit()
+    db.refresh(session)
+    return session
+
+def _load_history(db: Session, session: ChatSession) -> List[Dict]:
+    """Get conversation history for context (only the messages the context can use)"""
+    # Load from the window start rather than a fixed number of recent
+    # messages, so the context only changes its start every few turns
+    message_count = _message_count(db, session.id)
+    return load_recent_messages(db, session.id, message_count - context_start(message_count))
+
+def _exchange_rows(session_pk: int, message: str, ai_response: Dict) -> List[Dict]:
+    """ChatMessage rows for the user message and assistant response, in order"""
+    return [
+        {
+            "session_id": session_pk,
+            "role": "user",
+            "content": message,
+            "confidence": None,
+            "intent": None
+        },
+        {
+            "session_id": session_pk,
+            "role": "assistant",
+            "content": ai_response['response'],
+            "confidence": ai_response['confidence'],
+            "intent": ai_response['intent']
+        }
+    ]
+
+def _message_count(db: Session, session_pk: int) -> int:
+    return get_session_stats(db, [session_pk])[session_pk]['message_count']
+
+def _response_metadata(ai_response: Dict, message_count: int) -> Dict:
+    return {
+        "has_context": ai_response['has_context'],
+        "model_used": ai_response['model_used'],
+        "context_length": ai_response['context_length'],
+        "message_count": message_count
+    }
+
 @router.post("/message", response_model=ChatResponse)
 async def send_message(
     request: ChatRequest,
     db: Session = Depends(get_db)
 ):
     """Send message to AI chatbot and get response"""
+    chatbot_service = model_registry.get("chatbot")
     try:
         # Get or create session
-        if request.session_id:
-            session = db.query(ChatSession).filter(
-                ChatSession.session_id == request.session_id,
-                ChatSession.user_id == 1  # Demo user
-            ).first()
-            
-            if not session:
-                raise HTTPException(status_code=404, detail="Session not found")
-        else:
-            # Create new session
-            session = ChatSession(
-                user_id=1,  # Demo user
-                session_id=str(uuid.uuid4())
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-        
-        # Get conversation history
-        history_messages = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at.asc()).all()
+        session = _get_or_create_session(db, request.session_id)
         
         # Build conversation history for context
-        conversation_history = [
-            {
-                "role": msg.role,
-                "content": msg.content
-            }
-            for msg in history_messages
-        ]
+        conversation_history = _load_history(db, session)
         
         # Generate AI response
-        ai_response = chatbot_service.chat(request.message, conversation_history)
-        
-        # Save user message
-        user_message = ChatMessage(
-            session_id=session.id,
-            role="user",
-            content=request.message
-        )
-        db.add(user_message)
-        
-        # Save assistant response
-        assistant_message = ChatMessage(
-            session_id=session.id,
-            role="assistant",
-            content=ai_response['response'],
-            confidence=ai_response['confidence'],
-            intent=ai_response['intent']
+        ai_response = await inference_executor.run(
+            "chatbot", chatbot_service.chat, request.message, conversation_history, session.session_id
         )
-        db.add(assistant_message)
         
-        db.commit()
-        
-        # Log activity
-        logger.info(f"Chat message processed, session {session.session_id}")
+        # Wait for the exchange to be committed so the next turn sees it as context
+        await persistence_queue.write_many(ChatMessage, _exchange_rows(session.id, request.message, ai_response))
+        message_count = _message_count(db, session.id)
         
+        log_activity(1, "chatbot", "message", ai_response['intent'])  # Demo user
         logger.info(f"Chat message processed, session {session.session_id}")
         
         return ChatResponse(
@@ -98,12 +129,7 @@ async def send_message(
             session_id=session.session_id,
             intent=ai_response['intent'],
             confidence=ai_response['confidence'],
-            metadata={
-                "has_context": ai_response['has_context'],
-                "model_used": ai_response['model_used'],
-                "context_length": ai_response['context_length'],
-                "message_count": len(conversation_history) + 1
-            }
+            metadata=_response_metadata(ai_response, message_count)
         )
         
     except HTTPException:
@@ -112,6 +138,63 @@ async def send_message(
         logger.error(f"Error in chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/message/stream")
+async def stream_message(
+    request: ChatRequest,
+    db: Session = Depends(get_db)
+):
+    """Send message to AI chatbot and stream the response as Server-Sent Events"""
+    chatbot_service = model_registry.get("chatbot")
+    session = _get_or_create_session(db, request.session_id)
+    conversation_history = _load_history(db, session)
+    session_pk, session_key = session.id, session.session_id
+    
+    def event_stream():
+        # Runs in Starlette's threadpool; persistence uses its own DB session
+        # because the request-scoped one may already be closed.
+        try:
+            ai_response = None
+            for event in chatbot_service.stream_chat(request.message, conversation_history):
+                if event['type'] == 'token':
+                    yield _sse("token", {"text": event['text']})
+                else:
+                    ai_response = event
+            
+            for saved in persistence_queue.submit_many(
+                ChatMessage, _exchange_rows(session_pk, request.message, ai_response)
+            ):
+                saved.result()
+            
+            stream_db = SessionLocal()
+            try:
+                message_count = _message_count(stream_db, session_pk)
+            finally:
+                stream_db.close()
+            
+            log_activity(1, "chatbot", "message", ai_response['intent'])  # Demo user
+            logger.info(f"Chat message streamed, session {session_key}")
+            
+            yield _sse("done", {
+                "response": ai_response['response'],
+                "session_id": session_key,
+                "intent": ai_response['intent'],
+                "confidence": ai_response['confidence'],
+                "metadata": _response_metadata(ai_response, message_count)
+            })
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/sessions")
 async def get_chat_sessions(db: Session = Depends(get_db)):
     """Get chat sessions"""
@@ -119,16 +202,19 @@ async def get_chat_sessions(db: Session = Depends(get_db)):
         ChatSession.user_id == 1  # Demo user
     ).order_by(ChatSession.updated_at.desc()).limit(10).all()
     
+    # Counts and previews come from the stats table, not from loading messages
+    stats = get_session_stats(db, [s.id for s in sessions])
+    
     return {
         "success": True,
         "count": len(sessions),
         "sessions": [
             {
                 "session_id": s.session_id,
-                "message_count": len(s.messages),
+                "message_count": stats[s.id]['message_count'],
                 "created_at": s.created_at.isoformat(),
                 "updated_at": s.updated_at.isoformat(),
-                "last_message": s.messages[-1].content[:50] + "..." if s.messages else None
+                "last_message": stats[s.id]['last_message_preview']
             }
             for s in sessions
         ]
@@ -137,9 +223,10 @@ async def get_chat_sessions(db: Session = Depends(get_db)):
 @router.get("/history/{session_id}")
 async def get_chat_history(
     session_id: str,
+    limit: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Get chat history for a session"""
+    """Get chat history for a session (only the last `limit` messages if given)"""
     session = db.query(ChatSession).filter(
         ChatSession.session_id == session_id,
         ChatSession.user_id == 1  # Demo user
@@ -148,9 +235,14 @@ async def get_chat_history(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session.id
-    ).order_by(ChatMessage.created_at.asc()).all()
+    if limit:
+        messages = db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id
+        ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit).all()[::-1]
+    else:
+        messages = db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id
+        ).order_by(ChatMessage.created_at.asc()).all()
     
     return {
         "success": True,
@@ -183,15 +275,18 @@ async def delete_session(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    delete_session_stats(db, session.id)
     db.delete(session)
     db.commit()
+    if model_registry.is_ready("chatbot"):
+        model_registry.get("chatbot").forget_session(session_id)
     
     return {"success": True, "message": "Session deleted"}
 
 @router.get("/model-info")
 async def get_model_info():
     """Get information about the AI model"""
-    info = chatbot_service.get_model_info()
+    info = model_registry.get("chatbot").get_model_info()
     return {
         "success": True,
         "model_info": info
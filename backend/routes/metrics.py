@@ -0,0 +1,66 @@
+from fastapi import APIRouter
+
+from database.database import get_pool_stats
+from database.write_behind import persistence_queue
+from database.activity import activity_recorder
+from utils.executor import inference_executor
+from services.registry import model_registry
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+@router.get("/executor")
+async def get_executor_metrics():
+    """Get queue depth and wait/run times of the inference worker pools"""
+    return {
+        "success": True,
+        "pools": inference_executor.get_stats()
+    }
+
+@router.get("/summary-cache")
+async def get_summary_cache_metrics():
+    """Get hit rate of the summarizer's analyzed-document cache"""
+    return {
+        "success": True,
+        "cache": model_registry.get("summary").get_cache_stats()
+    }
+
+@router.get("/resume-cache")
+async def get_resume_cache_metrics():
+    """Get hit rate of the resume analyzer's content-hash extraction cache"""
+    return {
+        "success": True,
+        "cache": model_registry.get("resume").extraction_cache.get_stats()
+    }
+
+@router.get("/chat-kv-cache")
+async def get_chat_kv_cache_metrics():
+    """Get hit rate of the chatbot's per-session attention key/value cache"""
+    kv_cache = model_registry.get("chatbot").kv_cache
+    return {
+        "success": True,
+        "cache": kv_cache.get_stats() if kv_cache is not None else None
+    }
+
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    """Get checkout wait times and usage of the database connection pools"""
+    return {
+        "success": True,
+        "pools": get_pool_stats()
+    }
+
+@router.get("/persistence")
+async def get_persistence_metrics():
+    """Get batch sizes and flush latency of the write-behind persistence queue"""
+    return {
+        "success": True,
+        "queue": persistence_queue.get_stats()
+    }
+
+@router.get("/activity")
+async def get_activity_metrics():
+    """Get pending events and flush counts of the activity recorder"""
+    return {
+        "success": True,
+        "recorder": activity_recorder.get_stats()
+    }
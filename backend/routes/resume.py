@@ -1,27 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
 import json
 from pathlib import Path
-import shutil
 
-from database.database import get_db
+from database.database import get_db, SessionLocal
+from database.write_behind import persistence_queue
 from models.models import ResumeAnalysis
-from utils.logger import logger
+from utils.logger import logger, log_activity
+from utils.executor import inference_executor
 from services.resume_service import ResumeAnalyzerService
+from services.resume_batch import (
+    BATCH_EXTENSIONS, BatchTooLargeError, ByteBudget, ResumeBatch, analyze_document,
+    iter_zip_documents, rank_analyses, resume_batch_store, score_batch
+)
+from services.skill_search import skill_search_index
+from services.registry import model_registry
 from config import settings
 
 router = APIRouter(prefix="/resume", tags=["Resume Analyzer"])
 
-resume_service = ResumeAnalyzerService()
+model_registry.register("resume", ResumeAnalyzerService)
+model_registry.register("resume_search", lambda: skill_search_index.load(SessionLocal))
+
+def _parse_required_skills(required_skills: Optional[str]) -> List[str]:
+    if not required_skills:
+        return []
+    return [s.strip() for s in required_skills.split(',') if s.strip()]
+
+def _check_upload_size(file: UploadFile) -> int:
+    """Reject uploads over MAX_UPLOAD_SIZE before any of their content is parsed; returns the size"""
+    size = file.size
+    if size is None:
+        # Older clients: measure the spooled file without reading it
+        size = file.file.seek(0, 2)
+        file.file.seek(0)
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{file.filename} is too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB"
+        )
+    return size
+
+def _batch_result(analysis: Dict) -> Dict:
+    return {
+        "analysis_id": analysis['analysis_id'],
+        "rank": analysis['rank'],
+        "filename": analysis['filename'],
+        "match_score": analysis['match_score'],
+        "missing_skills": analysis['missing_skills'],
+        "skills_found": analysis['skills_found'],
+        "total_skills_found": analysis['total_skills_found'],
+        "contact_info": analysis['contact_info']
+    }
 
 @router.post("/analyze")
 async def analyze_resume(
     file: UploadFile = File(...),
-    required_skills: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    required_skills: Optional[str] = Form(None)
 ):
     """Analyze uploaded resume"""
+    resume_service = model_registry.get("resume")
     try:
         # Validate file type
         file_ext = Path(file.filename).suffix.lower()
@@ -31,44 +71,35 @@ async def analyze_resume(
                 detail=f"File type not allowed. Allowed types: {settings.ALLOWED_EXTENSIONS}"
             )
         
-        # Save uploaded file
-        file_path = settings.UPLOAD_DIR / f"demo_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        _check_upload_size(file)
         
         # Parse required skills
-        skills_list = []
-        if required_skills:
-            skills_list = [s.strip() for s in required_skills.split(',') if s.strip()]
-        
-        # Analyze resume
-        analysis_result = resume_service.analyze_resume(file_path, skills_list)
+        skills_list = _parse_required_skills(required_skills)
         
-        # Save to database (using demo user ID = 1)
-        resume_analysis = ResumeAnalysis(
-            user_id=1,  # Demo user
-            filename=file.filename,
-            extracted_text=analysis_result['extracted_text'],
-            skills_found=json.dumps(analysis_result['skills_found']),
-            match_score=analysis_result['match_score'],
-            missing_skills=json.dumps(analysis_result['missing_skills'])
+        # Analyze resume straight from the spooled upload; nothing is copied to disk
+        analysis_result = await inference_executor.run(
+            "resume", resume_service.analyze_resume, file.file, skills_list, file_ext
         )
         
-        db.add(resume_analysis)
-        db.commit()
-        db.refresh(resume_analysis)
+        # Save to database (using demo user ID = 1)
+        analysis_id = await persistence_queue.write(ResumeAnalysis, {
+            "user_id": 1,  # Demo user
+            "filename": file.filename,
+            "extracted_text": analysis_result['extracted_text'],
+            "skills_found": json.dumps(analysis_result['skills_found']),
+            "match_score": analysis_result['match_score'],
+            "missing_skills": json.dumps(analysis_result['missing_skills'])
+        })
+        skill_search_index.add(analysis_id, analysis_result['skills_found'], analysis_result['match_score'])
         
         # Log activity
-        logger.info(f"Resume analyzed: {file.filename}")
-        
-        # Clean up file
-        file_path.unlink()
+        log_activity(1, "resume", "analyze", file.filename)  # Demo user
         
         logger.info(f"Resume analyzed: {file.filename}")
         
         return {
             "success": True,
-            "analysis_id": resume_analysis.id,
+            "analysis_id": analysis_id,
             "filename": file.filename,
             "skills_found": analysis_result['skills_found'],
             "total_skills_found": analysis_result['total_skills_found'],
@@ -77,10 +108,157 @@ async def analyze_resume(
             "contact_info": analysis_result['contact_info']
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing resume: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze-batch")
+async def analyze_resume_batch(
+    files: List[UploadFile] = File(...),
+    required_skills: Optional[str] = Form(None),
+    page_size: int = Form(settings.RESUME_BATCH_PAGE_SIZE)
+):
+    """Screen many resumes (PDF/TXT files or zips of them) against the same required skills"""
+    budget = ByteBudget(settings.RESUME_BATCH_MAX_MB * 1024 * 1024)
+    extractions = []
+    
+    def submit(filename: str, data: bytes):
+        # Extraction starts while the rest of the batch is still being read
+        extractions.append(asyncio.ensure_future(
+            inference_executor.run("resume_extract", analyze_document, filename, data)
+        ))
+    
+    try:
+        for upload in files:
+            file_ext = Path(upload.filename or "").suffix.lower()
+            if file_ext == '.zip':
+                members = iter_zip_documents(
+                    upload.file, settings.RESUME_BATCH_MAX_FILES - len(extractions), settings.MAX_UPLOAD_SIZE, budget
+                )
+                # Members are decompressed one at a time off the event loop
+                while (document := await inference_executor.run("resume", next, members, None)) is not None:
+                    submit(*document)
+            elif file_ext in BATCH_EXTENSIONS:
+                budget.take(_check_upload_size(upload), upload.filename)
+                submit(upload.filename, await upload.read())
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File type not allowed: {upload.filename}. Use PDF, TXT or ZIP."
+                )
+            
+            if len(extractions) > settings.RESUME_BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Too many files. Maximum batch size is {settings.RESUME_BATCH_MAX_FILES}"
+                )
+        
+        if not extractions:
+            raise HTTPException(status_code=400, detail="No resumes provided")
+        
+        skills_list = _parse_required_skills(required_skills)
+        
+        # Extract text and skills in parallel worker processes
+        analyses = await asyncio.gather(*extractions)
+        failed = [{"filename": a['filename'], "error": a['error']} for a in analyses if a['error']]
+        analyses = score_batch([a for a in analyses if not a['error']], skills_list)
+        
+        # Bulk insert (using demo user ID = 1), returning ids in upload order
+        if analyses:
+            analysis_ids = await persistence_queue.write_many(ResumeAnalysis, [
+                {
+                    "user_id": 1,  # Demo user
+                    "filename": a['filename'],
+                    "extracted_text": a['extracted_text'],
+                    "skills_found": json.dumps(a['skills_found']),
+                    "match_score": a['match_score'],
+                    "missing_skills": json.dumps(a['missing_skills'])
+                }
+                for a in analyses
+            ])
+            for analysis, analysis_id in zip(analyses, analysis_ids):
+                analysis['analysis_id'] = analysis_id
+            skill_search_index.add_many(
+                (a['analysis_id'], a['skills_found'], a['match_score']) for a in analyses
+            )
+        
+        ranked = [_batch_result(a) for a in rank_analyses(analyses)]
+        batch = resume_batch_store.add(ResumeBatch(skills_list, ranked, failed))
+        
+        log_activity(1, "resume", "analyze_batch", f"{len(ranked)} analyzed, {len(failed)} failed")  # Demo user
+        logger.info(f"Resume batch {batch.batch_id}: {len(ranked)} analyzed, {len(failed)} failed")
+        
+        return {"success": True, **batch.page(1, max(1, page_size))}
+        
+    except HTTPException:
+        raise
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error analyzing resume batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Drop queued extractions of a batch that was rejected part way through
+        for extraction in extractions:
+            extraction.cancel()
+
+@router.get("/analyze-batch/{batch_id}")
+async def get_resume_batch(
+    batch_id: str,
+    page: int = 1,
+    page_size: int = settings.RESUME_BATCH_PAGE_SIZE
+):
+    """Page through the ranked results of a screening batch"""
+    batch = resume_batch_store.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"success": True, **batch.page(max(1, page), max(1, page_size))}
+
+@router.get("/search")
+async def search_resumes(
+    skills: str,
+    min_score: Optional[float] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    """Find past analyses that have every listed skill (comma-separated), best match first"""
+    skills_list = _parse_required_skills(skills)
+    if not skills_list:
+        raise HTTPException(status_code=400, detail="No skills provided")
+    
+    index = model_registry.get("resume_search")
+    limit = max(1, min(limit, 200))
+    result = index.search(skills_list, min_score, limit, max(0, offset))
+    
+    # Fetch details only for the page being returned
+    rows = {
+        a.id: a for a in db.query(ResumeAnalysis).filter(
+            ResumeAnalysis.id.in_(result['analysis_ids'])
+        ).all()
+    } if result['analysis_ids'] else {}
+    
+    return {
+        "success": True,
+        "skills": skills_list,
+        "total": result['total'],
+        "limit": limit,
+        "offset": offset,
+        "analyses": [
+            {
+                "id": analysis_id,
+                "filename": rows[analysis_id].filename,
+                "match_score": rows[analysis_id].match_score,
+                "created_at": rows[analysis_id].created_at.isoformat()
+            }
+            for analysis_id in result['analysis_ids'] if analysis_id in rows
+        ]
+    }
+
 @router.get("/history")
 async def get_resume_history(db: Session = Depends(get_db)):
     """Get resume analysis history"""
@@ -1,73 +1,190 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pathlib import Path
 import json
+import uuid
 
-from database.database import get_db
+from database.database import get_async_db
+from database.counters import SPAM_CHECKS, SPAM_DETECTED, usage_counters
+from database.write_behind import persistence_queue
 from models.models import SpamCheck
-from utils.logger import logger
+from utils.logger import logger, log_activity
+from utils.executor import inference_executor
 from services.spam_service import SpamDetectorService
+from services.registry import model_registry
+from services.spam_ingest import scan_job_manager, FORMATS
+from config import settings
 
 router = APIRouter(prefix="/spam", tags=["Spam Detector"])
 
-spam_service = SpamDetectorService()
+model_registry.register("spam", SpamDetectorService)
 
 class EmailCheck(BaseModel):
     email_text: str
 
+class EmailBatchCheck(BaseModel):
+    emails: List[str]
+
+def _spam_check_row(email_text: str, result: Dict) -> Dict:
+    """SpamCheck column values for one result (using demo user ID = 1)"""
+    return {
+        "user_id": 1,  # Demo user
+        "email_text": email_text[:1000],  # Store first 1000 chars
+        "is_spam": result['is_spam'],
+        "confidence": result['confidence'],
+        "features": json.dumps(result['features'])
+    }
+
+def _format_result(result: Dict) -> Dict:
+    return {
+        "is_spam": result['is_spam'],
+        "classification": result['classification'],
+        "confidence": result['confidence'],
+        "risk_level": result['risk_level'],
+        "reasons": result['reasons'],
+        "features": {
+            "spam_keywords": result['features']['spam_keyword_count'],
+            "phishing_patterns": result['features']['phishing_pattern_count'],
+            "suspicious_patterns": result['features']['suspicious_patterns'][:3]  # Top 3
+        }
+    }
+
 @router.post("/check")
-async def check_spam(
-    email_data: EmailCheck,
-    db: Session = Depends(get_db)
-):
+async def check_spam(email_data: EmailCheck):
     """Check if email is spam or phishing"""
+    spam_service = model_registry.get("spam")
     try:
         # Detect spam
-        result = spam_service.detect_spam(email_data.email_text)
+        result = await inference_executor.run("spam", spam_service.detect_spam, email_data.email_text)
         
-        # Save to database (using demo user ID = 1)
-        spam_check = SpamCheck(
-            user_id=1,  # Demo user
-            email_text=email_data.email_text[:1000],  # Store first 1000 chars
-            is_spam=result['is_spam'],
-            confidence=result['confidence'],
-            features=json.dumps(result['features'])
-        )
-        
-        db.add(spam_check)
-        db.commit()
-        db.refresh(spam_check)
+        # Save to database (group-committed with concurrent checks)
+        check_id = await persistence_queue.write(SpamCheck, _spam_check_row(email_data.email_text, result))
         
         # Log activity
-        logger.info(f"Spam check - Result: {result['classification']}")
+        log_activity(1, "spam", "check", result['classification'])  # Demo user
         
         logger.info(f"Spam check: {result['classification']}")
         
         return {
             "success": True,
-            "check_id": spam_check.id,
-            "is_spam": result['is_spam'],
-            "classification": result['classification'],
-            "confidence": result['confidence'],
-            "risk_level": result['risk_level'],
-            "reasons": result['reasons'],
-            "features": {
-                "spam_keywords": result['features']['spam_keyword_count'],
-                "phishing_patterns": result['features']['phishing_pattern_count'],
-                "suspicious_patterns": result['features']['suspicious_patterns'][:3]  # Top 3
-            }
+            "check_id": check_id,
+            **_format_result(result)
         }
         
     except Exception as e:
         logger.error(f"Error checking spam: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/check-batch")
+async def check_spam_batch(batch: EmailBatchCheck):
+    """Check many emails in one vectorized pass"""
+    if not batch.emails:
+        raise HTTPException(status_code=400, detail="No emails provided")
+    if len(batch.emails) > settings.SPAM_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many emails. Maximum batch size is {settings.SPAM_BATCH_MAX_SIZE}"
+        )
+    
+    spam_service = model_registry.get("spam")
+    try:
+        results = await inference_executor.run("spam", spam_service.detect_spam_batch, batch.emails)
+        
+        # Bulk insert, returning ids in input order
+        rows = [_spam_check_row(text, result) for text, result in zip(batch.emails, results)]
+        check_ids = await persistence_queue.write_many(SpamCheck, rows)
+        
+        spam_count = sum(1 for result in results if result['is_spam'])
+        log_activity(1, "spam", "check_batch", f"{spam_count}/{len(results)} spam")  # Demo user
+        logger.info(f"Spam batch check: {spam_count}/{len(results)} spam")
+        
+        return {
+            "success": True,
+            "count": len(results),
+            "spam_count": spam_count,
+            "results": [
+                {"check_id": check_id, **_format_result(result)}
+                for check_id, result in zip(check_ids, results)
+            ]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking spam batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/scan-jobs")
+async def start_scan_job(
+    archive: UploadFile = File(...),
+    archive_format: Optional[str] = Form(None)
+):
+    """Upload an mbox/JSONL archive and scan it in the background"""
+    if archive_format and archive_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of {FORMATS}")
+    
+    spam_service = model_registry.get("spam")
+    suffix = Path(archive.filename or "").suffix.lower() or ".mbox"
+    archive_path = settings.UPLOAD_DIR / f"scan_{uuid.uuid4().hex}{suffix}"
+    max_bytes = settings.SPAM_SCAN_MAX_ARCHIVE_MB * 1024 * 1024
+    try:
+        # Copy the upload in chunks; the archive is never held in memory
+        copied = 0
+        with open(archive_path, "wb") as buffer:
+            while chunk := await archive.read(1024 * 1024):
+                copied += len(chunk)
+                if copied > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Archive too large. Maximum size is {settings.SPAM_SCAN_MAX_ARCHIVE_MB}MB"
+                    )
+                buffer.write(chunk)
+        
+        job = scan_job_manager.start(spam_service, archive_path, archive_format)
+        logger.info(f"Spam scan job {job.job_id} started for {archive.filename}")
+        return {"success": True, "job": job.to_dict()}
+        
+    except HTTPException:
+        archive_path.unlink(missing_ok=True)
+        raise
+    except ValueError as e:
+        # Unknown archive format
+        archive_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        archive_path.unlink(missing_ok=True)
+        logger.error(f"Error starting spam scan: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scan-jobs/{job_id}")
+async def get_scan_job(job_id: str):
+    """Poll the progress of an archive scan"""
+    job = scan_job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return {"success": True, "job": job.to_dict()}
+
+@router.get("/scan-jobs/{job_id}/results")
+async def get_scan_job_results(job_id: str):
+    """Download scan results as JSONL (partial while the job is running)"""
+    job = scan_job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    if not job.results_path.exists():
+        raise HTTPException(status_code=404, detail="No results yet")
+    return FileResponse(job.results_path, media_type="application/x-ndjson",
+                        filename=f"spam_scan_{job_id}.jsonl")
+
 @router.get("/history")
-async def get_spam_history(db: Session = Depends(get_db)):
+async def get_spam_history(db: AsyncSession = Depends(get_async_db)):
     """Get spam check history"""
-    checks = db.query(SpamCheck).filter(
-        SpamCheck.user_id == 1  # Demo user
-    ).order_by(SpamCheck.created_at.desc()).limit(20).all()
+    checks = (await db.scalars(
+        select(SpamCheck).where(
+            SpamCheck.user_id == 1  # Demo user
+        ).order_by(SpamCheck.created_at.desc()).limit(20)
+    )).all()
     
     return {
         "success": True,
@@ -85,16 +202,11 @@ async def get_spam_history(db: Session = Depends(get_db)):
     }
 
 @router.get("/stats")
-async def get_spam_stats(db: Session = Depends(get_db)):
+async def get_spam_stats(db: AsyncSession = Depends(get_async_db)):
     """Get spam detection statistics"""
-    total_checks = db.query(SpamCheck).filter(
-        SpamCheck.user_id == 1  # Demo user
-    ).count()
-    
-    spam_count = db.query(SpamCheck).filter(
-        SpamCheck.user_id == 1,  # Demo user
-        SpamCheck.is_spam == True
-    ).count()
+    counters = await usage_counters.get_async(db, 1)  # Demo user
+    total_checks = counters[SPAM_CHECKS]
+    spam_count = counters[SPAM_DETECTED]
     
     legitimate_count = total_checks - spam_count
     
@@ -1,62 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import tempfile
+from pathlib import Path
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 
 from database.database import get_db
+from database.write_behind import persistence_queue
 from models.models import Summary
-from utils.logger import logger
+from utils.logger import logger, log_activity
+from utils.executor import inference_executor
 from services.summary_service import SummarizerService
+from services.sentence_ranking import RANKING_ALGORITHMS
+from services.summary_mapreduce import iter_chunked_summary
+from services.registry import model_registry
+from routes.resume import _check_upload_size
 
 router = APIRouter(prefix="/summary", tags=["Summarizer"])
 
-summary_service = SummarizerService()
+UPLOAD_EXTENSIONS = {".txt", ".pdf"}
+
+model_registry.register("summary", SummarizerService)
 
 class SummarizeRequest(BaseModel):
     text: str
     summary_ratio: Optional[float] = 0.3
     max_length: Optional[int] = None
+    algorithm: Optional[str] = "frequency"  # frequency, tfidf or textrank
+
+def _validate_request(request: SummarizeRequest):
+    if len(request.text) < 100:
+        raise HTTPException(
+            status_code=400,
+            detail="Text too short. Minimum 100 characters required."
+        )
+    
+    if request.algorithm not in RANKING_ALGORITHMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown algorithm. Use one of: {', '.join(RANKING_ALGORITHMS)}"
+        )
+
+def _sse(event: str, data: Dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/create")
-async def create_summary(
-    request: SummarizeRequest,
-    db: Session = Depends(get_db)
-):
+async def create_summary(request: SummarizeRequest):
     """Generate summary from text"""
+    summary_service = model_registry.get("summary")
     try:
         # Validate input
-        if len(request.text) < 100:
-            raise HTTPException(
-                status_code=400,
-                detail="Text too short. Minimum 100 characters required."
-            )
+        _validate_request(request)
         
         # Generate summary
         if request.max_length:
-            result = summary_service.summarize_with_length(request.text, request.max_length)
+            result = await inference_executor.run(
+                "summary", summary_service.summarize_with_length, request.text, request.max_length, request.algorithm
+            )
         else:
-            result = summary_service.generate_summary(request.text, request.summary_ratio)
+            result = await inference_executor.run(
+                "summary", summary_service.generate_summary, request.text, request.summary_ratio, request.algorithm
+            )
         
         # Save to database (using demo user ID = 1)
-        summary = Summary(
-            user_id=1,  # Demo user
-            original_text=request.text[:2000],  # Store first 2000 chars
-            summary_text=result['summary'],
-            compression_ratio=result['compression_ratio']
-        )
-        
-        db.add(summary)
-        db.commit()
-        db.refresh(summary)
+        summary_id = await persistence_queue.write(Summary, {
+            "user_id": 1,  # Demo user
+            "original_text": request.text[:2000],  # Store first 2000 chars
+            "summary_text": result['summary'],
+            "compression_ratio": result['compression_ratio']
+        })
         
         # Log activity
-        logger.info(f"Created summary - Compression: {result['compression_ratio']}")
+        log_activity(1, "summary", "create", f"Compression: {result['compression_ratio']}")  # Demo user
         
         logger.info(f"Summary created")
         
         return {
             "success": True,
-            "summary_id": summary.id,
+            "summary_id": summary_id,
             "summary": result['summary'],
             "bullet_points": result['bullet_points'],
             "metrics": {
@@ -66,7 +90,8 @@ async def create_summary(
                 "sentences_original": result['sentences_original'],
                 "sentences_summary": result['sentences_summary']
             },
-            "key_terms": result['key_terms']
+            "key_terms": result['key_terms'],
+            "algorithm": request.algorithm
         }
         
     except HTTPException:
@@ -75,6 +100,128 @@ async def create_summary(
         logger.error(f"Error creating summary: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _chunked_event_stream(summary_service, pieces, summary_ratio: float,
+                          algorithm: str, max_length: Optional[int], source: str):
+    """
+    Run a chunked summary and format its progress as Server-Sent Events.
+    Runs in Starlette's threadpool, so it can block on the persistence queue.
+    """
+    head = []
+    
+    def keep_head(pieces):
+        # Only the first 2000 chars are stored, so never hold on to more
+        kept = 0
+        for piece in pieces:
+            if kept < 2000:
+                head.append(piece[:2000 - kept])
+                kept += len(head[-1])
+            yield piece
+    
+    try:
+        final = None
+        for event in iter_chunked_summary(
+            summary_service, keep_head(pieces), summary_ratio, algorithm, max_length
+        ):
+            if event['type'] == 'done':
+                final = event
+            else:
+                yield _sse(event['type'], {k: v for k, v in event.items() if k != 'type'})
+        
+        summary_id = persistence_queue.submit(Summary, {
+            "user_id": 1,  # Demo user
+            "original_text": ''.join(head),  # Store first 2000 chars
+            "summary_text": final['summary'],
+            "compression_ratio": final['metrics']['compression_ratio']
+        }).result()
+        
+        log_activity(1, "summary", "create_chunked", source)  # Demo user
+        logger.info(f"Chunked summary created from {source} - Sections: {final['metrics']['sections']}")
+        
+        yield _sse("done", {
+            "summary_id": summary_id,
+            "summary": final['summary'],
+            "bullet_points": final['bullet_points'],
+            "metrics": final['metrics'],
+            "key_terms": final['key_terms'],
+            "algorithm": algorithm
+        })
+    except Exception as e:
+        logger.error(f"Error creating chunked summary from {source}: {str(e)}")
+        yield _sse("error", {"detail": str(e)})
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/create/chunked")
+async def create_chunked_summary(request: SummarizeRequest):
+    """
+    Summarize a long document section by section, streaming progress as
+    Server-Sent Events: 'chunk' per finished section, 'level' when another
+    reduce pass is needed, then 'done' with the final summary
+    """
+    summary_service = model_registry.get("summary")
+    _validate_request(request)
+    
+    return _sse_response(_chunked_event_stream(
+        summary_service, (request.text,), request.summary_ratio,
+        request.algorithm, request.max_length, "text"
+    ))
+
+@router.post("/upload")
+async def summarize_upload(
+    file: UploadFile = File(...),
+    summary_ratio: float = Form(0.3),
+    max_length: Optional[int] = Form(None),
+    algorithm: str = Form("frequency")
+):
+    """
+    Summarize an uploaded TXT or PDF file. The file is read in chunks (pages
+    for PDF) and fed to the chunked summarizer as it is read; progress is
+    streamed like /summary/create/chunked
+    """
+    summary_service = model_registry.get("summary")
+    resume_service = model_registry.get("resume")  # Owns the text extraction
+    
+    file_ext = Path(file.filename or "").suffix.lower()
+    if file_ext not in UPLOAD_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {UPLOAD_EXTENSIONS}"
+        )
+    
+    _check_upload_size(file)
+    
+    if algorithm not in RANKING_ALGORITHMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown algorithm. Use one of: {', '.join(RANKING_ALGORITHMS)}"
+        )
+    
+    # The response streams after this handler returns, when the framework may
+    # already have closed the upload, so read from a copy the stream owns
+    copy = tempfile.TemporaryFile()
+    try:
+        while chunk := await file.read(1024 * 1024):
+            copy.write(chunk)
+        copy.seek(0)
+    except Exception:
+        copy.close()
+        raise
+    
+    def pieces():
+        try:
+            yield from resume_service.iter_text(copy, file_ext)
+        finally:
+            copy.close()
+    
+    return _sse_response(_chunked_event_stream(
+        summary_service, pieces(), summary_ratio, algorithm, max_length, file.filename
+    ))
+
 @router.get("/history")
 async def get_summary_history(db: Session = Depends(get_db)):
     """Get summary history"""
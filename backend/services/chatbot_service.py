@@ -1,15 +1,37 @@
 import torch
 import re
 import random
-from typing import Dict, List, Tuple
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import threading
+from typing import Dict, Iterator, List, Tuple
+from transformers import (
+    AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer, pipeline
+)
 from config import settings
-import nltk
+from services.generation_batcher import GenerationBatcher
+from services.kv_cache import SessionKVCache
+from services.model_backends import load_causal_lm
+from utils.executor import inference_executor
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+# The context holds whole exchanges (user message + reply) and its start only
+# moves forward CONTEXT_STEP messages at a time, so consecutive turns share a
+# prompt prefix and the session KV cache can reuse it between steps
+CONTEXT_WINDOW = 2 * -(-settings.MAX_CONTEXT_LENGTH // 2)
+CONTEXT_STEP = 2 * -(-CONTEXT_WINDOW // 4)
+
+def context_start(message_count: int) -> int:
+    """Index of the first stored message that goes into the context of the next turn"""
+    if message_count <= CONTEXT_WINDOW:
+        return 0
+    return -(-(message_count - CONTEXT_WINDOW) // CONTEXT_STEP) * CONTEXT_STEP
+
+class _StopOnEvent(StoppingCriteria):
+    """Stop generation once the streaming consumer has seen the end of the reply"""
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
 
 class ChatbotService:
     """
@@ -28,31 +50,48 @@ class ChatbotService:
         'identity': [r'\b(who are you|what are you|your name)\b'],
     }
     
+    # Sampling settings shared by the pipeline and batched generation
+    GENERATION_KWARGS = {
+        'temperature': 0.8,
+        'top_p': 0.9,
+        'top_k': 50,
+        'do_sample': True,
+        'no_repeat_ngram_size': 3,
+        'repetition_penalty': 1.2
+    }
+    
     def __init__(self):
         """Initialize the chatbot with GPT-2 model"""
         self.model_name = settings.CHATBOT_MODEL
         self.max_length = settings.MAX_RESPONSE_LENGTH
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.requested_backend = settings.CHATBOT_INFERENCE_BACKEND
+        self.backend = None
+        self.backend_details = {}
         
-        print(f"Loading chatbot model: {self.model_name} on {self.device}...")
+        print(f"Loading chatbot model: {self.model_name} on {self.device} ({self.requested_backend})...")
         
         try:
             # Load tokenizer and model
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-            self.model.to(self.device)
+            self.model, self.backend, self.backend_details = load_causal_lm(
+                self.model_name, self.requested_backend, self.device
+            )
             
-            # Set pad token
+            # Set pad token; decoder-only models need left padding for batching
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = "left"
             
-            # Create text generation pipeline
-            self.generator = pipeline(
-                'text-generation',
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=0 if self.device == "cuda" else -1
-            )
+            # Create text generation pipeline (ONNX Runtime models call generate directly)
+            self.generator = None
+            if self.backend != "onnx":
+                self.generator = pipeline(
+                    'text-generation',
+                    model=self.model,
+                    tokenizer=self.tokenizer,
+                    device=0 if self.device == "cuda" else -1
+                )
             
             print("Chatbot model loaded successfully!")
             
@@ -61,6 +100,24 @@ class ChatbotService:
             self.model = None
             self.tokenizer = None
             self.generator = None
+        
+        # Coalesce concurrent prompts into padded batches
+        self.batcher = None
+        if self.model is not None and settings.CHAT_BATCHING_ENABLED:
+            self.batcher = GenerationBatcher(
+                self.generate_batch,
+                max_batch_size=settings.CHAT_BATCH_MAX_SIZE,
+                window_ms=settings.CHAT_BATCH_WINDOW_MS
+            )
+        
+        # Reuse attention keys/values of earlier turns per session
+        # (ONNX Runtime models keep their own past_key_values layout)
+        self.kv_cache = None
+        if self.model is not None and settings.CHAT_KV_CACHE_ENABLED and self.backend != "onnx":
+            self.kv_cache = SessionKVCache(
+                max_sessions=settings.CHAT_KV_CACHE_MAX_SESSIONS,
+                max_bytes=settings.CHAT_KV_CACHE_MAX_MB * 1024 * 1024
+            )
     
     def detect_intent(self, message: str) -> Tuple[str, float]:
         """Detect user intent from message"""
@@ -93,56 +150,180 @@ class ChatbotService:
         
         return "\n".join(context_parts)
     
-    def generate_response_with_model(self, prompt: str, context: str = "") -> str:
-        """Generate response using GPT-2 model"""
-        if self.generator is None:
-            return self._fallback_response(prompt)
+    def build_prompt(self, prompt: str, context: str = "") -> str:
+        """Build full model prompt with context"""
+        if context:
+            return f"{context}\nHuman: {prompt}\nAssistant:"
+        return f"Human: {prompt}\nAssistant:"
+    
+    def extract_response(self, generated_text: str) -> str:
+        """Extract and trim the assistant's reply from generated text"""
+        if "Assistant:" not in generated_text:
+            return ""
         
-        try:
-            # Build full prompt with context
-            if context:
-                full_prompt = f"{context}\nHuman: {prompt}\nAssistant:"
+        response = generated_text.split("Assistant:")[-1].strip()
+        # Clean up response
+        response = response.split("Human:")[0].strip()
+        response = response.split("\n")[0].strip()
+        
+        # Remove incomplete sentences
+        if response and not response[-1] in '.!?':
+            sentences = response.split('.')
+            if len(sentences) > 1:
+                response = '.'.join(sentences[:-1]) + '.'
+        
+        return response
+    
+    def generate_batch(self, full_prompts: List[str]) -> List[str]:
+        """Generate continuations for several prompts in one left-padded batch"""
+        encoded = self.tokenizer(full_prompts, return_tensors="pt", padding=True).to(self.device)
+        
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                **encoded,
+                max_new_tokens=self.max_length,
+                pad_token_id=self.tokenizer.eos_token_id,
+                **self.GENERATION_KWARGS
+            )
+        
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+    
+    def generate_with_session_cache(self, full_prompt: str, session_key: str) -> str:
+        """Generate for a session, encoding only the tokens added since its last prompt"""
+        input_ids = self.tokenizer(full_prompt, return_tensors="pt").input_ids.to(self.device)
+        ids = input_ids[0].tolist()
+        past, cached_len = self.kv_cache.lookup(session_key, ids)
+        
+        with torch.no_grad():
+            # Prefill the prompt on top of the cached prefix
+            if past is not None:
+                outputs = self.model(input_ids=input_ids[:, cached_len:], past_key_values=past, use_cache=True)
             else:
-                full_prompt = f"Human: {prompt}\nAssistant:"
+                outputs = self.model(input_ids=input_ids, use_cache=True)
+            prompt_past = outputs.past_key_values
+            if hasattr(prompt_past, "to_legacy_cache"):
+                prompt_past = prompt_past.to_legacy_cache()
+            self.kv_cache.store(session_key, ids, prompt_past)
             
-            # Generate response
-            outputs = self.generator(
-                full_prompt,
-                max_length=len(full_prompt.split()) + self.max_length,
-                num_return_sequences=1,
-                temperature=0.8,
-                top_p=0.9,
-                top_k=50,
-                do_sample=True,
+            # generate() re-feeds the final prompt token, so hand it everything before it
+            generate_past = tuple(
+                (key[:, :, :-1, :], value[:, :, :-1, :]) for key, value in prompt_past
+            )
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=generate_past,
+                max_new_tokens=self.max_length,
                 pad_token_id=self.tokenizer.eos_token_id,
-                no_repeat_ngram_size=3,
-                repetition_penalty=1.2
+                **self.GENERATION_KWARGS
             )
+        
+        return self.tokenizer.decode(output_ids[0], skip_special_tokens=True)
+    
+    def generate_response_with_model(self, prompt: str, context: str = "", session_key: str = None) -> str:
+        """Generate response using GPT-2 model"""
+        if self.model is None:
+            return self._fallback_response(prompt)
+        
+        try:
+            # Build full prompt with context
+            full_prompt = self.build_prompt(prompt, context)
             
-            # Extract generated text
-            generated_text = outputs[0]['generated_text']
+            # Generate response: follow-up turns reuse the session's KV cache,
+            # fresh conversations go through the batcher
+            if session_key and context and self.kv_cache is not None:
+                generated_text = self.generate_with_session_cache(full_prompt, session_key)
+            elif self.batcher is not None:
+                generated_text = self.batcher.submit(full_prompt)
+            elif self.generator is None:
+                generated_text = self.generate_batch([full_prompt])[0]
+            else:
+                outputs = self.generator(
+                    full_prompt,
+                    max_length=len(full_prompt.split()) + self.max_length,
+                    num_return_sequences=1,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    **self.GENERATION_KWARGS
+                )
+                generated_text = outputs[0]['generated_text']
             
             # Extract only the assistant's response
-            if "Assistant:" in generated_text:
-                response = generated_text.split("Assistant:")[-1].strip()
-                # Clean up response
-                response = response.split("Human:")[0].strip()
-                response = response.split("\n")[0].strip()
-                
-                # Remove incomplete sentences
-                if response and not response[-1] in '.!?':
-                    sentences = response.split('.')
-                    if len(sentences) > 1:
-                        response = '.'.join(sentences[:-1]) + '.'
-                
-                return response if response else self._fallback_response(prompt)
-            
-            return self._fallback_response(prompt)
+            response = self.extract_response(generated_text)
+            return response if response else self._fallback_response(prompt)
             
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             return self._fallback_response(prompt)
     
+    def _generate_streaming(self, encoded, streamer: TextIteratorStreamer, stop_event: threading.Event):
+        """Run model.generate feeding tokens into a streamer"""
+        try:
+            with torch.no_grad():
+                self.model.generate(
+                    **encoded,
+                    max_new_tokens=self.max_length,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop_event)]),
+                    **self.GENERATION_KWARGS
+                )
+        finally:
+            # Unblock the consumer even if generation failed
+            streamer.end()
+    
+    def stream_response_with_model(self, prompt: str, context: str = "") -> Iterator[Tuple[str, str]]:
+        """
+        Stream the reply as it is generated.
+        
+        Yields ("token", text) deltas of the visible reply (the first line
+        after "Assistant:", cut before any "Human:" turn), then a final
+        ("response", text) with the same trimming as generate_response_with_model.
+        """
+        if self.model is None:
+            response = self._fallback_response(prompt)
+            yield "token", response
+            yield "response", response
+            return
+        
+        full_prompt = self.build_prompt(prompt, context)
+        encoded = self.tokenizer(full_prompt, return_tensors="pt").to(self.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop_event = threading.Event()
+        inference_executor.submit("chatbot", self._generate_streaming, encoded, streamer, stop_event)
+        
+        raw = ""
+        emitted = 0
+        try:
+            for new_text in streamer:
+                raw += new_text
+                visible = raw.lstrip()
+                
+                # Cut at the first line break or next "Human:" turn
+                stops = [i for i in (visible.find("\n"), visible.find("Human:")) if i >= 0]
+                if stops:
+                    visible = visible[:min(stops)].rstrip()
+                    stop_event.set()
+                else:
+                    # Hold back a partial "Human:" marker until it resolves
+                    for size in range(min(len("Human:") - 1, len(visible)), 0, -1):
+                        if "Human:".startswith(visible[-size:]):
+                            visible = visible[:-size]
+                            break
+                
+                if len(visible) > emitted:
+                    yield "token", visible[emitted:]
+                    emitted = len(visible)
+                
+                if stop_event.is_set():
+                    break
+        except Exception as e:
+            print(f"Error streaming response: {str(e)}")
+        finally:
+            stop_event.set()
+        
+        response = self.extract_response(full_prompt + raw)
+        yield "response", response if response else self._fallback_response(prompt)
+    
     def _fallback_response(self, prompt: str) -> str:
         """Generate fallback response when model fails"""
         intent, _ = self.detect_intent(prompt)
@@ -216,17 +397,8 @@ class ChatbotService:
         
         return min(round(base_confidence, 2), 0.99)
     
-    def chat(self, message: str, conversation_history: List[Dict] = None) -> Dict:
-        """
-        Main chat method - generates context-aware responses
-        
-        Args:
-            message: User's input message
-            conversation_history: List of previous messages for context
-        
-        Returns:
-            Dict with response, intent, confidence, and metadata
-        """
+    def _prepare(self, message: str, conversation_history: List[Dict] = None) -> Tuple[str, str]:
+        """Detect intent and build context from history"""
         # Detect intent
         intent, intent_confidence = self.detect_intent(message)
         
@@ -235,15 +407,13 @@ class ChatbotService:
         if conversation_history:
             context = self.build_context(
                 conversation_history,
-                max_context=settings.MAX_CONTEXT_LENGTH
+                max_context=CONTEXT_WINDOW
             )
         
-        # Generate response
-        if self.model is not None:
-            response = self.generate_response_with_model(message, context)
-        else:
-            response = self._fallback_response(message)
-        
+        return intent, context
+    
+    def _finalize(self, response: str, intent: str, conversation_history: List[Dict] = None) -> Dict:
+        """Enhance response and attach confidence and metadata"""
         # Enhance response
         response = self.enhance_response(response, intent)
         
@@ -259,12 +429,63 @@ class ChatbotService:
             'context_length': len(conversation_history) if conversation_history else 0
         }
     
+    def chat(self, message: str, conversation_history: List[Dict] = None, session_key: str = None) -> Dict:
+        """
+        Main chat method - generates context-aware responses
+        
+        Args:
+            message: User's input message
+            conversation_history: List of previous messages for context
+            session_key: Chat session id, enables KV cache reuse across turns
+        
+        Returns:
+            Dict with response, intent, confidence, and metadata
+        """
+        intent, context = self._prepare(message, conversation_history)
+        
+        # Generate response
+        if self.model is not None:
+            response = self.generate_response_with_model(message, context, session_key)
+        else:
+            response = self._fallback_response(message)
+        
+        return self._finalize(response, intent, conversation_history)
+    
+    def stream_chat(self, message: str, conversation_history: List[Dict] = None) -> Iterator[Dict]:
+        """
+        Streaming variant of chat()
+        
+        Yields {'type': 'token', 'text': ...} while the reply is generated and
+        finishes with {'type': 'done', **chat() result}. The final response is
+        authoritative: trailing incomplete sentences are trimmed only there.
+        """
+        intent, context = self._prepare(message, conversation_history)
+        
+        response = ""
+        for kind, text in self.stream_response_with_model(message, context):
+            if kind == "token":
+                yield {'type': 'token', 'text': text}
+            else:
+                response = text
+        
+        yield {'type': 'done', **self._finalize(response, intent, conversation_history)}
+    
+    def forget_session(self, session_key: str):
+        """Drop any cached state for a deleted session"""
+        if self.kv_cache is not None:
+            self.kv_cache.invalidate(session_key)
+    
     def get_model_info(self) -> Dict:
         """Get information about the loaded model"""
         return {
             'model_name': self.model_name,
             'device': self.device,
             'is_loaded': self.model is not None,
+            'inference_backend': self.backend,
+            'requested_backend': self.requested_backend,
+            'backend_details': self.backend_details,
             'max_response_length': self.max_length,
-            'max_context_length': settings.MAX_CONTEXT_LENGTH
+            'max_context_length': settings.MAX_CONTEXT_LENGTH,
+            'batching': self.batcher.get_stats() if self.batcher else None,
+            'kv_cache': self.kv_cache.get_stats() if self.kv_cache else None
         }
@@ -0,0 +1,95 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from utils.logger import logger
+from utils.metrics import summarize_latencies
+
+
+class GenerationBatcher:
+    """
+    Coalesces concurrent generation requests into padded batches.
+
+    Callers block in submit() while a single worker thread collects prompts
+    for up to `window_ms` (or until `max_batch_size` is reached), runs one
+    batched generate call and hands each caller its own output.
+    """
+
+    def __init__(self, generate_batch: Callable[[List[str]], List[str]],
+                 max_batch_size: int = 8, window_ms: float = 10.0):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_delay_ms = deque(maxlen=1000)
+        self._batch_ms = deque(maxlen=1000)
+        self._worker = threading.Thread(target=self._run, name="generation-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its generated text"""
+        future = Future()
+        self._queue.put((prompt, time.perf_counter(), future))
+        return future.result()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            prompts = [prompt for prompt, _, _ in batch]
+
+            try:
+                outputs = list(self.generate_batch(prompts))
+                if len(outputs) != len(batch):
+                    raise RuntimeError(
+                        f"Batched generation returned {len(outputs)} outputs for {len(batch)} prompts"
+                    )
+            except Exception as e:
+                logger.error(f"Batched generation failed: {str(e)}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._batch_ms.append((time.perf_counter() - started) * 1000)
+                for _, enqueued_at, _ in batch:
+                    self._queue_delay_ms.append((started - enqueued_at) * 1000)
+
+            for (_, _, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def get_stats(self) -> Dict:
+        """Batch-size distribution and queueing delay"""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            requests = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                'max_batch_size': self.max_batch_size,
+                'window_ms': round(self.window * 1000, 2),
+                'pending': self._queue.qsize(),
+                'batches': batches,
+                'requests': requests,
+                'avg_batch_size': round(requests / batches, 2) if batches else 0.0,
+                'batch_size_distribution': dict(sorted(self._batch_sizes.items())),
+                'queue_delay_ms': summarize_latencies(self._queue_delay_ms),
+                'batch_ms': summarize_latencies(self._batch_ms)
+            }
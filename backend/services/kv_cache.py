@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def _past_nbytes(past) -> int:
+    """Total size of a legacy past_key_values tuple"""
+    return sum(t.numel() * t.element_size() for layer in past for t in layer)
+
+
+class SessionKVCache:
+    """
+    LRU cache of prompt past_key_values per chat session.
+
+    An entry holds the token ids of the last prompt a session sent and the
+    attention keys/values computed for it. A follow-up prompt that starts
+    with exactly those ids only needs its new tokens encoded; any other
+    prompt (e.g. the context window slid and dropped the oldest turn)
+    invalidates the entry.
+    """
+
+    def __init__(self, max_sessions: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _drop(self, session_key: str):
+        _, _, nbytes = self._entries.pop(session_key)
+        self._bytes -= nbytes
+
+    def lookup(self, session_key: str, input_ids: List[int]) -> Tuple[Optional[tuple], int]:
+        """Return (past_key_values, cached_length) for a prompt, or (None, 0)"""
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None:
+                self.misses += 1
+                return None, 0
+
+            cached_ids, past, _ = entry
+            cached_len = len(cached_ids)
+            if cached_len < len(input_ids) and tuple(input_ids[:cached_len]) == cached_ids:
+                self._entries.move_to_end(session_key)
+                self.hits += 1
+                return past, cached_len
+
+            # Prefix no longer matches: the window slid or history changed
+            self._drop(session_key)
+            self.invalidations += 1
+            self.misses += 1
+            return None, 0
+
+    def store(self, session_key: str, input_ids: List[int], past):
+        """Cache past_key_values for the prompt input_ids"""
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()
+        nbytes = _past_nbytes(past)
+        if nbytes > self.max_bytes:
+            self.invalidate(session_key)
+            return
+
+        with self._lock:
+            if session_key in self._entries:
+                self._drop(session_key)
+            self._entries[session_key] = (tuple(input_ids), past, nbytes)
+            self._bytes += nbytes
+
+            while len(self._entries) > self.max_sessions or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, session_key: str):
+        """Forget a session's cached keys/values"""
+        with self._lock:
+            if session_key in self._entries:
+                self._drop(session_key)
+                self.invalidations += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'sessions': len(self._entries),
+                'max_sessions': self.max_sessions,
+                'memory_mb': round(self._bytes / (1024 * 1024), 2),
+                'max_memory_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,76 @@
+from typing import Dict, Tuple
+
+import torch
+from torch import nn
+from transformers import AutoModelForCausalLM
+
+INFERENCE_BACKENDS = ("eager", "int8", "compile", "onnx")
+
+
+def _conv1d_to_linear(model: nn.Module) -> int:
+    """
+    Swap GPT-2 style Conv1D layers for nn.Linear.
+
+    GPT-2 implements its attention/MLP projections with transformers' Conv1D,
+    which quantize_dynamic does not recognise, so without this only the
+    LM head would be quantized.
+    """
+    replaced = 0
+    for parent in model.modules():
+        for name, child in list(parent.named_children()):
+            if type(child).__name__ != "Conv1D":
+                continue
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features, bias=child.bias is not None)
+            linear.weight.data = child.weight.data.t().contiguous()
+            if child.bias is not None:
+                linear.bias.data = child.bias.data
+            setattr(parent, name, linear)
+            replaced += 1
+    return replaced
+
+
+def _load_eager(model_name: str, device: str):
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def load_causal_lm(model_name: str, backend: str, device: str) -> Tuple[object, str, Dict]:
+    """
+    Load a causal LM for the requested inference backend.
+
+    Returns (model, active_backend, details). Backends that cannot be used
+    in this environment fall back to eager and say why in details.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        return _load_eager(model_name, device), "eager", {'fallback_reason': f"unknown backend '{backend}'"}
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError:
+            return _load_eager(model_name, device), "eager", {
+                'fallback_reason': "optimum[onnxruntime] is not installed"
+            }
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+        return model, "onnx", {'provider': model.providers[0] if model.providers else None}
+
+    model = _load_eager(model_name, device)
+
+    if backend == "int8":
+        if device != "cpu":
+            return model, "eager", {'fallback_reason': "dynamic int8 quantization is CPU-only"}
+        converted = _conv1d_to_linear(model)
+        model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        return model, "int8", {'converted_conv1d_layers': converted}
+
+    if backend == "compile":
+        if not hasattr(torch, "compile"):
+            return model, "eager", {'fallback_reason': "torch.compile requires PyTorch 2.x"}
+        # Compile forward only; generate() keeps running in Python and calls it per step
+        model.forward = torch.compile(model.forward, dynamic=True)
+        return model, "compile", {'torch_version': torch.__version__}
+
+    return model, "eager", {}
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from utils.logger import logger
+
+
+class ModelNotReadyError(Exception):
+    """Raised when a request needs a model that has not finished loading"""
+
+    def __init__(self, name: str, state: str, error: Optional[str] = None):
+        self.name = name
+        self.state = state
+        self.error = error
+        message = f"Model '{name}' is {state}"
+        if error:
+            message += f": {error}"
+        super().__init__(message)
+
+
+class ModelRegistry:
+    """
+    Loads services in background threads and gates access on readiness.
+
+    Route modules register a factory at import time (cheap); the factory
+    runs either for every model on startup ("background") or on the first
+    request that needs it ("lazy"). Until a model is ready, get() raises
+    ModelNotReadyError, which the app turns into a 503.
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._states = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], object]):
+        """Register a zero-argument factory that builds the service"""
+        with self._lock:
+            self._factories[name] = factory
+            self._states.setdefault(name, self.PENDING)
+
+    def _load(self, name: str):
+        started = time.perf_counter()
+        try:
+            instance = self._factories[name]()
+        except Exception as e:
+            logger.error(f"Failed to load model '{name}': {str(e)}")
+            with self._lock:
+                self._states[name] = self.FAILED
+                self._errors[name] = str(e)
+            return
+
+        with self._lock:
+            self._instances[name] = instance
+            self._states[name] = self.READY
+            self._load_seconds[name] = round(time.perf_counter() - started, 2)
+        logger.info(f"Model '{name}' ready in {self._load_seconds[name]}s")
+
+    def start_loading(self, names: Iterable[str] = None):
+        """Start background loading for pending (or failed) models"""
+        with self._lock:
+            names = list(names) if names is not None else list(self._factories)
+            to_start = [n for n in names if self._states.get(n) in (self.PENDING, self.FAILED)]
+            for name in to_start:
+                self._states[name] = self.LOADING
+                self._errors.pop(name, None)
+
+        for name in to_start:
+            threading.Thread(target=self._load, args=(name,), name=f"load-{name}", daemon=True).start()
+
+    def get(self, name: str):
+        """Return a ready service or raise ModelNotReadyError"""
+        with self._lock:
+            state = self._states.get(name)
+            if state == self.READY:
+                return self._instances[name]
+            if state is None:
+                raise KeyError(f"Unknown model '{name}'")
+            error = self._errors.get(name)
+
+        if state == self.PENDING:
+            # Lazy mode: first request kicks off the load
+            self.start_loading([name])
+            state = self.LOADING
+        raise ModelNotReadyError(name, state, error)
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            return self._states.get(name) == self.READY
+
+    def readiness(self) -> Dict[str, Dict]:
+        """Per-model loading state"""
+        with self._lock:
+            return {
+                name: {
+                    'state': self._states[name],
+                    'load_seconds': self._load_seconds.get(name),
+                    'error': self._errors.get(name)
+                }
+                for name in self._factories
+            }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,212 @@
+"""
+Bulk resume screening: many resumes scored against one set of required skills.
+
+Text extraction, skill matching and contact parsing are CPU-bound and run
+per file on the 'resume_extract' process pool. Scoring is done once for the
+whole batch: a sparse resume x skill matrix times a skill x requirement
+match matrix gives every resume's matched requirements in one product.
+Ranked results are kept in memory for pagination.
+"""
+import io
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+BATCH_EXTENSIONS = ('.pdf', '.txt')
+
+_worker_service = None
+
+
+def analyze_document(filename: str, data: bytes) -> Dict:
+    """Extract text, skills and contact info from one file; runs in a worker process"""
+    global _worker_service
+    if _worker_service is None:
+        from database.database import engine
+        from services.resume_service import ResumeAnalyzerService
+        # Connections inherited from the parent process must not be reused here
+        engine.dispose(close=False)
+        _worker_service = ResumeAnalyzerService()
+
+    try:
+        # Repeated files come from the shared extraction cache
+        profile = _worker_service.extract_profile(io.BytesIO(data), Path(filename).suffix)
+        return {
+            'filename': filename,
+            'extracted_text': profile['extracted_text'],
+            'skills_found': profile['skills_found'],
+            'total_skills_found': sum(len(skills) for skills in profile['skills_found'].values()),
+            'contact_info': profile['contact_info'],
+            'error': None
+        }
+    except Exception as e:
+        return {'filename': filename, 'error': str(e)}
+
+
+ZIP_READ_CHUNK = 64 * 1024
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch's documents exceed its byte budget"""
+
+
+class ByteBudget:
+    """Total bytes the documents of one batch may take up"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def take(self, amount: int, name: str):
+        self.used += amount
+        if self.used > self.max_bytes:
+            raise BatchTooLargeError(f"Batch is larger than {self.max_bytes // (1024 * 1024)}MB (at {name})")
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_file_size: int, budget: ByteBudget) -> bytes:
+    # The declared file_size can lie; count what actually comes out of the decompressor
+    chunks, size = [], 0
+    with archive.open(info) as member:
+        while chunk := member.read(ZIP_READ_CHUNK):
+            size += len(chunk)
+            if size > max_file_size:
+                raise ValueError(f"{info.filename} is larger than {max_file_size} bytes")
+            budget.take(len(chunk), info.filename)
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def iter_zip_documents(fileobj, max_files: int, max_file_size: int,
+                       budget: ByteBudget) -> Iterator[Tuple[str, bytes]]:
+    """(filename, bytes) of the PDF/TXT members of a zip archive, one member at a time"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {str(e)}")
+    count = 0
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith('__MACOSX/') or Path(name).suffix.lower() not in BATCH_EXTENSIONS:
+                continue
+            if info.file_size > max_file_size:
+                raise ValueError(f"{name} is larger than {max_file_size} bytes")
+            if count >= max_files:
+                raise ValueError(f"Too many files. Maximum batch size is {max_files}")
+            count += 1
+            yield name, _read_member(archive, info, max_file_size, budget)
+
+
+def _normalize(skill: str) -> str:
+    return ' '.join(skill.lower().split())
+
+
+def score_batch(analyses: List[Dict], required_skills: List[str]) -> List[Dict]:
+    """
+    Add match_score and missing_skills to each analysis.
+
+    A requirement counts as matched when it and a found skill contain one
+    another, as in ResumeAnalyzerService.calculate_match_score.
+    """
+    required = [_normalize(s) for s in required_skills if s.strip()]
+    if not required:
+        for analysis in analyses:
+            analysis['match_score'], analysis['missing_skills'] = 100.0, []
+        return analyses
+
+    # Resume x skill incidence over the skills actually found in this batch
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, analysis in enumerate(analyses):
+        found = {_normalize(s) for skills in analysis['skills_found'].values() for s in skills}
+        for skill in found:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(skill, len(vocabulary)))
+    resume_skills = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(analyses), len(vocabulary))
+    )
+
+    # Skill x requirement match matrix, built once per batch
+    skill_names = list(vocabulary)
+    match_rows, match_cols = [], []
+    for i, skill in enumerate(skill_names):
+        for j, requirement in enumerate(required):
+            if requirement in skill or skill in requirement:
+                match_rows.append(i)
+                match_cols.append(j)
+    matches = sparse.csr_matrix(
+        (np.ones(len(match_rows)), (match_rows, match_cols)), shape=(len(skill_names), len(required))
+    )
+
+    hits = (resume_skills @ matches).toarray() > 0
+    scores = np.round(hits.sum(axis=1) / len(required) * 100, 2)
+    for row, analysis in enumerate(analyses):
+        analysis['match_score'] = float(scores[row])
+        analysis['missing_skills'] = [required[j] for j in np.flatnonzero(~hits[row])]
+    return analyses
+
+
+def rank_analyses(analyses: List[Dict]) -> List[Dict]:
+    """Best match first; ties broken by skills found, then upload order"""
+    if not analyses:
+        return []
+    scores = np.array([a['match_score'] for a in analyses])
+    totals = np.array([a['total_skills_found'] for a in analyses])
+    order = np.lexsort((np.arange(len(analyses)), -totals, -scores))
+    ranked = [analyses[i] for i in order]
+    for rank, analysis in enumerate(ranked, start=1):
+        analysis['rank'] = rank
+    return ranked
+
+
+class ResumeBatch:
+    """Ranked results of one screening batch"""
+
+    def __init__(self, required_skills: List[str], results: List[Dict], failed: List[Dict]):
+        self.batch_id = uuid.uuid4().hex
+        self.required_skills = required_skills
+        self.results = results
+        self.failed = failed
+        self.created_at = time.time()
+
+    def page(self, page: int, page_size: int) -> Dict:
+        start = (page - 1) * page_size
+        return {
+            'batch_id': self.batch_id,
+            'required_skills': self.required_skills,
+            'total': len(self.results),
+            'page': page,
+            'page_size': page_size,
+            'pages': (len(self.results) + page_size - 1) // page_size,
+            'results': self.results[start:start + page_size],
+            'failed': self.failed
+        }
+
+
+class ResumeBatchStore:
+    """Keeps the most recent batches in memory for pagination"""
+
+    def __init__(self, max_batches: int = 50):
+        self.max_batches = max_batches
+        self._batches: 'OrderedDict[str, ResumeBatch]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, batch: ResumeBatch) -> ResumeBatch:
+        with self._lock:
+            self._batches[batch.batch_id] = batch
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        return batch
+
+    def get(self, batch_id: str) -> Optional[ResumeBatch]:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+
+resume_batch_store = ResumeBatchStore()
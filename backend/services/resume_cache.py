@@ -0,0 +1,123 @@
+"""
+Content-addressed cache of resume extractions.
+
+Re-submitting the same file against a different skill list only needs a
+new match score; text extraction, skill matching and contact parsing are
+looked up by the file's SHA-256 instead. Entries live in a size-bounded
+in-memory LRU and, when RESUME_CACHE_PERSIST is on, in the
+resume_extractions table so they survive restarts and are shared between
+worker processes.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Optional
+
+from utils.logger import logger
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file: BinaryIO) -> str:
+    """SHA-256 of a seekable file's bytes, leaving it rewound"""
+    file.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class ResumeExtractionCache:
+    """LRU of {'extracted_text', 'skills_found', 'contact_info'} keyed by content hash"""
+
+    def __init__(self, max_entries: int, session_factory: Callable = None):
+        self.max_entries = max_entries
+        self.session_factory = session_factory  # None disables DB persistence
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._load(key) if self.session_factory else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.db_hits += 1
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        self._remember(key, entry)
+        if self.session_factory:
+            self._store(key, entry)
+
+    def _load(self, key: str) -> Optional[Dict]:
+        from database.tables import ResumeExtraction
+
+        db = self.session_factory()
+        try:
+            row = db.get(ResumeExtraction, key)
+            if row is None:
+                return None
+            return {
+                'extracted_text': row.extracted_text,
+                'skills_found': json.loads(row.skills_found),
+                'contact_info': json.loads(row.contact_info)
+            }
+        except Exception as e:
+            logger.error(f"Resume cache lookup failed: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, entry: Dict):
+        from database.tables import ResumeExtraction
+
+        db = self.session_factory()
+        try:
+            db.merge(ResumeExtraction(
+                content_hash=key,
+                extracted_text=entry['extracted_text'],
+                skills_found=json.dumps(entry['skills_found']),
+                contact_info=json.dumps(entry['contact_info'])
+            ))
+            db.commit()
+        except Exception as e:
+            # The in-memory entry is enough to serve repeats from this process
+            db.rollback()
+            logger.error(f"Resume cache write failed: {str(e)}")
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'persistent': self.session_factory is not None,
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.db_hits) / lookups, 3) if lookups else 0.0
+            }
@@ -1,27 +1,23 @@
 import PyPDF2
 import re
 import json
-from typing import Dict, List, Tuple
+import codecs
+import hashlib
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Union
 from pathlib import Path
-import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
+from utils.nltk_data import ensure_nltk_data
+from utils.logger import logger
+from services.skill_index import SkillIndex
+from services.resume_cache import ResumeExtractionCache, file_sha256
+from config import settings
 
 class ResumeAnalyzerService:
     """Service for analyzing resumes and extracting skills"""
     
-    # Common technical skills database
+    # Common technical skills database (used unless SKILL_TAXONOMY_FILE is set)
     SKILL_DATABASE = {
         'programming': ['python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'ruby', 'go', 'rust', 'php', 'swift', 'kotlin'],
         'web': ['react', 'angular', 'vue', 'html', 'css', 'nodejs', 'express', 'django', 'flask', 'fastapi', 'nextjs'],
@@ -33,45 +29,107 @@ class ResumeAnalyzerService:
     }
     
     def __init__(self):
+        ensure_nltk_data('tokenizers/punkt', 'corpora/stopwords')
         self.stop_words = set(stopwords.words('english'))
+        self.skill_index = self._load_skill_index()
+        self.extraction_cache = self._create_extraction_cache()
     
-    def extract_text_from_pdf(self, file_path: Path) -> str:
-        """Extract text from PDF file"""
+    TEXT_CHUNK_SIZE = 64 * 1024  # Bytes read per step from text files
+    
+    @staticmethod
+    @contextmanager
+    def _open_binary(source: Union[Path, BinaryIO]):
+        """Open a path, or pass through an already open binary file (e.g. an upload)"""
+        if isinstance(source, (str, Path)):
+            with open(source, 'rb') as file:
+                yield file
+        else:
+            yield source
+    
+    def iter_text_from_pdf(self, source: Union[Path, BinaryIO], max_pages: int = None) -> Iterator[str]:
+        """Yield the text of each PDF page in turn, stopping after max_pages"""
         try:
-            text = ""
-            with open(file_path, 'rb') as file:
+            with self._open_binary(source) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            return text
+                for number, page in enumerate(pdf_reader.pages):
+                    if max_pages is not None and number >= max_pages:
+                        break
+                    yield page.extract_text() or ''
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
     
-    def extract_text_from_txt(self, file_path: Path) -> str:
-        """Extract text from TXT file"""
+    def iter_text_from_txt(self, source: Union[Path, BinaryIO]) -> Iterator[str]:
+        """Yield decoded UTF-8 text in TEXT_CHUNK_SIZE steps"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            with self._open_binary(source) as file:
+                for block in iter(lambda: file.read(self.TEXT_CHUNK_SIZE), b''):
+                    text = decoder.decode(block)
+                    if text:
+                        yield text
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
         except Exception as e:
             raise Exception(f"Error reading text file: {str(e)}")
     
-    def extract_skills(self, text: str) -> Dict[str, List[str]]:
-        """Extract skills from resume text using NLP"""
-        text_lower = text.lower()
-        found_skills = {}
-        
-        for category, skills in self.SKILL_DATABASE.items():
-            found_in_category = []
-            for skill in skills:
-                # Use word boundaries for better matching
-                pattern = r'\b' + re.escape(skill) + r'\b'
-                if re.search(pattern, text_lower):
-                    found_in_category.append(skill)
-            
-            if found_in_category:
-                found_skills[category] = found_in_category
+    def iter_text(self, source: Union[Path, BinaryIO], suffix: str, max_pages: int = None) -> Iterator[str]:
+        """Stream text from a PDF or TXT source"""
+        suffix = suffix.lower()
+        if suffix == '.pdf':
+            return self.iter_text_from_pdf(source, max_pages)
+        if suffix == '.txt':
+            return self.iter_text_from_txt(source)
+        raise ValueError("Unsupported file format. Use PDF or TXT.")
+    
+    def extract_text(self, source: Union[Path, BinaryIO], suffix: str,
+                     max_pages: int = None, max_chars: int = None) -> str:
+        """
+        Extract text from a path or an open file (e.g. an upload's spooled
+        file), reading no more than the resume page and character caps
+        """
+        max_pages = settings.RESUME_MAX_PAGES if max_pages is None else max_pages
+        max_chars = settings.RESUME_MAX_CHARS if max_chars is None else max_chars
         
-        return found_skills
+        parts = []
+        length = 0
+        pieces = self.iter_text(source, suffix, max_pages)
+        try:
+            for piece in pieces:
+                parts.append(piece[:max_chars - length])
+                length += len(parts[-1])
+                if length >= max_chars:
+                    break
+        finally:
+            pieces.close()
+        return ''.join(parts)
+    
+    def extract_text_from_pdf(self, file_path: Path) -> str:
+        """Extract text from PDF file"""
+        return ''.join(self.iter_text_from_pdf(file_path))
+    
+    def extract_text_from_txt(self, file_path: Path) -> str:
+        """Extract text from TXT file"""
+        return ''.join(self.iter_text_from_txt(file_path))
+    
+    def _load_skill_index(self) -> SkillIndex:
+        """Compile the skill taxonomy once, from SKILL_TAXONOMY_FILE if configured"""
+        if settings.SKILL_TAXONOMY_FILE:
+            index = SkillIndex.from_file(Path(settings.SKILL_TAXONOMY_FILE))
+            logger.info(f"Loaded {len(index)} skills from {settings.SKILL_TAXONOMY_FILE}")
+            return index
+        return SkillIndex(self.SKILL_DATABASE)
+    
+    def _create_extraction_cache(self) -> ResumeExtractionCache:
+        session_factory = None
+        if settings.RESUME_CACHE_PERSIST:
+            from database.database import SessionLocal
+            session_factory = SessionLocal
+        return ResumeExtractionCache(settings.RESUME_CACHE_SIZE, session_factory)
+    
+    def extract_skills(self, text: str) -> Dict[str, List[str]]:
+        """Extract skills from resume text in a single pass over the text"""
+        return self.skill_index.find(text)
     
     def calculate_match_score(self, found_skills: Dict[str, List[str]], required_skills: List[str]) -> Tuple[float, List[str]]:
         """Calculate match score against required skills"""
@@ -117,30 +175,49 @@ class ResumeAnalyzerService:
         
         return contact_info
     
-    def analyze_resume(self, file_path: Path, required_skills: List[str] = None) -> Dict:
-        """Main method to analyze resume"""
-        # Extract text based on file type
-        if file_path.suffix.lower() == '.pdf':
-            text = self.extract_text_from_pdf(file_path)
-        elif file_path.suffix.lower() == '.txt':
-            text = self.extract_text_from_txt(file_path)
-        else:
-            raise ValueError("Unsupported file format. Use PDF or TXT.")
-        
-        # Extract skills
-        found_skills = self.extract_skills(text)
+    def extraction_key(self, file: BinaryIO, suffix: str) -> str:
+        """
+        Cache key for a file: its SHA-256, combined with everything else the
+        extraction depends on (format, skill taxonomy, page/char caps)
+        """
+        parts = [file_sha256(file), suffix.lower(), self.skill_index.fingerprint,
+                 str(settings.RESUME_MAX_PAGES), str(settings.RESUME_MAX_CHARS)]
+        return hashlib.sha256(':'.join(parts).encode('utf-8')).hexdigest()
+    
+    def extract_profile(self, source: Union[Path, BinaryIO], suffix: str = None) -> Dict:
+        """
+        Text preview, skills and contact info of a resume; repeated files are
+        served from the extraction cache instead of being parsed again
+        """
+        suffix = suffix or Path(source).suffix
+        with self._open_binary(source) as file:
+            key = self.extraction_key(file, suffix)
+            profile = self.extraction_cache.get(key)
+            if profile is None:
+                text = self.extract_text(file, suffix)
+                profile = {
+                    'extracted_text': text[:500] + '...' if len(text) > 500 else text,
+                    'skills_found': self.extract_skills(text),
+                    'contact_info': self.extract_contact_info(text)
+                }
+                self.extraction_cache.put(key, profile)
+        return profile
+    
+    def analyze_resume(self, source: Union[Path, BinaryIO], required_skills: List[str] = None,
+                       suffix: str = None) -> Dict:
+        """Main method to analyze resume (a path, or an open file plus its suffix)"""
+        # Extract text, skills and contact info (cached by file content)
+        profile = self.extract_profile(source, suffix)
+        found_skills = profile['skills_found']
         
         # Calculate match score
         match_score, missing_skills = self.calculate_match_score(found_skills, required_skills or [])
         
-        # Extract contact info
-        contact_info = self.extract_contact_info(text)
-        
         return {
-            'extracted_text': text[:500] + '...' if len(text) > 500 else text,
+            'extracted_text': profile['extracted_text'],
             'skills_found': found_skills,
             'match_score': match_score,
             'missing_skills': missing_skills,
-            'contact_info': contact_info,
+            'contact_info': profile['contact_info'],
             'total_skills_found': sum(len(skills) for skills in found_skills.values())
         }
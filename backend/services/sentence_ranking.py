@@ -0,0 +1,124 @@
+"""
+Vectorized sentence ranking for the extractive summarizer.
+
+Sentences are turned into a sparse sentence x term count matrix once; the
+rankers below are matrix products over it, so scoring stays fast on
+documents with tens of thousands of sentences.
+
+    frequency  sum of normalized term frequencies per word (original scorer)
+    tfidf      sum of TF-IDF weights per word
+    textrank   PageRank over the cosine-similarity graph of TF-IDF vectors
+"""
+from typing import Dict, Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+RANKING_ALGORITHMS = ("frequency", "tfidf", "textrank")
+
+
+class SentenceFeatures:
+    """Sparse term counts per sentence plus per-term masks"""
+
+    def __init__(self, token_ids: List[List[int]], vocabulary: List[str],
+                 stop_words: Iterable[str], min_words: int = 6):
+        n_sentences = len(token_ids)
+        lengths = np.fromiter((len(ids) for ids in token_ids), dtype=np.int64, count=n_sentences)
+        rows = np.repeat(np.arange(n_sentences), lengths)
+        cols = np.fromiter((i for ids in token_ids for i in ids), dtype=np.int64, count=int(lengths.sum()))
+        # Duplicate (row, col) pairs are summed into counts
+        self.counts = sparse.csr_matrix(
+            (np.ones(len(cols), dtype=np.float64), (rows, cols)),
+            shape=(n_sentences, len(vocabulary))
+        )
+
+        stop_words = set(stop_words)
+        is_word = np.fromiter((w.isalnum() for w in vocabulary), dtype=bool, count=len(vocabulary))
+        self.content = np.fromiter(
+            (w.isalnum() and w not in stop_words and len(w) > 2 for w in vocabulary),
+            dtype=bool, count=len(vocabulary)
+        )
+
+        self.word_counts = self.counts @ is_word.astype(np.float64)
+        # Very short sentences are never ranked
+        self.eligible = np.flatnonzero(self.word_counts >= min_words)
+
+    def term_frequencies(self) -> np.ndarray:
+        """Content-term counts over the whole text, normalized by the maximum"""
+        totals = np.asarray(self.counts.sum(axis=0)).ravel() * self.content
+        peak = totals.max() if totals.size else 0
+        return totals / peak if peak > 0 else totals
+
+    def tfidf(self, rows: np.ndarray) -> sparse.csr_matrix:
+        """TF-IDF weights of content terms for the given sentences"""
+        counts = self.counts[rows][:, np.flatnonzero(self.content)]
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+        return sparse.csr_matrix(counts.multiply(idf))
+
+
+def _as_scores(rows: np.ndarray, values: np.ndarray) -> Dict[int, float]:
+    return dict(zip(rows.tolist(), values.tolist()))
+
+
+def frequency_scores(features: SentenceFeatures) -> Dict[int, float]:
+    rows = features.eligible
+    weights = features.counts[rows] @ features.term_frequencies()
+    return _as_scores(rows, weights / features.word_counts[rows])
+
+
+def tfidf_scores(features: SentenceFeatures) -> Dict[int, float]:
+    rows = features.eligible
+    weights = np.asarray(features.tfidf(rows).sum(axis=1)).ravel()
+    return _as_scores(rows, weights / features.word_counts[rows])
+
+
+def textrank_scores(features: SentenceFeatures, damping: float = 0.85,
+                    max_iter: int = 100, tol: float = 1e-6) -> Dict[int, float]:
+    """
+    PageRank over sentence cosine similarities.
+
+    The n x n similarity matrix S = X Xᵀ (minus its diagonal) is never
+    built: S·v is computed as X(Xᵀv) - diag·v, which costs O(nnz) per
+    iteration instead of O(n²).
+    """
+    rows = features.eligible
+    n = len(rows)
+    if n == 0:
+        return {}
+
+    weights = features.tfidf(rows)
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    x = sparse.diags(np.divide(1.0, norms, out=np.zeros(n), where=norms > 0)) @ weights
+    self_similarity = (norms > 0).astype(np.float64)
+
+    def similarity_dot(v: np.ndarray) -> np.ndarray:
+        return x @ (x.T @ v) - self_similarity * v
+
+    degree = similarity_dot(np.ones(n))
+    connected = degree > 1e-12
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        share = np.divide(rank, degree, out=np.zeros(n), where=connected)
+        dangling = rank[~connected].sum()
+        updated = (1 - damping) / n + damping * (similarity_dot(share) + dangling / n)
+        converged = np.abs(updated - rank).sum() < tol
+        rank = updated
+        if converged:
+            break
+
+    return _as_scores(rows, rank)
+
+
+_RANKERS = {
+    "frequency": frequency_scores,
+    "tfidf": tfidf_scores,
+    "textrank": textrank_scores,
+}
+
+
+def rank_sentences(algorithm: str, features: SentenceFeatures) -> Dict[int, float]:
+    """Score eligible sentences: sentence index -> score"""
+    if algorithm not in _RANKERS:
+        raise ValueError(f"Unknown ranking algorithm '{algorithm}'. Use one of {RANKING_ALGORITHMS}")
+    return _RANKERS[algorithm](features)
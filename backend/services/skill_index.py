@@ -0,0 +1,114 @@
+"""
+Precompiled skill taxonomy matcher for the resume analyzer.
+
+All skills are loaded into one Aho-Corasick automaton when the service
+starts, so a resume is scanned once however large the taxonomy is.
+A match counts only when it is not glued to other word characters, which
+also works for skills that start or end with punctuation ("c++", "c#",
+"ci/cd") where a regex \\b would fail.
+
+Taxonomy files can be:
+    JSON   {"category": ["skill", ...], ...}
+    CSV    'skill' column plus an optional 'category' column (TSV too)
+    TXT    one skill per line
+"""
+import csv
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from utils.aho_corasick import AhoCorasick
+
+DEFAULT_CATEGORY = "other"
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def normalize_skill(skill: str) -> str:
+    """Lowercase and collapse whitespace, matching how resume text is normalized"""
+    return re.sub(r'\s+', ' ', skill.strip().lower())
+
+
+class SkillIndex:
+    """Single-pass lookup of every taxonomy skill in a text"""
+
+    def __init__(self, taxonomy: Dict[str, List[str]]):
+        self.categories = list(taxonomy)
+        # Normalized skill -> [(category rank, skill rank, category)], as one
+        # skill may be listed under several categories
+        entries: Dict[str, List[Tuple[int, int, str]]] = {}
+        for category_rank, (category, skills) in enumerate(taxonomy.items()):
+            for skill_rank, skill in enumerate(skills):
+                normalized = normalize_skill(skill)
+                if normalized:
+                    entries.setdefault(normalized, []).append((category_rank, skill_rank, category))
+
+        self.automaton = AhoCorasick(entries)
+        # Changes whenever the taxonomy does; lets caches of results expire with it
+        self.fingerprint = hashlib.sha256(json.dumps(taxonomy).encode('utf-8')).hexdigest()[:16]
+        self._entries = [entries[skill] for skill in self.automaton.patterns]
+
+    def __len__(self) -> int:
+        return len(self.automaton.patterns)
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'SkillIndex':
+        """Load a taxonomy from a JSON, CSV/TSV or plain-text file"""
+        return cls(load_taxonomy(path))
+
+    def find_ids(self, text: str) -> set:
+        """Indexes (into self.automaton.patterns) of the skills present in text"""
+        text_lower = re.sub(r'\s+', ' ', text.lower())
+        patterns = self.automaton.patterns
+        found = set()
+        for start, index in self.automaton.iter_matches(text_lower):
+            if index in found:
+                continue
+            end = start + len(patterns[index])
+            if start > 0 and _is_word_char(text_lower[start - 1]) and _is_word_char(patterns[index][0]):
+                continue
+            if end < len(text_lower) and _is_word_char(text_lower[end]) and _is_word_char(patterns[index][-1]):
+                continue
+            found.add(index)
+        return found
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """Skills present in text, grouped by category in taxonomy order"""
+        hits = sorted(
+            (category_rank, skill_rank, category, self.automaton.patterns[index])
+            for index in self.find_ids(text)
+            for category_rank, skill_rank, category in self._entries[index]
+        )
+        found_skills: Dict[str, List[str]] = {}
+        for _, _, category, skill in hits:
+            found_skills.setdefault(category, []).append(skill)
+        return found_skills
+
+
+def load_taxonomy(path: Path) -> Dict[str, List[str]]:
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if suffix == '.json':
+            data = json.load(f)
+            if isinstance(data, list):
+                return {DEFAULT_CATEGORY: [str(skill) for skill in data]}
+            return {str(category): [str(skill) for skill in skills] for category, skills in data.items()}
+
+        taxonomy: Dict[str, List[str]] = {}
+        if suffix in ('.csv', '.tsv'):
+            reader = csv.DictReader(f, delimiter='\t' if suffix == '.tsv' else ',')
+            if 'skill' not in (reader.fieldnames or []):
+                raise ValueError(f"Taxonomy {path} needs a 'skill' column")
+            for row in reader:
+                category = (row.get('category') or DEFAULT_CATEGORY).strip()
+                taxonomy.setdefault(category, []).append(row['skill'])
+        else:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    taxonomy.setdefault(DEFAULT_CATEGORY, []).append(line.strip())
+        return taxonomy
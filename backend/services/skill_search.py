@@ -0,0 +1,241 @@
+"""
+Inverted index from skill to resume analysis ids, for candidate search.
+
+Each skill maps to a sorted int64 array of ResumeAnalysis ids, and match
+scores are kept in an id-sorted array beside them. A query intersects the
+postings shortest-first with NumPy, so it costs a few array operations
+even over millions of analyses.
+
+New analyses are added incrementally as they are stored; the index is
+snapshotted to an .npz file and, on load, caught up with rows inserted
+since the snapshot (or rebuilt from the table if the snapshot is stale).
+
+Rebuild from the database (from backend/):
+    python -m services.skill_search --rebuild
+"""
+import argparse
+import json
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from config import settings
+from utils.logger import logger
+
+REBUILD_BATCH_SIZE = 10000
+
+
+def normalize_skill(skill: str) -> str:
+    return ' '.join(skill.lower().split())
+
+
+def skills_of(skills_found: Union[str, Dict, None]) -> set:
+    """Normalized skills from a skills_found dict (or its stored JSON)"""
+    if not skills_found:
+        return set()
+    if isinstance(skills_found, str):
+        skills_found = json.loads(skills_found)
+    return {normalize_skill(s) for skills in skills_found.values() for s in skills}
+
+
+class SkillSearchIndex:
+    """Skill -> sorted analysis ids, with match scores for filtering"""
+
+    def __init__(self, snapshot_path: Optional[Path] = None):
+        self.snapshot_path = snapshot_path
+        self._postings: Dict[str, np.ndarray] = {}
+        self._ids = np.empty(0, dtype=np.int64)
+        self._scores = np.empty(0, dtype=np.float64)
+        self._pending: List[Tuple[int, set, float]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._compact()
+            return len(self._ids)
+
+    def add(self, analysis_id: int, skills_found: Union[str, Dict, None], match_score: float):
+        """Queue one analysis; merged into the arrays on the next query"""
+        with self._lock:
+            self._pending.append((int(analysis_id), skills_of(skills_found), float(match_score or 0.0)))
+
+    def add_many(self, rows: Iterable[Tuple[int, Union[str, Dict, None], float]]):
+        for analysis_id, skills_found, match_score in rows:
+            self.add(analysis_id, skills_found, match_score)
+
+    def _compact(self):
+        """Merge pending additions (caller holds the lock). Arrays are replaced, never mutated"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        ids = np.concatenate([self._ids, np.array([p[0] for p in pending], dtype=np.int64)])
+        scores = np.concatenate([self._scores, np.array([p[2] for p in pending], dtype=np.float64)])
+        order = np.argsort(ids, kind='stable')
+        ids, scores = ids[order], scores[order]
+        # Keep the newest score when an id is added twice
+        keep = np.append(ids[1:] != ids[:-1], True)
+        self._ids, self._scores = ids[keep], scores[keep]
+
+        by_skill = defaultdict(list)
+        for analysis_id, skills, _ in pending:
+            for skill in skills:
+                by_skill[skill].append(analysis_id)
+        for skill, new_ids in by_skill.items():
+            new_ids = np.unique(np.array(new_ids, dtype=np.int64))
+            existing = self._postings.get(skill)
+            if existing is None:
+                self._postings[skill] = new_ids
+            elif new_ids[0] > existing[-1]:
+                # The usual case: ids only grow
+                self._postings[skill] = np.concatenate([existing, new_ids])
+            else:
+                self._postings[skill] = np.union1d(existing, new_ids)
+
+    def search(self, skills: List[str], min_score: float = None,
+               limit: int = 50, offset: int = 0) -> Dict:
+        """Analyses having every skill, best score first (newest first on ties)"""
+        wanted = {normalize_skill(s) for s in skills if s.strip()}
+        with self._lock:
+            self._compact()
+            postings = [self._postings.get(skill) for skill in wanted]
+            ids, scores = self._ids, self._scores
+
+        if not wanted or any(p is None for p in postings):
+            matched = np.empty(0, dtype=np.int64)
+        else:
+            postings.sort(key=len)
+            matched = postings[0]
+            for posting in postings[1:]:
+                matched = np.intersect1d(matched, posting, assume_unique=True)
+                if not matched.size:
+                    break
+
+        matched_scores = scores[np.searchsorted(ids, matched)]
+        if min_score is not None:
+            # Scores are reported to 2 decimals; filter on the same values
+            keep = np.round(matched_scores, 2) >= round(min_score, 2)
+            matched, matched_scores = matched[keep], matched_scores[keep]
+
+        order = np.lexsort((-matched, -matched_scores))[offset:offset + limit]
+        return {
+            'total': int(matched.size),
+            'analysis_ids': matched[order].tolist(),
+            'scores': [round(float(s), 2) for s in matched_scores[order]]
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._compact()
+            return {
+                'analyses': int(len(self._ids)),
+                'skills': len(self._postings),
+                'postings': int(sum(len(p) for p in self._postings.values())),
+                'max_id': int(self._ids[-1]) if len(self._ids) else 0
+            }
+
+    def save(self, path: Path = None):
+        """Write a snapshot (atomically replaced)"""
+        path = Path(path or self.snapshot_path)
+        with self._lock:
+            self._compact()
+            skills = sorted(self._postings)
+            postings = [self._postings[s] for s in skills]
+            ids, scores = self._ids, self._scores
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                skills=np.array(skills, dtype=str),
+                lengths=np.array([len(p) for p in postings], dtype=np.int64),
+                postings=np.concatenate(postings) if postings else np.empty(0, dtype=np.int64),
+                ids=ids,
+                scores=scores
+            )
+        os.replace(tmp, path)
+
+    def _load_snapshot(self, path: Path):
+        with np.load(path) as data:
+            skills = data['skills'].tolist()
+            offsets = np.cumsum(data['lengths'])[:-1]
+            postings = np.split(data['postings'], offsets) if skills else []
+            with self._lock:
+                self._postings = dict(zip(skills, postings))
+                self._ids = data['ids']
+                self._scores = data['scores'].astype(np.float64)  # Older snapshots stored float32
+
+    def _reset(self):
+        with self._lock:
+            self._postings = {}
+            self._ids = np.empty(0, dtype=np.int64)
+            self._scores = np.empty(0, dtype=np.float64)
+
+    def load(self, session_factory, rebuild: bool = False) -> 'SkillSearchIndex':
+        """
+        Load the snapshot and catch up with newer rows, or rebuild from the
+        ResumeAnalysis table. Returns self, so it can serve as a registry factory.
+        """
+        from sqlalchemy import func, select
+        from models.models import ResumeAnalysis
+
+        db = session_factory()
+        try:
+            db_max_id = db.scalar(select(func.max(ResumeAnalysis.id))) or 0
+
+            since = 0
+            if not rebuild and self.snapshot_path and Path(self.snapshot_path).exists():
+                try:
+                    self._load_snapshot(self.snapshot_path)
+                    since = self.get_stats()['max_id']
+                except Exception as e:
+                    logger.error(f"Skill search snapshot unreadable, rebuilding: {str(e)}")
+                    self._reset()
+                if since > db_max_id:
+                    # The table was reset since the snapshot was written
+                    logger.info("Skill search snapshot is ahead of the database, rebuilding")
+                    self._reset()
+                    since = 0
+            else:
+                self._reset()
+
+            rows = db.execute(
+                select(ResumeAnalysis.id, ResumeAnalysis.skills_found, ResumeAnalysis.match_score)
+                .where(ResumeAnalysis.id > since)
+                .order_by(ResumeAnalysis.id)
+                .execution_options(yield_per=REBUILD_BATCH_SIZE)
+            )
+            added = 0
+            for analysis_id, skills_found, match_score in rows:
+                self.add(analysis_id, skills_found, match_score)
+                added += 1
+        finally:
+            db.close()
+
+        if self.snapshot_path and (added or rebuild):
+            self.save()
+        logger.info(f"Skill search index ready: {self.get_stats()['analyses']} analyses ({added} added from the database)")
+        return self
+
+
+skill_search_index = SkillSearchIndex(settings.MODEL_ARTIFACT_DIR / "skill_search.npz")
+
+
+def main():
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the snapshot and reindex every row")
+    args = parser.parse_args()
+
+    index = skill_search_index.load(SessionLocal, rebuild=args.rebuild)
+    print(f"Indexed {index.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Streaming spam scan of large email archives (mbox or JSONL).
+
+Messages are read one at a time, classified in bounded chunks through
+SpamDetectorService.detect_spam_batch and written to a JSONL results file
+as each chunk finishes, so memory use does not grow with archive size.
+
+Usage (from backend/):
+    python -m services.spam_ingest mail.mbox --out results.jsonl
+"""
+import argparse
+import email
+import email.policy
+import json
+import re
+import threading
+import time
+import uuid
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from config import settings
+from utils.logger import logger
+
+FORMATS = ("mbox", "jsonl")
+
+
+class _ByteCounter:
+    """Tracks how far into the archive the reader has got"""
+
+    def __init__(self):
+        self.bytes_read = 0
+
+
+def _message_text(message) -> str:
+    """Subject plus the plain-text (or tag-stripped HTML) body"""
+    subject = message.get('subject', '') or ''
+    body = ''
+    try:
+        part = message.get_body(preferencelist=('plain', 'html'))
+        if part is not None:
+            body = part.get_content()
+            if part.get_content_type() == 'text/html':
+                body = re.sub(r'<[^>]+>', ' ', body)
+    except (KeyError, LookupError, UnicodeError):
+        payload = message.get_payload(decode=True)
+        body = payload.decode('utf-8', errors='replace') if isinstance(payload, bytes) else ''
+    return f"{subject}\n{body}".strip()
+
+
+def iter_mbox_messages(path: Path, counter: _ByteCounter = None) -> Iterator[Dict]:
+    """Yield {'id', 'subject', 'text'} per message without loading the mailbox"""
+    counter = counter or _ByteCounter()
+
+    def _emit(lines: List[bytes], index: int) -> Dict:
+        message = email.message_from_bytes(b''.join(lines), policy=email.policy.default)
+        return {
+            'id': message.get('message-id') or str(index),
+            'subject': message.get('subject', ''),
+            'text': _message_text(message)
+        }
+
+    index = 0
+    current: Optional[List[bytes]] = None
+    previous_blank = True
+    with open(path, 'rb') as f:
+        for line in f:
+            counter.bytes_read += len(line)
+            if line.startswith(b'From ') and previous_blank:
+                if current:
+                    yield _emit(current, index)
+                    index += 1
+                current = []
+            elif current is not None:
+                # mboxrd: undo ">From " quoting
+                if re.match(rb'^>+From ', line):
+                    line = line[1:]
+                current.append(line)
+            previous_blank = line in (b'\n', b'\r\n')
+        if current:
+            yield _emit(current, index)
+
+
+def iter_jsonl_messages(path: Path, counter: _ByteCounter = None) -> Iterator[Dict]:
+    """Yield {'id', 'subject', 'text'} per JSONL record ('text', 'email_text' or 'body' field)"""
+    counter = counter or _ByteCounter()
+    with open(path, 'rb') as f:
+        for index, line in enumerate(f):
+            counter.bytes_read += len(line)
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record.get('text') or record.get('email_text') or record.get('body') or ''
+            yield {
+                'id': str(record.get('id', index)),
+                'subject': record.get('subject', ''),
+                'text': text
+            }
+
+
+def detect_format(path: Path) -> str:
+    return "jsonl" if Path(path).suffix.lower() in ('.jsonl', '.json', '.ndjson') else "mbox"
+
+
+def iter_messages(path: Path, fmt: str = None, counter: _ByteCounter = None) -> Iterator[Dict]:
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported archive format '{fmt}'. Use one of {FORMATS}")
+    reader = iter_jsonl_messages if fmt == "jsonl" else iter_mbox_messages
+    return reader(Path(path), counter)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def scan_archive(spam_service, path: Path, out_path: Path, fmt: str = None,
+                 chunk_size: int = None, progress: Callable[[Dict], None] = None) -> Dict:
+    """Classify every message in an archive, appending results to out_path"""
+    chunk_size = chunk_size or settings.SPAM_SCAN_CHUNK_SIZE
+    counter = _ByteCounter()
+    total_bytes = Path(path).stat().st_size
+    stats = {'processed': 0, 'spam_count': 0, 'bytes_read': 0, 'total_bytes': total_bytes}
+
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for chunk in chunked(iter_messages(path, fmt, counter), chunk_size):
+            results = spam_service.detect_spam_batch([m['text'] for m in chunk])
+            for message, result in zip(chunk, results):
+                out.write(json.dumps({
+                    'index': stats['processed'],
+                    'message_id': message['id'],
+                    'subject': message['subject'],
+                    'is_spam': result['is_spam'],
+                    'classification': result['classification'],
+                    'confidence': result['confidence'],
+                    'risk_level': result['risk_level']
+                }) + '\n')
+                stats['processed'] += 1
+                stats['spam_count'] += int(result['is_spam'])
+            out.flush()
+
+            stats['bytes_read'] = counter.bytes_read
+            if progress:
+                progress(dict(stats))
+
+    return stats
+
+
+class ScanJob:
+    """State of one background archive scan"""
+
+    def __init__(self, archive_path: Path, fmt: str, results_path: Path):
+        self.job_id = uuid.uuid4().hex
+        self.archive_path = archive_path
+        self.format = fmt
+        self.results_path = results_path
+        self.status = "queued"
+        self.error = None
+        self.stats = {'processed': 0, 'spam_count': 0, 'bytes_read': 0,
+                      'total_bytes': archive_path.stat().st_size}
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        total = self.stats['total_bytes']
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'format': self.format,
+            'processed': self.stats['processed'],
+            'spam_count': self.stats['spam_count'],
+            'progress': round(self.stats['bytes_read'] / total * 100, 1) if total else 100.0,
+            'error': self.error,
+            'elapsed_seconds': round((self.finished_at or time.time()) - self.created_at, 2)
+        }
+
+
+class ScanJobManager:
+    """Runs archive scans on the 'spam_scan' executor pool and tracks their progress"""
+
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, ScanJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, spam_service, archive_path: Path, fmt: str = None) -> ScanJob:
+        from utils.executor import inference_executor
+
+        fmt = fmt or detect_format(archive_path)
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported archive format '{fmt}'. Use one of {FORMATS}")
+        job = ScanJob(archive_path, fmt, archive_path.with_suffix('.results.jsonl'))
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # Forget the oldest finished jobs beyond the limit
+            finished = [j for j in self._jobs.values() if j.status in ("completed", "failed")]
+            for old in sorted(finished, key=lambda j: j.created_at)[:max(0, len(self._jobs) - self.max_jobs)]:
+                self._jobs.pop(old.job_id, None)
+                old.results_path.unlink(missing_ok=True)
+
+        inference_executor.submit("spam_scan", self._run, spam_service, job)
+        return job
+
+    def _run(self, spam_service, job: ScanJob):
+        job.status = "running"
+        try:
+            job.stats = scan_archive(
+                spam_service, job.archive_path, job.results_path, job.format,
+                progress=lambda stats: job.stats.update(stats)
+            )
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Spam scan {job.job_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            # The archive is the uploaded temp copy; results stay for download
+            job.archive_path.unlink(missing_ok=True)
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+scan_job_manager = ScanJobManager()
+
+
+def main():
+    from services.spam_service import SpamDetectorService
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archive", type=Path, help="mbox or JSONL file")
+    parser.add_argument("--out", type=Path, required=True, help="Results JSONL file")
+    parser.add_argument("--format", choices=FORMATS, help="Archive format (guessed from the extension)")
+    parser.add_argument("--chunk-size", type=int, default=settings.SPAM_SCAN_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    def report(stats: Dict):
+        percent = stats['bytes_read'] / stats['total_bytes'] * 100 if stats['total_bytes'] else 100.0
+        print(f"\r{stats['processed']} messages, {stats['spam_count']} spam ({percent:.1f}%)", end="", flush=True)
+
+    stats = scan_archive(SpamDetectorService(), args.archive, args.out, args.format, args.chunk_size, report)
+    print(f"\nDone: {stats['processed']} messages, {stats['spam_count']} spam -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import re
+from bisect import bisect_left
+from typing import Dict, List, Set, Tuple
+
+from utils.aho_corasick import AhoCorasick
+
+
+class SpamPatternMatcher:
+    """
+    Precompiled single-pass matcher for spam keywords and phishing patterns.
+
+    Keywords are found with one Aho-Corasick pass. Phishing patterns of the
+    form ``word.*word`` / ``word.*\\d+.*words?`` are not run as separate
+    backtracking regexes: one combined regex with a named group per anchor
+    word locates every anchor in a single scan, and each line's greedy match
+    is then resolved from the anchor positions. The result is exactly what
+    ``re.findall(pattern, text)`` returns for each pattern, at a cost linear
+    in the text length.
+    """
+
+    DIGITS = r'\d+'
+
+    def __init__(self, keywords: List[str], phishing_patterns: List[str]):
+        self.keywords = list(keywords)
+        self.keyword_automaton = AhoCorasick(self.keywords)
+
+        self.patterns = [self._parse(pattern) for pattern in phishing_patterns]
+        literals = sorted({seg[1] for segments in self.patterns for seg in segments if seg[0] == 'literal'})
+        for a in literals:
+            for b in literals:
+                if a != b and b.startswith(a):
+                    raise ValueError(f"Anchor '{a}' is a prefix of '{b}'")
+
+        self._group_names = {literal: f"a{i}" for i, literal in enumerate(literals)}
+        alternatives = [f"(?P<{name}>{re.escape(literal)})" for literal, name in self._group_names.items()]
+        alternatives += [r"(?P<digit>\d)", r"(?P<newline>\n)"]
+        # Zero-width lookahead so overlapping anchors are all reported
+        self.anchor_regex = re.compile("(?=" + "|".join(alternatives) + ")")
+        self._literal_by_group = {name: literal for literal, name in self._group_names.items()}
+
+    @classmethod
+    def _parse(cls, pattern: str) -> List[Tuple]:
+        """Split 'a.*b' style patterns into ('literal', word, optional_suffix) / ('digits',) segments"""
+        segments = []
+        for part in pattern.split('.*'):
+            if part == cls.DIGITS:
+                segments.append(('digits',))
+            elif re.fullmatch(r'[a-z]+', part):
+                segments.append(('literal', part, ''))
+            elif re.fullmatch(r'[a-z]+\?', part) and len(part) > 2:
+                segments.append(('literal', part[:-2], part[-2]))
+            else:
+                raise ValueError(f"Unsupported phishing pattern segment '{part}' in '{pattern}'")
+        if len(segments) < 2 or segments[0][0] != 'literal':
+            raise ValueError(f"Unsupported phishing pattern '{pattern}'")
+        return segments
+
+    def _scan_lines(self, text: str) -> List[Dict[str, List[int]]]:
+        """Anchor start positions per line"""
+        lines = [{}]
+        for match in self.anchor_regex.finditer(text):
+            group = match.lastgroup
+            if group == 'newline':
+                lines.append({})
+                continue
+            key = 'digits' if group == 'digit' else self._literal_by_group[group]
+            lines[-1].setdefault(key, []).append(match.start())
+        return lines
+
+    @staticmethod
+    def _segment_key(segment: Tuple) -> str:
+        return 'digits' if segment[0] == 'digits' else segment[1]
+
+    def _match_line(self, text: str, anchors: Dict[str, List[int]], segments: List[Tuple]):
+        """Greedy leftmost match of one pattern on one line, or None"""
+        first = anchors.get(segments[0][1])
+        if not first:
+            return None
+        start = first[0]
+
+        # Earliest feasible placement of the middle segments
+        position = start + len(segments[0][1])
+        for segment in segments[1:-1]:
+            occurrences = anchors.get(self._segment_key(segment), [])
+            index = bisect_left(occurrences, position)
+            if index == len(occurrences):
+                return None
+            position = occurrences[index] + (1 if segment[0] == 'digits' else len(segment[1]))
+
+        # Greedy '.*' extends to the last occurrence of the final segment
+        last = segments[-1]
+        occurrences = anchors.get(self._segment_key(last), [])
+        if not occurrences or occurrences[-1] < position:
+            return None
+        end = occurrences[-1]
+        if last[0] == 'digits':
+            end += 1
+        else:
+            end += len(last[1])
+            if last[2] and text[end:end + 1] == last[2]:
+                end += 1
+        return text[start:end]
+
+    def match(self, text_lower: str) -> Tuple[Set[str], List[List[str]]]:
+        """
+        Scan lowercased text once.
+
+        Returns the set of keywords present and, per phishing pattern, the
+        list of matched strings (as re.findall would return them).
+        """
+        present = {self.keywords[i] for i in self.keyword_automaton.find_present(text_lower)}
+
+        lines = self._scan_lines(text_lower)
+        phishing_matches = []
+        for segments in self.patterns:
+            found = []
+            for anchors in lines:
+                matched = self._match_line(text_lower, anchors, segments)
+                if matched is not None:
+                    found.append(matched)
+            phishing_matches.append(found)
+
+        return present, phishing_matches
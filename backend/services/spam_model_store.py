@@ -0,0 +1,186 @@
+"""
+Versioned on-disk store for the trained spam vectorizer and classifier.
+
+Artifacts live in <root>/<version>/ with a manifest recording the hash of
+the training corpus, the scikit-learn version and a SHA-256 per file. They
+are dumped uncompressed so joblib can memory-map the numpy arrays, letting
+several uvicorn workers share the same pages.
+
+Train and export from a labeled corpus (from backend/):
+    python -m services.spam_model_store --corpus emails.jsonl
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import sklearn
+
+FORMAT_VERSION = 1
+ARTIFACT_FILES = ("vectorizer.joblib", "classifier.joblib")
+
+_LABELS = {'1': 1, 'spam': 1, 'phishing': 1, 'true': 1, '0': 0, 'ham': 0, 'legitimate': 0, 'false': 0}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def corpus_hash(texts: List[str], labels: List[int]) -> str:
+    """Content hash of a labeled corpus"""
+    payload = json.dumps([texts, labels], ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def load_corpus(path: Path) -> Tuple[List[str], List[int]]:
+    """
+    Load a labeled corpus.
+
+    JSONL lines are {"text": ..., "label": ...}; CSV/TSV files need 'text'
+    and 'label' columns. Labels may be 1/0, spam/ham, phishing/legitimate.
+    """
+    path = Path(path)
+    texts, labels = [], []
+
+    def _add(text, label):
+        key = str(label).strip().lower()
+        if key not in _LABELS:
+            raise ValueError(f"Unknown label '{label}' in {path}")
+        texts.append(str(text))
+        labels.append(_LABELS[key])
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() in ('.jsonl', '.json'):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    _add(record['text'], record['label'])
+        else:
+            delimiter = '\t' if path.suffix.lower() == '.tsv' else ','
+            for row in csv.DictReader(f, delimiter=delimiter):
+                _add(row['text'], row['label'])
+
+    if len(set(labels)) < 2:
+        raise ValueError(f"Corpus {path} needs both spam and legitimate examples")
+    return texts, labels
+
+
+class SpamModelStore:
+    """Save and load versioned spam model artifacts"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _latest_pointer(self) -> Path:
+        return self.root / "LATEST"
+
+    def save(self, vectorizer, classifier, source_hash: str, n_samples: int) -> Dict:
+        """Write artifacts for a corpus and point LATEST at them"""
+        version = source_hash[:12]
+        target = self.root / version
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        if not (target / "manifest.json").exists():
+            # Build in a temp dir and rename, so concurrent workers never see half-written files
+            staging = Path(tempfile.mkdtemp(prefix=f".{version}-", dir=self.root))
+            try:
+                joblib.dump(vectorizer, staging / "vectorizer.joblib")
+                joblib.dump(classifier, staging / "classifier.joblib")
+                manifest = {
+                    'version': version,
+                    'format_version': FORMAT_VERSION,
+                    'corpus_hash': source_hash,
+                    'n_samples': n_samples,
+                    'sklearn_version': sklearn.__version__,
+                    'created_at': datetime.utcnow().isoformat() + "Z",
+                    'files': {name: _file_sha256(staging / name) for name in ARTIFACT_FILES}
+                }
+                with open(staging / "manifest.json", 'w') as f:
+                    json.dump(manifest, f, indent=2)
+                os.replace(staging, target)
+            except OSError:
+                # Another worker published the same version first
+                shutil.rmtree(staging, ignore_errors=True)
+                if not (target / "manifest.json").exists():
+                    raise
+
+        pointer_tmp = self.root / f".LATEST.{os.getpid()}"
+        pointer_tmp.write_text(version)
+        os.replace(pointer_tmp, self._latest_pointer())
+        return self.read_manifest(version)
+
+    def read_manifest(self, version: str) -> Optional[Dict]:
+        path = self.root / version / "manifest.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def latest_version(self) -> Optional[str]:
+        pointer = self._latest_pointer()
+        return pointer.read_text().strip() if pointer.exists() else None
+
+    def load_latest(self, expected_corpus_hash: str = None, verify: bool = True):
+        """
+        Load the latest artifacts as (vectorizer, classifier, manifest).
+
+        Returns None if nothing is stored or the artifacts are stale: built
+        from a different corpus, by another scikit-learn version, in an old
+        format, or failing their checksum.
+        """
+        version = self.latest_version()
+        manifest = self.read_manifest(version) if version else None
+        if manifest is None:
+            return None
+
+        if manifest.get('format_version') != FORMAT_VERSION:
+            return None
+        if manifest.get('sklearn_version') != sklearn.__version__:
+            return None
+        if expected_corpus_hash and manifest.get('corpus_hash') != expected_corpus_hash:
+            return None
+
+        directory = self.root / version
+        if verify:
+            for name, digest in manifest['files'].items():
+                if not (directory / name).exists() or _file_sha256(directory / name) != digest:
+                    return None
+
+        vectorizer = joblib.load(directory / "vectorizer.joblib", mmap_mode='r')
+        classifier = joblib.load(directory / "classifier.joblib", mmap_mode='r')
+        return vectorizer, classifier, manifest
+
+
+def main():
+    from config import settings
+    from services.spam_service import SpamDetectorService
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="Labeled corpus (JSONL/CSV/TSV); built-in samples if omitted")
+    parser.add_argument("--out", type=Path, default=settings.MODEL_ARTIFACT_DIR / "spam",
+                        help="Artifact directory")
+    args = parser.parse_args()
+
+    if args.corpus:
+        texts, labels = load_corpus(args.corpus)
+    else:
+        texts, labels = SpamDetectorService.default_corpus()
+
+    vectorizer, classifier = SpamDetectorService.fit(texts, labels)
+    manifest = SpamModelStore(args.out).save(vectorizer, classifier, corpus_hash(texts, labels), len(texts))
+    print(f"Exported spam model {manifest['version']} ({manifest['n_samples']} samples) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
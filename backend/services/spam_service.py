@@ -1,17 +1,15 @@
 import re
-import pickle
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
-import nltk
-
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+from config import settings
+from services.spam_matcher import SpamPatternMatcher
+from services.spam_model_store import SpamModelStore, corpus_hash, load_corpus
+from utils.logger import logger
+from utils.nltk_data import ensure_nltk_data
 
 class SpamDetectorService:
     """Service for detecting spam and phishing emails"""
@@ -35,59 +33,101 @@ class SpamDetectorService:
         r'reset.*password'
     ]
     
+    # Built-in training data (used when SPAM_CORPUS_FILE is not set)
+    DEFAULT_SPAM_SAMPLES = [
+        "Congratulations! You've won $1,000,000! Click here to claim your prize now!",
+        "URGENT: Your account has been suspended. Verify your identity immediately.",
+        "Free money! Act now! Limited time offer expires in 24 hours!",
+        "Your bank account needs verification. Click this link to confirm.",
+        "You've been selected for a special cash prize. Claim now!",
+        "WINNER! You won the lottery! Send your details to claim.",
+        "Verify your password immediately or account will be deleted.",
+        "Unusual activity detected. Reset your password now.",
+        "Free credit card offer! Apply now! No fees!",
+        "Your tax refund is ready. Click here to receive $5000.",
+        "Inheritance money waiting for you. Contact us immediately.",
+        "Casino bonus! Free $500! Play now and win big!",
+        "Your payment method expired. Update now to avoid suspension.",
+        "Security alert! Confirm your social security number.",
+        "Limited time offer! Buy now and get 90% discount!"
+    ]
+    
+    DEFAULT_HAM_SAMPLES = [
+        "Hi, let's schedule a meeting for next week to discuss the project.",
+        "Thank you for your order. Your package will arrive in 3-5 business days.",
+        "Reminder: Team standup meeting tomorrow at 10 AM.",
+        "Your monthly statement is now available. Please review at your convenience.",
+        "Welcome to our newsletter! Here are this week's updates.",
+        "Your appointment is confirmed for Monday at 2 PM.",
+        "Project deadline extended to next Friday. Please plan accordingly.",
+        "Thank you for attending our webinar. Here are the slides.",
+        "Your subscription renewal is coming up next month.",
+        "Meeting notes from today's discussion are attached.",
+        "Please review the attached document and provide feedback.",
+        "Your report has been successfully submitted.",
+        "Reminder: Please complete the survey by end of week.",
+        "New features have been added to your account.",
+        "Your request has been processed successfully."
+    ]
+    
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        ensure_nltk_data('tokenizers/punkt')
+        self.vectorizer = None
         self.model = None
-        self._train_model()
+        self.manifest = None
+        self.store = SpamModelStore(settings.MODEL_ARTIFACT_DIR / "spam")
+        self.matcher = SpamPatternMatcher(self.SPAM_KEYWORDS, self.PHISHING_PATTERNS)
+        self._load_or_train()
     
-    def _train_model(self):
-        """Train spam detection model with synthetic data"""
-        # Training data (spam examples)
-        spam_samples = [
-            "Congratulations! You've won $1,000,000! Click here to claim your prize now!",
-            "URGENT: Your account has been suspended. Verify your identity immediately.",
-            "Free money! Act now! Limited time offer expires in 24 hours!",
-            "Your bank account needs verification. Click this link to confirm.",
-            "You've been selected for a special cash prize. Claim now!",
-            "WINNER! You won the lottery! Send your details to claim.",
-            "Verify your password immediately or account will be deleted.",
-            "Unusual activity detected. Reset your password now.",
-            "Free credit card offer! Apply now! No fees!",
-            "Your tax refund is ready. Click here to receive $5000.",
-            "Inheritance money waiting for you. Contact us immediately.",
-            "Casino bonus! Free $500! Play now and win big!",
-            "Your payment method expired. Update now to avoid suspension.",
-            "Security alert! Confirm your social security number.",
-            "Limited time offer! Buy now and get 90% discount!"
-        ]
-        
-        # Training data (legitimate examples)
-        ham_samples = [
-            "Hi, let's schedule a meeting for next week to discuss the project.",
-            "Thank you for your order. Your package will arrive in 3-5 business days.",
-            "Reminder: Team standup meeting tomorrow at 10 AM.",
-            "Your monthly statement is now available. Please review at your convenience.",
-            "Welcome to our newsletter! Here are this week's updates.",
-            "Your appointment is confirmed for Monday at 2 PM.",
-            "Project deadline extended to next Friday. Please plan accordingly.",
-            "Thank you for attending our webinar. Here are the slides.",
-            "Your subscription renewal is coming up next month.",
-            "Meeting notes from today's discussion are attached.",
-            "Please review the attached document and provide feedback.",
-            "Your report has been successfully submitted.",
-            "Reminder: Please complete the survey by end of week.",
-            "New features have been added to your account.",
-            "Your request has been processed successfully."
-        ]
-        
-        # Combine and create labels
-        X_train = spam_samples + ham_samples
-        y_train = [1] * len(spam_samples) + [0] * len(ham_samples)
-        
-        # Train vectorizer and model
-        X_vectorized = self.vectorizer.fit_transform(X_train)
-        self.model = MultinomialNB()
-        self.model.fit(X_vectorized, y_train)
+    @classmethod
+    def default_corpus(cls) -> Tuple[List[str], List[int]]:
+        """Built-in synthetic training data"""
+        texts = cls.DEFAULT_SPAM_SAMPLES + cls.DEFAULT_HAM_SAMPLES
+        labels = [1] * len(cls.DEFAULT_SPAM_SAMPLES) + [0] * len(cls.DEFAULT_HAM_SAMPLES)
+        return texts, labels
+    
+    @staticmethod
+    def fit(texts: List[str], labels: List[int]) -> Tuple[TfidfVectorizer, MultinomialNB]:
+        """Fit vectorizer and classifier on a labeled corpus"""
+        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        X_vectorized = vectorizer.fit_transform(texts)
+        model = MultinomialNB()
+        model.fit(X_vectorized, labels)
+        return vectorizer, model
+    
+    def _load_or_train(self):
+        """
+        Load the stored model, retraining only if it is missing or stale.
+        
+        With SPAM_CORPUS_FILE set, stored artifacts must have been built from
+        that exact corpus; otherwise the latest export (e.g. from the CLI) is used.
+        """
+        texts, labels, source_hash = None, None, None
+        if settings.SPAM_CORPUS_FILE:
+            texts, labels = load_corpus(Path(settings.SPAM_CORPUS_FILE))
+            source_hash = corpus_hash(texts, labels)
+        
+        try:
+            loaded = self.store.load_latest(expected_corpus_hash=source_hash)
+        except Exception as e:
+            logger.error(f"Could not load spam model artifacts: {str(e)}")
+            loaded = None
+        
+        if loaded is not None:
+            self.vectorizer, self.model, self.manifest = loaded
+            logger.info(f"Loaded spam model {self.manifest['version']}")
+            return
+        
+        if texts is None:
+            texts, labels = self.default_corpus()
+            source_hash = corpus_hash(texts, labels)
+        
+        self.vectorizer, self.model = self.fit(texts, labels)
+        try:
+            self.manifest = self.store.save(self.vectorizer, self.model, source_hash, len(texts))
+            logger.info(f"Trained and saved spam model {self.manifest['version']}")
+        except OSError as e:
+            logger.error(f"Could not save spam model artifacts: {str(e)}")
     
     def extract_features(self, text: str) -> Dict[str, any]:
         """Extract features from email text"""
@@ -104,23 +144,19 @@ class SpamDetectorService:
             'suspicious_patterns': []
         }
         
+        # Find keywords and phishing patterns in one pass
+        keywords_found, phishing_matches = self.matcher.match(text_lower)
+        
         # Count spam keywords
-        for keyword in self.SPAM_KEYWORDS:
-            if keyword in text_lower:
-                features['spam_keyword_count'] += 1
-                if keyword in ['urgent', 'act now', 'limited time']:
-                    features['has_urgent_words'] = True
-                if keyword in ['money', 'cash', 'prize', 'free']:
-                    features['has_money_words'] = True
-                if keyword in ['click here', 'click link']:
-                    features['has_link_words'] = True
+        features['spam_keyword_count'] = len(keywords_found)
+        features['has_urgent_words'] = not keywords_found.isdisjoint(['urgent', 'act now', 'limited time'])
+        features['has_money_words'] = not keywords_found.isdisjoint(['money', 'cash', 'prize', 'free'])
+        features['has_link_words'] = not keywords_found.isdisjoint(['click here', 'click link'])
         
         # Check phishing patterns
-        for pattern in self.PHISHING_PATTERNS:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                features['phishing_pattern_count'] += len(matches)
-                features['suspicious_patterns'].extend(matches)
+        for matches in phishing_matches:
+            features['phishing_pattern_count'] += len(matches)
+            features['suspicious_patterns'].extend(matches)
         
         # Check for excessive punctuation
         punctuation_count = len(re.findall(r'[!?]{2,}', text))
@@ -134,46 +170,34 @@ class SpamDetectorService:
     
     def calculate_confidence(self, features: Dict, ml_probability: float) -> float:
         """Calculate confidence score based on features and ML prediction"""
-        # Base confidence from ML model
-        confidence = ml_probability
-        
-        # Adjust based on features
-        if features['spam_keyword_count'] > 3:
-            confidence = min(confidence + 0.1, 1.0)
-        
-        if features['phishing_pattern_count'] > 0:
-            confidence = min(confidence + 0.15, 1.0)
-        
-        if features['has_urgent_words'] and features['has_money_words']:
-            confidence = min(confidence + 0.1, 1.0)
-        
-        if features['excessive_punctuation']:
-            confidence = min(confidence + 0.05, 1.0)
-        
-        if features['all_caps_words'] > 3:
-            confidence = min(confidence + 0.05, 1.0)
-        
-        return round(confidence, 3)
+        return float(self.calculate_confidence_batch([features], np.array([ml_probability]))[0])
     
-    def detect_spam(self, email_text: str) -> Dict:
-        """Main method to detect spam/phishing"""
-        # Extract features
-        features = self.extract_features(email_text)
-        
-        # Vectorize text
-        X = self.vectorizer.transform([email_text])
-        
-        # Predict
-        prediction = self.model.predict(X)[0]
-        probability = self.model.predict_proba(X)[0]
-        
-        # Calculate confidence
-        spam_probability = probability[1] if len(probability) > 1 else probability[0]
-        confidence = self.calculate_confidence(features, spam_probability)
-        
-        # Determine classification
-        is_spam = bool(prediction == 1)
-        
+    def calculate_confidence_batch(self, features_list: List[Dict], ml_probabilities: np.ndarray) -> np.ndarray:
+        """Vectorized calculate_confidence over a batch of messages"""
+        n = len(features_list)
+        keyword_count = np.fromiter((f['spam_keyword_count'] for f in features_list), dtype=np.int64, count=n)
+        phishing_count = np.fromiter((f['phishing_pattern_count'] for f in features_list), dtype=np.int64, count=n)
+        urgent_money = np.fromiter(
+            (f['has_urgent_words'] and f['has_money_words'] for f in features_list), dtype=bool, count=n
+        )
+        punctuation = np.fromiter((f['excessive_punctuation'] for f in features_list), dtype=bool, count=n)
+        caps_count = np.fromiter((f['all_caps_words'] for f in features_list), dtype=np.int64, count=n)
+        
+        # Base confidence from ML model, adjusted based on features
+        confidence = np.asarray(ml_probabilities, dtype=np.float64)
+        for mask, boost in (
+            (keyword_count > 3, 0.1),
+            (phishing_count > 0, 0.15),
+            (urgent_money, 0.1),
+            (punctuation, 0.05),
+            (caps_count > 3, 0.05)
+        ):
+            confidence = np.where(mask, np.minimum(confidence + boost, 1.0), confidence)
+        
+        return np.round(confidence, 3)
+    
+    def _build_result(self, features: Dict, is_spam: bool, confidence: float) -> Dict:
+        """Assemble classification, explanation and risk level"""
         # Generate explanation
         reasons = []
         if features['spam_keyword_count'] > 0:
@@ -195,3 +219,29 @@ class SpamDetectorService:
             'reasons': reasons if is_spam else ['No suspicious patterns detected'],
             'risk_level': 'HIGH' if confidence > 0.8 else 'MEDIUM' if confidence > 0.5 else 'LOW'
         }
+    
+    def detect_spam_batch(self, email_texts: List[str]) -> List[Dict]:
+        """Detect spam/phishing for many messages with one vectorize/predict pass"""
+        if not email_texts:
+            return []
+        
+        # Extract features
+        features_list = [self.extract_features(text) for text in email_texts]
+        
+        # Vectorize all texts into one sparse matrix and predict once
+        X = self.vectorizer.transform(email_texts)
+        probabilities = self.model.predict_proba(X)
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        
+        # Calculate confidence
+        spam_probabilities = probabilities[:, 1] if probabilities.shape[1] > 1 else probabilities[:, 0]
+        confidences = self.calculate_confidence_batch(features_list, spam_probabilities)
+        
+        return [
+            self._build_result(features, bool(prediction == 1), float(confidence))
+            for features, prediction, confidence in zip(features_list, predictions, confidences)
+        ]
+    
+    def detect_spam(self, email_text: str) -> Dict:
+        """Main method to detect spam/phishing"""
+        return self.detect_spam_batch([email_text])[0]
@@ -0,0 +1,192 @@
+"""
+Hierarchical map-reduce summarization for very long documents.
+
+The text (a string, or pieces streamed from an upload) is split into
+sections of at most SUMMARY_CHUNK_CHARS characters at paragraph or
+sentence boundaries. Sections are summarized in parallel on
+the 'summary_map' process pool, with at most SUMMARY_MAX_INFLIGHT_CHUNKS
+queued at a time so memory stays bounded by the section size rather than
+the document size. Section summaries are concatenated in document order;
+if that is still longer than one section it is mapped again, and the final
+text is summarized once more (the reduce step).
+"""
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from config import settings
+from utils.executor import inference_executor
+
+_BREAKS = ('\n\n', '. ', '! ', '? ', '\n', ' ')
+
+_worker_service = None
+
+
+def _section_end(buffer: str, start: int, max_chars: int) -> int:
+    """End of the section starting at start, at the most natural break available"""
+    # Only look for a break in the back half so sections stay reasonably sized
+    for separator in _BREAKS:
+        cut = buffer.rfind(separator, start + max_chars // 2, start + max_chars)
+        if cut != -1:
+            return cut + len(separator)
+    return start + max_chars
+
+
+def iter_sections(pieces: Iterable[str], max_chars: int) -> Iterator[str]:
+    """
+    Yield sections of at most max_chars from a stream of text pieces.
+
+    Sections are emitted as soon as enough text has arrived, and at most
+    one section plus one piece is buffered at a time.
+    """
+    buffer = ''
+    start = 0
+    for piece in pieces:
+        buffer = buffer[start:] + piece
+        start = 0
+        while len(buffer) - start > max_chars:
+            end = _section_end(buffer, start, max_chars)
+            section = buffer[start:end].strip()
+            if section:
+                yield section
+            start = end
+    section = buffer[start:].strip()
+    if section:
+        yield section
+
+
+def split_sections(text: str, max_chars: int) -> Iterator[str]:
+    """Yield sections of at most max_chars, cut at the most natural break available"""
+    return iter_sections((text,), max_chars)
+
+
+def summarize_section(index: int, section: str, summary_ratio: float, algorithm: str) -> Dict:
+    """Map step; runs in a worker process with its own summarizer"""
+    global _worker_service
+    if _worker_service is None:
+        from services.summary_service import SummarizerService
+        _worker_service = SummarizerService()
+        _worker_service.cache_size = 0  # Sections are never seen twice
+    result = _worker_service.generate_summary(section, summary_ratio, algorithm)
+    return {
+        'index': index,
+        'summary': result['summary'],
+        'bullet_points': result['bullet_points'],
+        'original_length': result['original_length'],
+        'summary_length': result['summary_length']
+    }
+
+
+def map_sections(sections: Iterable[str], summary_ratio: float, algorithm: str,
+                 max_in_flight: int) -> Iterator[Dict]:
+    """Yield section summaries as they finish, keeping at most max_in_flight queued"""
+    sections = iter(sections)
+    pending = set()
+    index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                section = next(sections, None)
+                if section is None:
+                    exhausted = True
+                    break
+                pending.add(inference_executor.submit(
+                    "summary_map", summarize_section, index, section, summary_ratio, algorithm
+                ))
+                index += 1
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_chunked_summary(summary_service, text: Union[str, Iterable[str]], summary_ratio: float = 0.3,
+                         algorithm: str = "frequency", max_length: Optional[int] = None,
+                         chunk_chars: int = None, max_in_flight: int = None) -> Iterator[Dict]:
+    """
+    Summarize text hierarchically, yielding progress events.
+
+    text may be a string or an iterable of pieces; pieces are consumed
+    lazily, so sections are mapped while the rest is still being read.
+
+    Yields {'type': 'chunk', ...} as each first-level section finishes (in
+    completion order), {'type': 'level', ...} when the section summaries
+    need another map pass, and finally {'type': 'done', ...} with the
+    reduced summary.
+    """
+    chunk_chars = chunk_chars or settings.SUMMARY_CHUNK_CHARS
+    max_in_flight = max(1, max_in_flight or settings.SUMMARY_MAX_INFLIGHT_CHUNKS)
+
+    original_length = 0
+    single_section = None
+
+    def counted(pieces: Iterable[str]) -> Iterator[str]:
+        nonlocal original_length
+        for piece in pieces:
+            original_length += len(piece)
+            yield piece
+
+    def first_level_sections() -> Iterator[str]:
+        nonlocal single_section
+        pieces = (text,) if isinstance(text, str) else text
+        for index, section in enumerate(iter_sections(counted(pieces), chunk_chars)):
+            # Remembered only while it is the only section
+            single_section = section if index == 0 else None
+            yield section
+
+    sections = first_level_sections()
+    current = None
+    level = 0
+    section_count = 0
+    while True:
+        summaries = {}
+        for result in map_sections(sections, summary_ratio, algorithm, max_in_flight):
+            summaries[result['index']] = result['summary']
+            if level == 0:
+                yield {
+                    'type': 'chunk',
+                    'index': result['index'],
+                    'completed': len(summaries),
+                    'summary': result['summary'],
+                    'bullet_points': result['bullet_points']
+                }
+        if level == 0:
+            section_count = len(summaries)
+
+        joined = ' '.join(summaries[i] for i in sorted(summaries))
+        level += 1
+        if level == 1 and single_section is not None:
+            # The document fit in one section: reduce the original, not its summary
+            joined = single_section
+            break
+        # Stop once the summaries fit in one section, or a pass no longer shrinks them
+        previous_length = original_length if current is None else len(current)
+        if len(summaries) <= 1 or len(joined) <= chunk_chars or len(joined) >= previous_length:
+            break
+        yield {'type': 'level', 'level': level, 'sections': len(summaries), 'length': len(joined)}
+        current = joined
+        sections = split_sections(current, chunk_chars)
+
+    if max_length:
+        reduce_call = (summary_service.summarize_with_length, joined, max_length, algorithm)
+    else:
+        reduce_call = (summary_service.generate_summary, joined, summary_ratio, algorithm)
+    result = inference_executor.submit("summary", *reduce_call).result()
+
+    yield {
+        'type': 'done',
+        'summary': result['summary'],
+        'bullet_points': result['bullet_points'],
+        'key_terms': result['key_terms'],
+        'metrics': {
+            'original_length': original_length,
+            'summary_length': result['summary_length'],
+            'compression_ratio': round(result['summary_length'] / original_length, 2) if original_length else 1.0,
+            'sections': section_count,
+            'levels': level
+        }
+    }
@@ -1,27 +1,70 @@
 import re
-import nltk
+import hashlib
+import threading
 from typing import Dict, List
-from collections import Counter
+from collections import OrderedDict
 import numpy as np
-
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
-
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
+from config import settings
+from utils.nltk_data import ensure_nltk_data
+from services.sentence_ranking import SentenceFeatures, rank_sentences, RANKING_ALGORITHMS
+
+class AnalyzedDocument:
+    """
+    Tokenized and scored text, computed once and shared by every
+    summary variant (ratio, bullet points, length-bounded)
+    """
+    
+    def __init__(self, cleaned_text: str, sentences: List[str], token_ids: List[List[int]],
+                 vocabulary: List[str], word_frequencies: Dict[str, float], sentence_scores: Dict[int, float],
+                 features: SentenceFeatures = None, algorithm: str = "frequency"):
+        self.cleaned_text = cleaned_text
+        self.sentences = sentences
+        self.token_ids = token_ids  # Per sentence, ids into vocabulary
+        self.vocabulary = vocabulary  # Token id -> lowercased token
+        self.word_frequencies = word_frequencies
+        self.sentence_scores = sentence_scores  # Sentence index -> score (long sentences only)
+        self.features = features  # Sparse sentence-term matrix, reused to rescore
+        self.algorithm = algorithm
+        self._variants = {algorithm: self}
+        
+        # Highest score first; ties keep document order
+        indices = np.fromiter(sentence_scores.keys(), dtype=np.int64, count=len(sentence_scores))
+        scores = np.fromiter(sentence_scores.values(), dtype=np.float64, count=len(sentence_scores))
+        self.ranking = indices[np.argsort(-scores, kind='stable')].tolist()
+    
+    def top_sentences(self, n: int) -> List[int]:
+        """Indices of the n best sentences, in document order"""
+        return np.sort(self.ranking[:max(0, n)]).tolist()
+    
+    def rescored(self, algorithm: str) -> 'AnalyzedDocument':
+        """Same tokens ranked by another algorithm (computed once per document)"""
+        variant = self._variants.get(algorithm)
+        if variant is None:
+            variant = AnalyzedDocument(
+                self.cleaned_text, self.sentences, self.token_ids, self.vocabulary,
+                self.word_frequencies, rank_sentences(algorithm, self.features),
+                self.features, algorithm
+            )
+            variant._variants = self._variants
+            self._variants[algorithm] = variant
+        return variant
+    
+    def join(self, indices: List[int]) -> str:
+        return ' '.join(self.sentences[i] for i in indices)
 
 class SummarizerService:
     """Service for extractive text summarization"""
     
     def __init__(self):
+        ensure_nltk_data('tokenizers/punkt', 'corpora/stopwords')
         self.stop_words = set(stopwords.words('english'))
+        self.cache_size = settings.SUMMARY_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def preprocess_text(self, text: str) -> str:
         """Clean and preprocess text"""
@@ -31,121 +74,70 @@ class SummarizerService:
         text = re.sub(r'[^\w\s\.\!\?]', '', text)
         return text.strip()
     
-    def calculate_word_frequencies(self, text: str) -> Dict[str, float]:
-        """Calculate normalized word frequencies"""
-        words = word_tokenize(text.lower())
-        
-        # Filter stopwords and short words
-        filtered_words = [
-            word for word in words 
-            if word.isalnum() and word not in self.stop_words and len(word) > 2
+    def _analyze(self, text: str) -> AnalyzedDocument:
+        """Tokenize once and compute frequencies and sentence scores"""
+        cleaned_text = self.preprocess_text(text)
+        sentences = sent_tokenize(cleaned_text)
+        sentence_tokens = [word_tokenize(sentence.lower()) for sentence in sentences]
+        
+        vocabulary_ids = {}
+        token_ids = [
+            [vocabulary_ids.setdefault(word, len(vocabulary_ids)) for word in words]
+            for words in sentence_tokens
         ]
         
-        # Count frequencies
-        word_freq = Counter(filtered_words)
+        vocabulary = list(vocabulary_ids)
+        features = SentenceFeatures(token_ids, vocabulary, self.stop_words)
         
-        # Normalize
-        max_freq = max(word_freq.values()) if word_freq else 1
-        normalized_freq = {word: freq / max_freq for word, freq in word_freq.items()}
+        # Normalized frequencies of content words, in order of first appearance
+        frequencies = features.term_frequencies()
+        word_frequencies = {vocabulary[i]: float(frequencies[i]) for i in np.flatnonzero(frequencies)}
         
-        return normalized_freq
-    
-    def score_sentences(self, sentences: List[str], word_frequencies: Dict[str, float]) -> Dict[str, float]:
-        """Score sentences based on word frequencies"""
-        sentence_scores = {}
-        
-        for sentence in sentences:
-            words = word_tokenize(sentence.lower())
-            word_count = len([w for w in words if w.isalnum()])
-            
-            if word_count > 5:  # Ignore very short sentences
-                score = 0
-                for word in words:
-                    if word in word_frequencies:
-                        score += word_frequencies[word]
-                
-                # Normalize by sentence length
-                sentence_scores[sentence] = score / word_count
-        
-        return sentence_scores
-    
-    def extract_key_points(self, text: str, num_points: int = 5) -> List[str]:
-        """Extract key bullet points from text"""
-        sentences = sent_tokenize(text)
-        word_frequencies = self.calculate_word_frequencies(text)
-        sentence_scores = self.score_sentences(sentences, word_frequencies)
-        
-        # Sort sentences by score
-        ranked_sentences = sorted(
-            sentence_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
+        return AnalyzedDocument(
+            cleaned_text, sentences, token_ids, vocabulary,
+            word_frequencies, rank_sentences("frequency", features), features
         )
-        
-        # Get top sentences
-        top_sentences = ranked_sentences[:min(num_points, len(ranked_sentences))]
-        
-        # Sort by original order
-        original_order = []
-        for sentence in sentences:
-            for scored_sentence, score in top_sentences:
-                if sentence == scored_sentence:
-                    original_order.append(sentence)
-                    break
-        
-        return original_order
     
-    def generate_summary(self, text: str, summary_ratio: float = 0.3) -> Dict:
-        """Generate extractive summary"""
-        # Preprocess
-        cleaned_text = self.preprocess_text(text)
-        
-        # Tokenize into sentences
-        sentences = sent_tokenize(cleaned_text)
-        
-        if len(sentences) <= 3:
-            return {
-                'summary': cleaned_text,
-                'bullet_points': sentences,
-                'original_length': len(text),
-                'summary_length': len(cleaned_text),
-                'compression_ratio': 1.0,
-                'sentences_original': len(sentences),
-                'sentences_summary': len(sentences)
-            }
-        
-        # Calculate word frequencies
-        word_frequencies = self.calculate_word_frequencies(cleaned_text)
+    def analyze(self, text: str, algorithm: str = "frequency") -> AnalyzedDocument:
+        """Analyze text, reusing the cached analysis of identical input"""
+        if algorithm not in RANKING_ALGORITHMS:
+            raise ValueError(f"Unknown ranking algorithm '{algorithm}'. Use one of {RANKING_ALGORITHMS}")
         
-        # Score sentences
-        sentence_scores = self.score_sentences(sentences, word_frequencies)
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
         
-        # Determine number of sentences for summary
-        num_sentences = max(3, int(len(sentences) * summary_ratio))
+        with self._cache_lock:
+            doc = self._cache.get(key)
+            if doc is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return doc.rescored(algorithm)
+            self.cache_misses += 1
         
-        # Get top sentences
-        ranked_sentences = sorted(
-            sentence_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:num_sentences]
+        doc = self._analyze(text)
         
-        # Sort by original order
-        summary_sentences = []
-        for sentence in sentences:
-            for scored_sentence, score in ranked_sentences:
-                if sentence == scored_sentence:
-                    summary_sentences.append(sentence)
-                    break
+        with self._cache_lock:
+            self._cache[key] = doc
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
         
+        return doc.rescored(algorithm)
+    
+    def extract_key_points(self, text: str, num_points: int = 5, algorithm: str = "frequency") -> List[str]:
+        """Extract key bullet points from text"""
+        doc = self.analyze(text, algorithm)
+        return [doc.sentences[i] for i in doc.top_sentences(num_points)]
+    
+    def _build_result(self, text: str, doc: AnalyzedDocument, selected: List[int]) -> Dict:
+        """Summary, bullet points and metrics for the selected sentences"""
         # Create summary
-        summary_text = ' '.join(summary_sentences)
+        summary_text = doc.join(selected)
         
         # Extract bullet points (top 5 key sentences)
-        bullet_points = self.extract_key_points(cleaned_text, num_points=5)
+        bullet_points = [doc.sentences[i] for i in doc.top_sentences(5)]
         
         # Calculate metrics
-        compression_ratio = len(summary_text) / len(cleaned_text) if len(cleaned_text) > 0 else 1.0
+        cleaned_length = len(doc.cleaned_text)
+        compression_ratio = len(summary_text) / cleaned_length if cleaned_length > 0 else 1.0
         
         return {
             'summary': summary_text,
@@ -153,19 +145,101 @@ class SummarizerService:
             'original_length': len(text),
             'summary_length': len(summary_text),
             'compression_ratio': round(compression_ratio, 2),
-            'sentences_original': len(sentences),
-            'sentences_summary': len(summary_sentences),
-            'key_terms': list(word_frequencies.keys())[:10]
+            'sentences_original': len(doc.sentences),
+            'sentences_summary': len(selected),
+            'key_terms': list(doc.word_frequencies.keys())[:10]
         }
     
-    def summarize_with_length(self, text: str, max_length: int = 500) -> Dict:
-        """Generate summary with specific maximum length"""
-        # Start with 30% ratio
-        result = self.generate_summary(text, summary_ratio=0.3)
+    def generate_summary(self, text: str, summary_ratio: float = 0.3, algorithm: str = "frequency") -> Dict:
+        """Generate extractive summary"""
+        doc = self.analyze(text, algorithm)
+        
+        if len(doc.sentences) <= 3:
+            return {
+                'summary': doc.cleaned_text,
+                'bullet_points': doc.sentences,
+                'original_length': len(text),
+                'summary_length': len(doc.cleaned_text),
+                'compression_ratio': 1.0,
+                'sentences_original': len(doc.sentences),
+                'sentences_summary': len(doc.sentences),
+                'key_terms': list(doc.word_frequencies.keys())[:10]
+            }
+        
+        # Determine number of sentences for summary
+        num_sentences = max(3, int(len(doc.sentences) * summary_ratio))
+        
+        return self._build_result(text, doc, doc.top_sentences(num_sentences))
+    
+    def select_within_budget(self, doc: AnalyzedDocument, max_length: int) -> List[int]:
+        """
+        Pick sentences that fit in max_length characters (joined with spaces)
+        
+        Sentences are ranked once by score per character and added greedily
+        while they fit; if the single best sentence that fits beats that
+        whole selection, it is used instead. Returns indices in document order.
+        """
+        lengths = {i: len(doc.sentences[i]) for i in doc.ranking}
+        candidates = [i for i in doc.ranking if lengths[i] <= max_length]
+        if not candidates:
+            return []
+        
+        by_density = sorted(
+            candidates,
+            key=lambda i: doc.sentence_scores[i] / max(1, lengths[i]),
+            reverse=True
+        )
+        
+        selected = []
+        used = 0
+        for index in by_density:
+            cost = lengths[index] + (1 if selected else 0)  # Joining space
+            if used + cost <= max_length:
+                selected.append(index)
+                used += cost
         
-        # Adjust if needed
-        if result['summary_length'] > max_length:
-            # Try with smaller ratio
-            result = self.generate_summary(text, summary_ratio=0.2)
+        best_single = max(candidates, key=lambda i: doc.sentence_scores[i])
+        if doc.sentence_scores[best_single] > sum(doc.sentence_scores[i] for i in selected):
+            selected = [best_single]
+        
+        return sorted(selected)
+    
+    @staticmethod
+    def _truncate(text: str, max_length: int) -> str:
+        """Cut text at a word boundary so it fits in max_length"""
+        if len(text) <= max_length:
+            return text
+        cut = text[:max_length + 1].rsplit(' ', 1)[0] if ' ' in text[:max_length + 1] else text[:max_length]
+        return cut[:max_length].rstrip()
+    
+    def summarize_with_length(self, text: str, max_length: int = 500, algorithm: str = "frequency") -> Dict:
+        """Generate summary guaranteed to be at most max_length characters"""
+        doc = self.analyze(text, algorithm)
+        selected = self.select_within_budget(doc, max_length)
+        result = self._build_result(text, doc, selected)
+        
+        if not selected:
+            # No whole sentence fits: fall back to the best sentence, cut to size
+            fallback = doc.sentences[doc.ranking[0]] if doc.ranking else doc.cleaned_text
+            summary_text = self._truncate(fallback, max_length)
+            cleaned_length = len(doc.cleaned_text)
+            result.update({
+                'summary': summary_text,
+                'summary_length': len(summary_text),
+                'compression_ratio': round(len(summary_text) / cleaned_length, 2) if cleaned_length > 0 else 1.0,
+                'sentences_summary': 1 if summary_text else 0
+            })
         
         return result
+    
+    def get_cache_stats(self) -> Dict:
+        """Analysis cache occupancy and hit rate"""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'entries': len(self._cache),
+                'max_entries': self.cache_size,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': round(self.cache_hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the app modules the way main.py does, from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def session_factory():
+    """Sessions on a fresh in-memory SQLite database holding every table"""
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    pytest.importorskip("dotenv")  # config
+    database = pytest.importorskip("database.database")
+    pytest.importorskip("models.models")
+    pytest.importorskip("database.tables")
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    # One shared connection, so the write-behind thread sees the same database
+    engine = sqlalchemy.create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    database.Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
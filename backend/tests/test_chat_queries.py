@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("models.models")
+
+from database.chat_queries import (
+    compute_session_stats, create_session_stats, get_session_stats,
+    load_recent_messages, record_inserted_messages
+)
+from database.tables import ChatSessionStats
+from models.models import ChatMessage, ChatSession
+
+
+def _session(db, name, messages, with_stats=False):
+    session = ChatSession(user_id=1, session_id=name)
+    db.add(session)
+    db.flush()
+    if with_stats:
+        create_session_stats(db, session.id)
+    for i, content in enumerate(messages):
+        db.add(ChatMessage(session_id=session.id, role="user" if i % 2 == 0 else "assistant", content=content))
+    db.commit()
+    return session.id
+
+
+def test_compute_session_stats_in_one_query(session_factory):
+    db = session_factory()
+    first = _session(db, "first", ["hello", "hi there", "how are you"])
+    second = _session(db, "second", ["only message"])
+    empty = _session(db, "empty", [])
+
+    stats = compute_session_stats(db, [first, second, empty])
+    assert stats[first]["message_count"] == 3
+    # Messages saved in the same second are ordered by id
+    assert stats[first]["last_message_preview"] == "how are you..."
+    assert stats[second]["message_count"] == 1
+    assert stats[empty] == {"message_count": 0, "last_message_preview": None, "last_message_at": None}
+    db.close()
+
+
+def test_get_session_stats_backfills_missing_rows(session_factory):
+    db = session_factory()
+    legacy = _session(db, "legacy", ["a", "b", "c", "d"])
+    assert db.query(ChatSessionStats).filter_by(session_id=legacy).first() is None
+
+    assert get_session_stats(db, [legacy])[legacy]["message_count"] == 4
+    row = db.query(ChatSessionStats).filter_by(session_id=legacy).one()
+    assert row.message_count == 4
+    assert row.last_message_preview == "d..."
+
+    # Later reads use the stored row
+    assert get_session_stats(db, [legacy])[legacy]["message_count"] == 4
+    db.close()
+
+
+def test_record_inserted_messages_updates_stats(session_factory):
+    db = session_factory()
+    session_pk = _session(db, "new", [], with_stats=True)
+
+    rows = []
+    for content in ("question", "answer"):
+        message = ChatMessage(session_id=session_pk, role="user", content=content)
+        db.add(message)
+        db.flush()
+        rows.append({"id": message.id, "session_id": session_pk, "content": content})
+    record_inserted_messages(db, rows)
+    db.commit()
+
+    stats = get_session_stats(db, [session_pk])[session_pk]
+    assert stats["message_count"] == 2
+    assert stats["last_message_preview"] == "answer..."
+    db.close()
+
+
+def test_load_recent_messages_returns_the_tail_oldest_first(session_factory):
+    db = session_factory()
+    session_pk = _session(db, "long", [f"message {i}" for i in range(10)])
+
+    recent = load_recent_messages(db, session_pk, 3)
+    assert [m["content"] for m in recent] == ["message 7", "message 8", "message 9"]
+    assert recent[0]["role"] == "assistant"
+    assert load_recent_messages(db, session_pk, 0) == []
+    db.close()
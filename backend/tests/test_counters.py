@@ -0,0 +1,101 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("models.models")
+
+from database.counters import (
+    CHAT_MESSAGES, RESUME_ANALYSES, SPAM_CHECKS, SPAM_DETECTED, SUMMARIES_CREATED, TOTAL,
+    UsageCounterCache, _today, ensure_counters, increment, rebuild
+)
+from models.models import ChatMessage, ChatSession, ResumeAnalysis, SpamCheck, Summary
+
+
+def _add_results(db):
+    db.add_all([
+        ResumeAnalysis(user_id=1, filename="cv.pdf", extracted_text="", skills_found="{}",
+                       match_score=50.0, missing_skills="[]"),
+        SpamCheck(user_id=1, email_text="win", is_spam=True, confidence=0.9, features="{}"),
+        SpamCheck(user_id=1, email_text="win again", is_spam=True, confidence=0.8, features="{}"),
+        SpamCheck(user_id=1, email_text="hello", is_spam=False, confidence=0.1, features="{}"),
+        SpamCheck(user_id=2, email_text="hi", is_spam=False, confidence=0.2, features="{}"),
+        Summary(user_id=1, original_text="long", summary_text="short", compression_ratio=0.5),
+    ])
+    session = ChatSession(user_id=1, session_id="s1")
+    db.add(session)
+    db.flush()
+    db.add_all([
+        ChatMessage(session_id=session.id, role="user", content="question"),
+        ChatMessage(session_id=session.id, role="assistant", content="answer"),
+        ChatMessage(session_id=session.id, role="user", content="follow-up"),
+    ])
+    db.commit()
+
+
+def test_increment_creates_then_updates_day_and_total_rows(session_factory):
+    db = session_factory()
+    increment(db, {(SPAM_CHECKS, 1): 2}, day="2026-01-01")
+    increment(db, {(SPAM_CHECKS, 1): 3, (SPAM_DETECTED, 1): 0}, day="2026-01-01")
+    increment(db, {(SPAM_CHECKS, 1): 1}, day="2026-01-02")
+    db.commit()
+
+    cache = UsageCounterCache()
+    assert cache.get(db, 1)[SPAM_CHECKS] == 6
+    assert cache.get(db, 1, "2026-01-01")[SPAM_CHECKS] == 5
+    assert cache.get(db, 1)[SPAM_DETECTED] == 0
+    db.close()
+
+
+def test_rebuild_counts_the_result_tables(session_factory):
+    db = session_factory()
+    _add_results(db)
+    increment(db, {(SPAM_CHECKS, 1): 100})  # Drifted counter, replaced by the rebuild
+    db.commit()
+
+    rebuild(db)
+    cache = UsageCounterCache()
+    totals = cache.get(db, 1)
+    assert totals == {
+        RESUME_ANALYSES: 1,
+        SPAM_CHECKS: 3,
+        SPAM_DETECTED: 2,
+        SUMMARIES_CREATED: 1,
+        CHAT_MESSAGES: 2,
+    }
+    assert cache.get(db, 1, _today()) == totals
+    assert cache.get(db, 2)[SPAM_CHECKS] == 1
+    db.close()
+
+
+def test_ensure_counters_only_builds_an_empty_table(session_factory):
+    db = session_factory()
+    _add_results(db)
+    ensure_counters(session_factory)
+    assert UsageCounterCache().get(db, 1)[SPAM_CHECKS] == 3
+
+    increment(db, {(SPAM_CHECKS, 1): 1})
+    db.commit()
+    ensure_counters(session_factory)
+    assert UsageCounterCache().get(db, 1)[SPAM_CHECKS] == 4
+    db.close()
+
+
+def test_cache_serves_until_invalidated_or_expired(session_factory):
+    db = session_factory()
+    increment(db, {(SUMMARIES_CREATED, 1): 1})
+    db.commit()
+
+    cache = UsageCounterCache(ttl_seconds=60)
+    assert cache.get(db, 1)[SUMMARIES_CREATED] == 1
+    increment(db, {(SUMMARIES_CREATED, 1): 1})
+    db.commit()
+    assert cache.get(db, 1)[SUMMARIES_CREATED] == 1  # Cached
+    cache.invalidate([1])
+    assert cache.get(db, 1)[SUMMARIES_CREATED] == 2
+
+    expiring = UsageCounterCache(ttl_seconds=0)
+    assert expiring.get(db, 1, TOTAL)[SUMMARIES_CREATED] == 2
+    increment(db, {(SUMMARIES_CREATED, 1): 1})
+    db.commit()
+    assert expiring.get(db, 1, TOTAL)[SUMMARIES_CREATED] == 3
+    assert expiring.get_stats()["hits"] == 0
+    db.close()
@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("dotenv")  # config
+
+from services.skill_search import SkillSearchIndex
+
+
+def _index():
+    index = SkillSearchIndex()
+    index.add_many([
+        (1, {"languages": ["Python", "SQL"]}, 66.67),
+        (2, {"languages": ["python"]}, 80.0),
+        (3, '{"languages": ["Python"], "tools": ["Docker"]}', 66.67),
+        (4, {"languages": ["Java"]}, 90.0),
+    ])
+    return index
+
+
+def test_search_requires_every_skill():
+    result = _index().search(["python", "sql"])
+    assert result["analysis_ids"] == [1]
+
+
+def test_min_score_equal_to_a_stored_score_matches():
+    result = _index().search(["Python"], min_score=66.67)
+    assert result["total"] == 3
+    assert result["analysis_ids"] == [2, 3, 1]
+    assert result["scores"] == [80.0, 66.67, 66.67]
+
+
+def test_min_score_excludes_lower_scores():
+    result = _index().search(["python"], min_score=66.68)
+    assert result["analysis_ids"] == [2]
+
+
+def test_pagination_keeps_the_total():
+    index = _index()
+    first = index.search(["python"], limit=2, offset=0)
+    second = index.search(["python"], limit=2, offset=2)
+    assert first["total"] == second["total"] == 3
+    assert first["analysis_ids"] + second["analysis_ids"] == [2, 3, 1]
+
+
+def test_unknown_skill_matches_nothing():
+    result = _index().search(["python", "cobol"])
+    assert result == {"total": 0, "analysis_ids": [], "scores": []}
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "skill_search.npz"
+    _index().save(path)
+
+    loaded = SkillSearchIndex()
+    loaded._load_snapshot(path)
+    assert loaded.search(["python"], min_score=66.67)["analysis_ids"] == [2, 3, 1]
@@ -0,0 +1,85 @@
+import random
+import re
+
+import pytest
+
+from services.spam_matcher import SpamPatternMatcher
+from utils.aho_corasick import AhoCorasick
+
+# The patterns SpamDetectorService ships with
+PHISHING_PATTERNS = [
+    r'verify.*account',
+    r'confirm.*identity',
+    r'suspended.*account',
+    r'unusual.*activity',
+    r'click.*link',
+    r'update.*payment',
+    r'expire.*\d+.*hours?',
+    r'reset.*password'
+]
+KEYWORDS = ['free', 'winner', 'click here', 'urgent', 'act now', 'limited time']
+
+
+def _naive_matches(patterns, text):
+    return {index for index, pattern in enumerate(patterns) for start in range(len(text))
+            if text.startswith(pattern, start)}
+
+
+def test_aho_corasick_reports_overlapping_matches():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+    matches = sorted(automaton.iter_matches('ushers'))
+    assert matches == [(1, 1), (2, 0), (2, 3)]
+
+
+def test_aho_corasick_agrees_with_naive_search():
+    rng = random.Random(0)
+    patterns = ['ab', 'abc', 'bca', 'c', 'aab', 'cab']
+    automaton = AhoCorasick(patterns)
+    for _ in range(200):
+        text = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 30)))
+        assert automaton.find_present(text) == _naive_matches(patterns, text)
+
+
+def test_aho_corasick_ignores_empty_patterns():
+    automaton = AhoCorasick(['', 'x'])
+    assert automaton.patterns == ['x']
+    assert automaton.find_present('xyz') == {0}
+
+
+def test_keywords_present():
+    matcher = SpamPatternMatcher(KEYWORDS, PHISHING_PATTERNS)
+    present, _ = matcher.match('urgent: you are a winner, click here to claim')
+    assert present == {'urgent', 'winner', 'click here'}
+
+
+@pytest.mark.parametrize('text', [
+    'please verify your account now',
+    'verify account verify the other account',
+    'your password expires: expire in 24 hours or 48 hour',
+    'click the link\nthen click this link too',
+    'expire soon, 12 hours left\nexpire never',
+    'unusual activity on an unusual account activity',
+    'update.*payment is not a literal match',
+    'nothing suspicious here',
+    '',
+])
+def test_phishing_matches_equal_re_findall(text):
+    matcher = SpamPatternMatcher(KEYWORDS, PHISHING_PATTERNS)
+    _, phishing = matcher.match(text)
+    assert phishing == [re.findall(pattern, text) for pattern in PHISHING_PATTERNS]
+
+
+def test_phishing_matches_equal_re_findall_on_random_text():
+    rng = random.Random(1)
+    words = ['verify', 'account', 'expire', 'hours', 'hour', 'click', 'link', 'reset',
+             'password', '7', '42', 'the', ' ', ' ', '\n', 'x']
+    matcher = SpamPatternMatcher(KEYWORDS, PHISHING_PATTERNS)
+    for _ in range(300):
+        text = ''.join(rng.choice(words) for _ in range(rng.randint(0, 25)))
+        _, phishing = matcher.match(text)
+        assert phishing == [re.findall(pattern, text) for pattern in PHISHING_PATTERNS], text
+
+
+def test_unsupported_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        SpamPatternMatcher([], [r'verify.*[0-9]'])
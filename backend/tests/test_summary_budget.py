@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("nltk")
+pytest.importorskip("dotenv")  # config
+
+from services.summary_service import AnalyzedDocument, SummarizerService
+
+
+@pytest.fixture
+def service():
+    # select_within_budget only reads the document; skip loading NLTK data
+    return SummarizerService.__new__(SummarizerService)
+
+
+def _doc(sentences, scores):
+    return AnalyzedDocument(' '.join(sentences), sentences, [], [], {}, dict(enumerate(scores)))
+
+
+def test_selection_fits_the_budget_with_joining_spaces(service):
+    doc = _doc(['a' * 10, 'b' * 10, 'c' * 10], [1.0, 1.0, 1.0])
+    selected = service.select_within_budget(doc, 21)
+    assert len(selected) == 2
+    assert len(doc.join(selected)) <= 21
+
+
+def test_dense_sentences_are_preferred(service):
+    doc = _doc(['x' * 50, 'short one', 'short two'], [3.0, 2.0, 2.0])
+    assert service.select_within_budget(doc, 20) == [1, 2]
+
+
+def test_best_single_sentence_beats_a_weaker_greedy_pick(service):
+    # Greedy by density takes the two short sentences (score 2); the long one scores 5
+    doc = _doc(['tiny', 'y' * 30, 'tiny2'], [1.0, 5.0, 1.0])
+    assert service.select_within_budget(doc, 30) == [1]
+
+
+def test_nothing_fits(service):
+    doc = _doc(['z' * 40], [1.0])
+    assert service.select_within_budget(doc, 10) == []
+
+
+def test_selection_is_in_document_order_and_always_fits(service):
+    rng = random.Random(0)
+    for _ in range(100):
+        sentences = ['w' * rng.randint(1, 60) for _ in range(rng.randint(1, 12))]
+        doc = _doc(sentences, [rng.random() for _ in sentences])
+        budget = rng.randint(1, 150)
+        selected = service.select_within_budget(doc, budget)
+        assert selected == sorted(selected)
+        assert len(doc.join(selected)) <= budget
+        fitting = [i for i, s in enumerate(sentences) if len(s) <= budget]
+        if fitting:
+            best = max(doc.sentence_scores[i] for i in fitting)
+            assert sum(doc.sentence_scores[i] for i in selected) >= best
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("models.models")
+
+from database.write_behind import WriteBehindQueue
+from models.models import ChatMessage
+
+
+def _message(content, **extra):
+    return {"session_id": 1, "role": "user", "content": content, **extra}
+
+
+def _contents(session_factory):
+    db = session_factory()
+    try:
+        return [m.content for m in db.query(ChatMessage).order_by(ChatMessage.id).all()]
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def make_queue(session_factory, tmp_path):
+    queues = []
+
+    def make(**options):
+        queue = WriteBehindQueue(session_factory, journal_dir=tmp_path, **options)
+        queue.start()
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def test_replay_inserts_leftover_segments(session_factory, tmp_path, make_queue):
+    segment = tmp_path / "segment-1-1.jsonl"
+    lines = [json.dumps({"table": ChatMessage.__tablename__, "values": _message(c)}) for c in ("one", "two")]
+    # A torn final write was never acknowledged and is skipped
+    segment.write_text("\n".join(lines) + '\n{"table": "chat_mess')
+
+    make_queue()
+    assert _contents(session_factory) == ["one", "two"]
+    assert list(tmp_path.glob("segment-*.jsonl")) == []
+
+
+def test_segments_are_deleted_once_committed(session_factory, tmp_path, make_queue):
+    queue = make_queue()
+    futures = queue.submit_many(ChatMessage, [_message(f"m{i}") for i in range(3)])
+    ids = [future.result(timeout=10) for future in futures]
+
+    assert ids == sorted(ids)
+    assert _contents(session_factory) == ["m0", "m1", "m2"]
+    assert list(tmp_path.glob("segment-*.jsonl")) == []
+
+
+def test_capped_batches_keep_the_journal_until_every_row_is_written(session_factory, tmp_path, make_queue):
+    queue = make_queue(max_batch_rows=2)
+    futures = queue.submit_many(ChatMessage, [_message(f"m{i}") for i in range(5)])
+    for future in futures:
+        future.result(timeout=10)
+
+    assert _contents(session_factory) == [f"m{i}" for i in range(5)]
+    assert queue.get_stats()["flushes"] >= 3
+    assert list(tmp_path.glob("segment-*.jsonl")) == []
+
+
+def test_failed_rows_fail_alone_and_are_kept_for_replay(session_factory, tmp_path, make_queue):
+    queue = make_queue(max_retries=1)
+    good, bad = queue.submit_many(ChatMessage, [_message("good"), _message("bad", no_such_column=1)])
+
+    assert good.result(timeout=10)
+    with pytest.raises(Exception):
+        bad.result(timeout=10)
+    assert _contents(session_factory) == ["good"]
+
+    kept = list(tmp_path.glob("segment-*-failed.jsonl"))
+    assert len(kept) == 1
+    assert json.loads(kept[0].read_text())["values"]["content"] == "bad"
+
+
+def test_writer_survives_a_crashing_flush(session_factory, make_queue, monkeypatch):
+    queue = make_queue()
+    monkeypatch.setattr(queue, "_write_isolated", lambda batch: 1 / 0)
+    crashed = queue.submit(ChatMessage, _message("lost"))
+    with pytest.raises(ZeroDivisionError):
+        crashed.result(timeout=10)
+
+    monkeypatch.undo()
+    assert queue.submit(ChatMessage, _message("after")).result(timeout=10)
+    assert _contents(session_factory) == ["after"]
@@ -0,0 +1,51 @@
+"""
+Request body size limits enforced while the body is received.
+
+FastAPI spools an UploadFile completely before the endpoint runs, so a size
+check inside the endpoint only fires after the whole upload has been written
+to the spool. This middleware rejects a request whose Content-Length is over
+its path's limit without reading the body, and stops a chunked upload with a
+413 as soon as the bytes received pass the limit.
+"""
+from typing import Dict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Room for multipart boundaries, part headers and the other form fields
+MULTIPART_OVERHEAD = 1024 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware limiting the upload size of the given paths (plus multipart overhead)"""
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload too large. Maximum size is {limit // (1024 * 1024)}MB"
+        limit += MULTIPART_OVERHEAD
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised from inside form parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
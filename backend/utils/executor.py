@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+
+from config import settings
+from utils.logger import logger
+from utils.metrics import summarize_latencies
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Run fn in a worker and report when it actually started and finished"""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return started_at, time.time(), result
+
+
+class _PoolStats:
+    """Counters and recent latency samples for one worker pool"""
+
+    def __init__(self, kind: str, max_workers: int, sample_size: int = 1000):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.wait_ms = deque(maxlen=sample_size)
+        self.run_ms = deque(maxlen=sample_size)
+
+    def snapshot(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'queue_depth': max(0, self.in_flight - self.max_workers),
+            'wait_ms': summarize_latencies(self.wait_ms),
+            'run_ms': summarize_latencies(self.run_ms)
+        }
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model work off the asyncio event loop.
+
+    Each module gets its own worker pool so a slow chat generation cannot
+    starve spam checks; the pool size is the module's concurrency limit.
+    Thread pools share the already-loaded service objects; process pools
+    need picklable, module-level callables.
+    """
+
+    def __init__(self, pools: Dict[str, Tuple[str, int]]):
+        self._config = dict(pools)
+        self._pools = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, module: str):
+        with self._lock:
+            pool = self._pools.get(module)
+            if pool is None:
+                kind, max_workers = self._config.get(module, ("thread", 1))
+                max_workers = max(1, int(max_workers))
+                if kind == "process":
+                    pool = ProcessPoolExecutor(max_workers=max_workers)
+                else:
+                    kind = "thread"
+                    pool = ThreadPoolExecutor(
+                        max_workers=max_workers,
+                        thread_name_prefix=f"inference-{module}"
+                    )
+                self._pools[module] = pool
+                self._stats[module] = _PoolStats(kind, max_workers)
+                logger.info(f"Inference pool '{module}' started ({kind}, {max_workers} workers)")
+            return pool
+
+    def submit(self, module: str, fn: Callable, *args, **kwargs) -> Future:
+        """Submit fn to the module's pool and return a concurrent Future"""
+        pool = self._get_pool(module)
+        stats = self._stats[module]
+        enqueued_at = time.time()
+
+        with self._lock:
+            stats.submitted += 1
+            stats.in_flight += 1
+
+        inner = pool.submit(_timed_call, fn, args, kwargs)
+        outer = Future()
+
+        def _done(f: Future):
+            with self._lock:
+                stats.in_flight -= 1
+                if f.cancelled() or f.exception() is not None:
+                    stats.failed += 1
+                else:
+                    started_at, finished_at, _ = f.result()
+                    stats.completed += 1
+                    stats.wait_ms.append(max(0.0, started_at - enqueued_at) * 1000)
+                    stats.run_ms.append((finished_at - started_at) * 1000)
+
+            if f.cancelled():
+                outer.cancel()
+            elif not outer.set_running_or_notify_cancel():
+                return  # The awaiting coroutine was cancelled (e.g. client disconnected)
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                outer.set_result(f.result()[2])
+
+        inner.add_done_callback(_done)
+        return outer
+
+    async def run(self, module: str, fn: Callable, *args, **kwargs):
+        """Await fn(*args, **kwargs) on the module's pool"""
+        return await asyncio.wrap_future(self.submit(module, fn, *args, **kwargs))
+
+    def get_stats(self) -> Dict:
+        """Per-module queue depth, wait time and run time"""
+        with self._lock:
+            return {module: stats.snapshot() for module, stats in self._stats.items()}
+
+    def shutdown(self, wait: bool = True):
+        """Stop all pools"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+
+inference_executor = InferenceExecutor(settings.INFERENCE_POOLS)
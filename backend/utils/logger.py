@@ -14,18 +14,10 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def log_activity(db, user_id: int, module: str, action: str, details: str = None):
-    """Log user activity to database"""
-    from models.models import ActivityLog
+def log_activity(user_id: int, module: str, action: str, details: str = None):
+    """Record user activity; aggregated in memory and written to the database in the background"""
+    from database.activity import activity_recorder
     try:
-        log_entry = ActivityLog(
-            user_id=user_id,
-            module=module,
-            action=action,
-            details=details
-        )
-        db.add(log_entry)
-        db.commit()
+        activity_recorder.record(user_id, module, action, details)
     except Exception as e:
         logger.error(f"Failed to log activity: {str(e)}")
-        db.rollback()
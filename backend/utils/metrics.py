@@ -0,0 +1,14 @@
+from typing import Dict, Iterable
+
+
+def summarize_latencies(samples: Iterable[float]) -> Dict[str, float]:
+    """Summarize latency samples (milliseconds) as avg / p95 / max"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        'avg': round(sum(ordered) / len(ordered), 2),
+        'p95': round(p95, 2),
+        'max': round(ordered[-1], 2)
+    }
@@ -0,0 +1,23 @@
+import threading
+
+import nltk
+
+_checked = set()
+_lock = threading.Lock()
+
+
+def ensure_nltk_data(*resources: str):
+    """
+    Make sure NLTK data is available, downloading it once per process.
+
+    Resources are given as their nltk.data paths, e.g. 'tokenizers/punkt'.
+    """
+    with _lock:
+        for resource in resources:
+            if resource in _checked:
+                continue
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                nltk.download(resource.split('/')[-1], quiet=True)
+            _checked.add(resource)